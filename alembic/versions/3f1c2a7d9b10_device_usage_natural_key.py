@@ -0,0 +1,42 @@
+"""device_usage natural key (device_id, start_time)
+
+Revision ID: 3f1c2a7d9b10
+Revises: 
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2a7d9b10'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    from app.maintenance import dedup_usages
+
+    # 先分块清理历史重复数据，否则唯一索引无法建立
+    dedup_usages(op.get_bind().engine)
+
+    # 并发建索引不阻塞写入，再把索引挂成唯一约束（只需短暂锁表）
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_device_usage_device_start "
+            "ON device_usage (device_id, start_time)"
+        )
+    op.execute(
+        "ALTER TABLE device_usage ADD CONSTRAINT uq_device_usage_device_start "
+        "UNIQUE USING INDEX uq_device_usage_device_start"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_device_usage_device_start', 'device_usage', type_='unique')
@@ -0,0 +1,38 @@
+"""analytics_results precompute table
+
+Revision ID: 5e7a2b9d3c41
+Revises: c4d9e1a6b253
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e7a2b9d3c41'
+down_revision: Union[str, Sequence[str], None] = 'c4d9e1a6b253'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'analytics_results',
+        sa.Column('analysis', sa.String(length=64), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('data', sa.Text(), nullable=True),
+        sa.Column('chart', sa.Text(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('computed_at', sa.DateTime(), nullable=False),
+        sa.Column('duration_ms', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('analysis', 'user_id'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('analytics_results')
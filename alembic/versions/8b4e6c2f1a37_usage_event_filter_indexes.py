@@ -0,0 +1,39 @@
+"""composite indexes for usage/event filters
+
+Revision ID: 8b4e6c2f1a37
+Revises: 3f1c2a7d9b10
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b4e6c2f1a37'
+down_revision: Union[str, Sequence[str], None] = '3f1c2a7d9b10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (device_id, start_time) 已由唯一约束 uq_device_usage_device_start 覆盖
+INDEXES = [
+    ("ix_device_usage_user_start", "device_usage", "user_id, start_time"),
+    ("ix_security_events_device_timestamp", "security_events", "device_id, timestamp"),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY 建索引不阻塞线上读写，但不能在事务中执行
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, _, _ in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
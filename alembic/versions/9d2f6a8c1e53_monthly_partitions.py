@@ -0,0 +1,103 @@
+"""monthly range partitions for device_usage and security_events
+
+Revision ID: 9d2f6a8c1e53
+Revises: 5e7a2b9d3c41
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d2f6a8c1e53'
+down_revision: Union[str, Sequence[str], None] = '5e7a2b9d3c41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# 表名 -> (分区键, 列定义, 复制数据后再建的约束与索引)；分区表的主键必须包含分区键，主键另行添加
+TABLES = {
+    'device_usage': (
+        'start_time',
+        """
+        id integer NOT NULL DEFAULT nextval('device_usage_id_seq'),
+        device_id integer,
+        user_id integer,
+        start_time timestamp without time zone NOT NULL,
+        end_time timestamp without time zone NOT NULL,
+        energy_consumption double precision
+        """,
+        [
+            "ALTER TABLE device_usage ADD CONSTRAINT uq_device_usage_device_start UNIQUE (device_id, start_time)",
+            "CREATE INDEX ix_device_usage_id ON device_usage (id)",
+            "CREATE INDEX ix_device_usage_user_start ON device_usage (user_id, start_time)",
+            "ALTER TABLE device_usage ADD CONSTRAINT device_usage_device_id_fkey FOREIGN KEY (device_id) REFERENCES devices(id)",
+            "ALTER TABLE device_usage ADD CONSTRAINT device_usage_user_id_fkey FOREIGN KEY (user_id) REFERENCES users(id)",
+        ],
+    ),
+    'security_events': (
+        'timestamp',
+        """
+        id integer NOT NULL DEFAULT nextval('security_events_id_seq'),
+        device_id integer,
+        event_type varchar(100) NOT NULL,
+        severity varchar(50) NOT NULL,
+        "timestamp" timestamp without time zone NOT NULL
+        """,
+        [
+            "CREATE INDEX ix_security_events_id ON security_events (id)",
+            'CREATE INDEX ix_security_events_device_timestamp ON security_events (device_id, "timestamp")',
+            "ALTER TABLE security_events ADD CONSTRAINT security_events_device_id_fkey FOREIGN KEY (device_id) REFERENCES devices(id)",
+        ],
+    ),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    from app import partitions
+
+    conn = op.get_bind()
+    # 分区键不能为空：历史上没有时间戳的安防事件按写入时的默认行为补为当前时间
+    op.execute('UPDATE security_events SET "timestamp" = now() AT TIME ZONE \'utc\' WHERE "timestamp" IS NULL')
+
+    for table, (key, columns, constraints) in TABLES.items():
+        op.execute(f"ALTER TABLE {table} RENAME TO {table}_unpartitioned")
+        op.execute(f'CREATE TABLE {table} ({columns}) PARTITION BY RANGE ("{key}")')
+        # 序列归属新表，删除旧表时不会被一并删除
+        op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+        op.execute(f"CREATE TABLE {partitions.default_partition(table)} PARTITION OF {table} DEFAULT")
+
+        # 为已有数据的每个月及当月之后 PARTITIONS_AHEAD 个月建分区
+        months = conn.execute(sa.text(
+            f'SELECT DISTINCT date_trunc(\'month\', "{key}") FROM {table}_unpartitioned'
+        )).scalars().all()
+        current = partitions.month_start(conn.execute(sa.text("SELECT now() AT TIME ZONE 'utc'")).scalar())
+        months = set(months) | {partitions.add_months(current, i) for i in range(partitions.PARTITIONS_AHEAD + 1)}
+        for month in sorted(months):
+            partitions.create_month_partition(conn, table, month)
+
+        # 先复制数据再建索引和约束，比逐行维护索引快
+        op.execute(f"INSERT INTO {table} SELECT * FROM {table}_unpartitioned")
+        op.execute(f"DROP TABLE {table}_unpartitioned")
+        op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, "{key}")')
+        for statement in constraints:
+            op.execute(statement)
+        op.execute(f"ANALYZE {table}")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, (key, columns, constraints) in TABLES.items():
+        op.execute(f"ALTER TABLE {table} RENAME TO {table}_partitioned")
+        op.execute(f"CREATE TABLE {table} ({columns})")
+        op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+        op.execute(f"INSERT INTO {table} SELECT * FROM {table}_partitioned")
+        op.execute(f"DROP TABLE {table}_partitioned CASCADE")
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id)")
+        for statement in constraints:
+            op.execute(statement)
+    op.execute('ALTER TABLE security_events ALTER COLUMN "timestamp" DROP NOT NULL')
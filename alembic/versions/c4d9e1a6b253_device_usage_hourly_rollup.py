@@ -0,0 +1,42 @@
+"""device_usage_hourly rollup table
+
+Revision ID: c4d9e1a6b253
+Revises: 8b4e6c2f1a37
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d9e1a6b253'
+down_revision: Union[str, Sequence[str], None] = '8b4e6c2f1a37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    from app.rollups import backfill_usage_hourly
+
+    op.create_table(
+        'device_usage_hourly',
+        sa.Column('device_id', sa.Integer(), sa.ForeignKey('devices.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('hour', sa.DateTime(), nullable=False),
+        sa.Column('session_count', sa.Integer(), nullable=False),
+        sa.Column('total_duration_s', sa.Float(), nullable=False),
+        sa.Column('total_energy', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('device_id', 'hour'),
+    )
+
+    # 先提交建表，再用独立连接按时间段分块回填历史数据
+    with op.get_context().autocommit_block():
+        backfill_usage_hourly(op.get_bind().engine)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('device_usage_hourly')
@@ -0,0 +1,40 @@
+"""device_usage_daily archive aggregates
+
+Revision ID: e7b3f0a4c862
+Revises: 9d2f6a8c1e53
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7b3f0a4c862'
+down_revision: Union[str, Sequence[str], None] = '9d2f6a8c1e53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'device_usage_daily',
+        sa.Column('device_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('session_count', sa.Integer(), nullable=False),
+        sa.Column('total_duration_s', sa.Float(), nullable=False),
+        sa.Column('total_energy', sa.Float(), nullable=False),
+        sa.Column('hour_counts', postgresql.ARRAY(sa.Integer()), nullable=False),
+        sa.Column('hour_duration_s', postgresql.ARRAY(sa.Float()), nullable=False),
+        sa.ForeignKeyConstraint(['device_id'], ['devices.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('device_id', 'day'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('device_usage_daily')
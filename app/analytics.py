@@ -1,242 +1,488 @@
 # app/analytics.py
 
-import io
-import base64
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+import datetime
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+import orjson
 from sqlalchemy.orm import Session
-from app import models
-from typing import List, Optional
-from datetime import datetime
-from sqlalchemy import func, text
+from app import cousage, models, rendering
+from app.analytics_cache import ANALYTICS_CACHE_ENABLED, cache, cached
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+from sqlalchemy import func, literal, select, union_all
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+# 每个分析分两步：在本进程执行 SQL 聚合，得到可 pickle 的纯数据；
+# 再交给渲染进程池（app/rendering.py）绘图，返回 Base64 图像。
+# 两步的结果都按数据水位缓存（app/analytics_cache.py），相关表有写入时自动失效。
+
+# 只需要 (设备, 小时) 粒度的分析读小时汇总表，不扫描原始使用记录；
+# 已冷归档的历史只剩每日汇总（app/compaction.py），两表合并才是全部历史
+Hourly = models.DeviceUsageHourly
+Daily = models.DeviceUsageDaily
+
+USAGE_TABLES = ("devices", "device_usage", "device_usage_hourly", "device_usage_daily")
+
+# 单条使用记录的最长时长；按时间窗口查询原始记录时据此推出 start_time 的下界
+USAGE_MAX_SESSION = datetime.timedelta(hours=float(os.getenv("USAGE_MAX_SESSION_HOURS", "168")))
+
+
+def _columns(rows, names) -> Dict[str, list]:
+    """把查询结果行转置为 {列名: 值列表}"""
+    return {name: [row[i] for row in rows] for i, name in enumerate(names)}
+
+
+def _usage_totals():
+    """小时汇总与每日汇总的并集：每行一个 (设备, 小时或日期) 桶的使用次数与能耗"""
+    return union_all(
+        select(Hourly.device_id, Hourly.session_count, Hourly.total_energy),
+        select(Daily.device_id, Daily.session_count, Daily.total_energy),
+    ).subquery()
+
+
+def _usage_by_hour():
+    """按 (设备, 一天中的小时, 是否周末) 的使用次数与时长；每日汇总的 24 小时分布展开为行"""
+    hours = func.unnest(Daily.hour_counts, Daily.hour_duration_s).table_valued(
+        "session_count", "total_duration_s", with_ordinality="ordinal", joins_implicitly=True
+    ).render_derived()
+    return union_all(
+        select(
+            Hourly.device_id,
+            func.extract('hour', Hourly.hour).label('hour_of_day'),
+            (func.extract('isodow', Hourly.hour) >= 6).label('is_weekend'),
+            Hourly.session_count,
+            Hourly.total_duration_s
+        ),
+        select(
+            Daily.device_id,
+            hours.c.ordinal - 1,
+            func.extract('isodow', Daily.day) >= 6,
+            hours.c.session_count,
+            hours.c.total_duration_s
+        ).where(hours.c.session_count > 0),
+    ).subquery()
+
+
+def _usage_counts_by_device(db: Session):
+    """每台设备的使用次数（来自汇总表），作为子查询与其他按设备聚合的结果关联"""
+    totals = _usage_totals()
+    return db.query(
+        totals.c.device_id.label('device_id'),
+        func.sum(totals.c.session_count).label('usage_count')
+    ).group_by(totals.c.device_id).subquery()
+
+
+def _group_sum(keys, values) -> Dict[Any, float]:
+    """按键累加，保持键首次出现的顺序"""
+    totals: Dict[Any, float] = {}
+    for key, value in zip(keys, values):
+        totals[key] = totals.get(key, 0) + (value or 0)
+    return totals
 
-# 设置 Matplotlib 使用中文字体
-plt.rcParams['font.sans-serif'] = ['SimHei']  # 指定中文字体
-plt.rcParams['axes.unicode_minus'] = False  # 解决负号显示问题
 
 # ------------------------------
-# 工具函数：生成Base64图像
+# 设备概况（频率、面积、能耗三项分析共用）
 # ------------------------------
-def fig_to_base64(fig):
-    """将图表转换为base64编码"""
-    buf = io.BytesIO()
-    fig.savefig(buf, format="png")
-    buf.seek(0)
-    img_str = base64.b64encode(buf.read()).decode("utf-8")
-    return img_str
+@cached("device_profile", USAGE_TABLES + ("users",))
+def device_profile(db: Session, user_id: Optional[int] = None) -> Dict[str, Any]:
+    """每台有使用记录的设备：名称、所属用户的房屋面积、使用次数、总能耗（一次查询）"""
+    totals = _usage_totals()
+    query = db.query(
+        models.Device.id,
+        models.Device.name,
+        models.Device.user_id,
+        models.User.house_area,
+        func.sum(totals.c.session_count).label('usage_count'),
+        func.sum(totals.c.total_energy).label('total_energy')
+    ).join(totals, totals.c.device_id == models.Device.id)\
+     .outerjoin(models.User, models.User.id == models.Device.user_id)
+
+    if user_id:
+        query = query.filter(models.Device.user_id == user_id)
+
+    rows = query.group_by(models.Device.id, models.Device.name, models.Device.user_id, models.User.house_area)\
+        .order_by(models.Device.id).all()
+
+    return _columns(rows, ["device_id", "device_name", "user_id", "house_area", "usage_count", "total_energy"])
 
 
 # ------------------------------
 # 设备使用频率分析
 # ------------------------------
-def device_usage_frequency(db: Session, user_id: Optional[str] = None) -> str:
-    """生成设备使用频率柱状图并返回Base64"""
-    query = db.query(
-        models.DeviceUsage.device_id,
-        models.Device.name,
-        func.count(models.DeviceUsage.id).label('usage_count')
-    ).join(models.Device, models.Device.id == models.DeviceUsage.device_id)
+@cached("device_usage_frequency_data", USAGE_TABLES)
+def device_usage_frequency_data(db: Session, user_id: Optional[int] = None) -> Dict[str, Any]:
+    return _frequency_from_profile(device_profile(db, user_id))
 
-    if user_id:
-        query = query.filter(models.Device.user_id == user_id)
 
-    usage_data = query.group_by(models.DeviceUsage.device_id, models.Device.name)\
-                      .order_by(text("usage_count DESC")).all()
+def _frequency_from_profile(profile: Dict[str, Any]) -> Dict[str, Any]:
+    order = sorted(range(len(profile["device_id"])), key=lambda i: (-profile["usage_count"][i], profile["device_id"][i]))
+    return {name: [profile[name][i] for i in order] for name in ["device_id", "device_name", "usage_count"]}
 
-    df = pd.DataFrame(usage_data, columns=["device_id", "device_name", "usage_count"])
-    
-    # 创建柱状图
-    plt.figure(figsize=(10, 6))
-    sns.barplot(x="usage_count", y="device_name", data=df, palette="Blues_d")
-    plt.title("Device Usage Frequency")
-    plt.xlabel("Usage Count")
-    plt.ylabel("Device Name")
-    
-    # 转换为Base64并返回
-    return fig_to_base64(plt)
+
+@cached("device_usage_frequency", USAGE_TABLES)
+def device_usage_frequency(db: Session, user_id: Optional[int] = None) -> str:
+    """生成设备使用频率柱状图并返回Base64"""
+    return rendering.render("device_usage_frequency", device_usage_frequency_data(db, user_id))
 
 
 # ------------------------------
 # 设备使用时间段分析
 # ------------------------------
-def device_usage_time_slot(db: Session, user_id: Optional[str] = None) -> str:
-    """生成设备使用时间段分析的线形图并返回Base64"""
+@cached("device_usage_time_slot_data", USAGE_TABLES)
+def device_usage_time_slot_data(
+    db: Session,
+    user_id: Optional[int] = None,
+    split_weekend: bool = False,
+    weight: str = "count",
+) -> Dict[str, Any]:
+    """每台设备按一天 24 小时的使用分布（在数据库中按 设备 x 小时 聚合）
+
+    weight="count" 统计使用次数，weight="duration" 统计使用时长（小时，计入开始时刻所在小时）；
+    split_weekend=True 时工作日与周末分开统计。无论记录多少，结果都是 设备数 x 24 的矩阵。
+    """
+    usage = _usage_by_hour()
+    value = func.sum(usage.c.session_count) if weight == "count" else func.sum(usage.c.total_duration_s) / 3600.0
+    keys = [usage.c.device_id, models.Device.name, usage.c.hour_of_day]
+    if split_weekend:
+        keys.append(usage.c.is_weekend)
+
     query = db.query(
-        models.DeviceUsage.device_id,
+        usage.c.device_id,
         models.Device.name,
-        func.extract('hour', models.DeviceUsage.start_time).label('hour')
-    ).join(models.Device, models.Device.id == models.DeviceUsage.device_id)
+        usage.c.hour_of_day,
+        (usage.c.is_weekend if split_weekend else literal(False)).label('is_weekend'),
+        value.label('value')
+    ).join(models.Device, models.Device.id == usage.c.device_id)
 
     if user_id:
         query = query.filter(models.Device.user_id == user_id)
 
-    usage_data = query.all()
+    usage_data = query.group_by(*keys).order_by(usage.c.device_id).all()
+
+    series_names = ["weekday", "weekend"] if split_weekend else ["all"]
+    devices: Dict[int, str] = {}
+    for row in usage_data:
+        devices.setdefault(row.device_id, row.name)
+    position = {device_id: i for i, device_id in enumerate(devices)}
+    series = {name: [[0.0] * 24 for _ in devices] for name in series_names}
+    for row in usage_data:
+        name = ("weekend" if row.is_weekend else "weekday") if split_weekend else "all"
+        series[name][position[row.device_id]][int(row.hour_of_day)] = float(row.value or 0)
+
+    return {
+        "hours": list(range(24)),
+        "device_id": list(devices),
+        "device_name": list(devices.values()),
+        "weight": weight,
+        "series": series,
+    }
+
+
+@cached("device_usage_time_slot", USAGE_TABLES)
+def device_usage_time_slot(
+    db: Session,
+    user_id: Optional[int] = None,
+    split_weekend: bool = False,
+    weight: str = "count",
+) -> str:
+    """生成设备使用时间段分布的线形图并返回Base64"""
+    data = device_usage_time_slot_data(db, user_id, split_weekend=split_weekend, weight=weight)
+    return rendering.render("device_usage_time_slot", data)
 
-    df = pd.DataFrame(usage_data, columns=["device_id", "device_name", "hour"])
-    
-    # 创建设备使用时间段的线形图
-    plt.figure(figsize=(10, 6))
-    sns.lineplot(x="hour", y="device_id", data=df, hue="device_name", marker="o")
-    plt.title("Device Usage by Hour of the Day")
-    plt.xlabel("Hour of the Day")
-    plt.ylabel("Device ID")
-    
-    # 转换为Base64并返回
-    return fig_to_base64(plt)
 
 # ------------------------------
 # 用户使用习惯挖掘（设备组合使用模式）
 # ------------------------------
-def device_usage_patterns(user_id: Optional[int], db: Session) -> str:
-    """分析用户使用习惯，找出哪些设备经常同时使用"""
-    # 获取设备使用记录
+@cached("device_usage_patterns_data", USAGE_TABLES)
+def device_usage_patterns_data(
+    db: Session,
+    user_id: Optional[int] = None,
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+) -> Dict[str, Any]:
+    """按真实使用区间的重叠时长统计设备两两共现（稀疏结果，只包含有重叠的设备对）
+
+    可用 [start, end) 限定时间窗口，窗口外的部分不计入。
+    重叠需要原始区间，已冷归档（只剩每日汇总）的记录不参与统计。
+    """
     query = db.query(
+        models.Device.user_id,
         models.DeviceUsage.device_id,
-        models.Device.name,
-        func.date_trunc('hour', models.DeviceUsage.start_time).label("time_slot")
-    ).join(models.Device, models.Device.id == models.DeviceUsage.device_id)
+        models.DeviceUsage.start_time,
+        models.DeviceUsage.end_time
+    ).join(models.Device, models.Device.id == models.DeviceUsage.device_id)\
+     .filter(models.DeviceUsage.end_time > models.DeviceUsage.start_time)
 
     if user_id is not None:
-        query = query.join(models.User, models.User.id == models.Device.user_id).filter(models.User.id == user_id)
-
-    usage_data = query.all()
-
-    df = pd.DataFrame(usage_data, columns=["device_id", "device_name", "time_slot"])
-
-    if df.empty:
+        query = query.filter(models.Device.user_id == user_id)
+    if start is not None:
+        # start_time 的下界是冗余条件，让按 start_time 月分区的表可以裁剪窗口之前的分区
+        query = query.filter(models.DeviceUsage.end_time > start,
+                             models.DeviceUsage.start_time > start - USAGE_MAX_SESSION)
+    if end is not None:
+        query = query.filter(models.DeviceUsage.start_time < end)
+
+    # 服务端游标按 (用户, 开始时间) 顺序流式读取，扫描线逐行消费
+    result = db.execute(
+        query.order_by(models.Device.user_id, models.DeviceUsage.start_time).statement,
+        execution_options={"yield_per": 10000}
+    )
+    co_usage = cousage.sweep((tuple(row) for row in result), window_start=start, window_end=end)
+
+    if not co_usage.device_seconds:
         raise ValueError("无足够的使用记录进行模式分析")
 
-    # 生成共现矩阵
-    pivot_df = df.pivot_table(index="time_slot", columns="device_name", aggfunc="size", fill_value=0)
-    correlation_matrix = pivot_df.T.dot(pivot_df)
-    
-    # 归一化（可选，使热力图更明显）
-    normalized = correlation_matrix.div(correlation_matrix.sum(axis=1), axis=0)
-
-    # 可视化
-    plt.figure(figsize=(10, 8))
-    sns.heatmap(normalized, annot=True, cmap="Blues", fmt=".2f", cbar_kws={"label": "Co-Usage Frequency"})
-    plt.title("Device Co-Usage Pattern")
-
-    return fig_to_base64(plt)
+    names = dict(db.query(models.Device.id, models.Device.name)
+                   .filter(models.Device.id.in_(list(co_usage.device_seconds))).all())
+    device_ids = sorted(co_usage.device_seconds)
+    pairs = sorted(co_usage.pair_seconds, key=co_usage.pair_seconds.get, reverse=True)
+
+    return {
+        "devices": {
+            "id": device_ids,
+            "name": [names.get(device_id) for device_id in device_ids],
+            "usage_hours": [round(co_usage.device_seconds[device_id] / 3600, 4) for device_id in device_ids],
+        },
+        "pairs": {
+            "device_a": [a for a, _ in pairs],
+            "device_b": [b for _, b in pairs],
+            "overlap_hours": [round(co_usage.pair_seconds[pair] / 3600, 4) for pair in pairs],
+            "jaccard": [round(co_usage.jaccard(pair), 4) for pair in pairs],
+        },
+    }
+
+
+@cached("device_usage_patterns", USAGE_TABLES)
+def device_usage_patterns(
+    user_id: Optional[int],
+    db: Session,
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+) -> str:
+    """分析用户使用习惯，找出哪些设备经常同时使用"""
+    return rendering.render("device_usage_patterns", device_usage_patterns_data(db, user_id, start=start, end=end))
 
 
 # ------------------------------
 # 房屋面积对设备使用行为的影响
 # ------------------------------
-def house_area_device_usage(db: Session, user_id: Optional[str] = None) -> str:
+@cached("house_area_device_usage_data", USAGE_TABLES + ("users",))
+def house_area_device_usage_data(db: Session, user_id: Optional[int] = None) -> Dict[str, Any]:
+    return _area_from_profile(device_profile(db, user_id))
+
+
+def _area_from_profile(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """按 (房屋面积, 设备名称) 汇总使用次数，不计没有所属用户的设备"""
+    owned = [i for i, owner in enumerate(profile["user_id"]) if owner is not None]
+    totals = _group_sum(
+        [(profile["house_area"][i], profile["device_name"][i]) for i in owned],
+        [profile["usage_count"][i] for i in owned]
+    )
+    return {
+        "house_area": [area for area, _ in totals],
+        "device_name": [name for _, name in totals],
+        "usage_count": list(totals.values()),
+    }
+
+
+@cached("house_area_device_usage", USAGE_TABLES + ("users",))
+def house_area_device_usage(db: Session, user_id: Optional[int] = None) -> str:
     """生成房屋面积与设备使用行为的散点图并返回Base64"""
-    query = db.query(
-        models.User.house_area,
-        models.Device.name,
-        func.count(models.DeviceUsage.id).label('usage_count')
-    ).join(models.Device, models.Device.user_id == models.User.id)\
-     .join(models.DeviceUsage, models.DeviceUsage.device_id == models.Device.id)
-
-    if user_id:
-        query = query.filter(models.User.id == user_id)
-
-    usage_data = query.group_by(models.User.house_area, models.Device.name).all()
-
-    df = pd.DataFrame(usage_data, columns=["house_area", "device_name", "usage_count"])
-    
-    # 创建散点图
-    plt.figure(figsize=(10, 6))
-    sns.scatterplot(x="house_area", y="usage_count", hue="device_name", data=df, s=100)
-    plt.title("House Area vs Device Usage Behavior")
-    plt.xlabel("House Area (sq meters)")
-    plt.ylabel("Usage Count")
-    
-    # 转换为Base64并返回
-    return fig_to_base64(plt)
+    return rendering.render("house_area_device_usage", house_area_device_usage_data(db, user_id))
 
 
 # ------------------------------
 # 安防事件与设备使用的关联性分析
 # ------------------------------
-def security_event_device_correlation(db: Session, user_id: Optional[str] = None) -> str:
-    """生成安防事件与设备使用关联性的热力图并返回Base64"""
+@cached("security_event_device_correlation_data", USAGE_TABLES + ("security_events",))
+def security_event_device_correlation_data(db: Session, user_id: Optional[int] = None) -> Dict[str, Any]:
+    """各设备的安防事件数（按事件类型）与使用次数
+
+    使用次数和事件数先各自按设备聚合再关联，中间结果最多 设备数 x 事件类型数 行，
+    不会出现 使用记录 x 事件 的笛卡尔积。
+    """
+    usage_counts = _usage_counts_by_device(db)
+    event_counts = db.query(
+        models.SecurityEvent.device_id.label('device_id'),
+        models.SecurityEvent.event_type.label('event_type'),
+        func.count(models.SecurityEvent.id).label('event_count')
+    ).group_by(models.SecurityEvent.device_id, models.SecurityEvent.event_type).subquery()
+
     query = db.query(
+        models.Device.id,
         models.Device.name,
-        models.SecurityEvent.event_type,
-        func.count(models.DeviceUsage.id).label('usage_count')
-    ).join(models.Device, models.Device.id == models.DeviceUsage.device_id)\
-     .join(models.SecurityEvent, models.SecurityEvent.device_id == models.Device.id)
+        event_counts.c.event_type,
+        event_counts.c.event_count,
+        usage_counts.c.usage_count
+    ).join(usage_counts, usage_counts.c.device_id == models.Device.id)\
+     .join(event_counts, event_counts.c.device_id == models.Device.id)
 
     if user_id:
         query = query.filter(models.Device.user_id == user_id)
 
-    usage_data = query.group_by(models.Device.name, models.SecurityEvent.event_type).all()
+    rows = query.all()
+
+    # 同名设备合并为一行（与其他分析一致），行、列按名称排序
+    events = _group_sum([(row.name, row.event_type) for row in rows], [row.event_count for row in rows])
+    per_device = {row.id: (row.name, row.usage_count) for row in rows}
+    usage = _group_sum([name for name, _ in per_device.values()], [count for _, count in per_device.values()])
+    devices = sorted(usage)
+    event_types = sorted({event_type for _, event_type in events})
+
+    return {
+        "devices": devices,
+        "event_types": event_types,
+        "matrix": [[int(events.get((name, event_type), 0)) for event_type in event_types] for name in devices],
+        "usage_count": [int(usage[name]) for name in devices],
+    }
 
-    df = pd.DataFrame(usage_data, columns=["device_name", "event_type", "usage_count"])
-    df_pivot = df.pivot_table(index="device_name", columns="event_type", values="usage_count", aggfunc="sum", fill_value=0)
-    
-    # 创建热力图
-    plt.figure(figsize=(10, 6))
-    sns.heatmap(df_pivot, annot=True, cmap="YlGnBu", cbar_kws={'label': 'Usage Count'})
-    plt.title("Security Event vs Device Usage Correlation")
-    
-    # 转换为Base64并返回
-    return fig_to_base64(plt)
+
+@cached("security_event_device_correlation", USAGE_TABLES + ("security_events",))
+def security_event_device_correlation(db: Session, user_id: Optional[int] = None) -> str:
+    """生成安防事件与设备使用关联性的热力图并返回Base64"""
+    return rendering.render("security_event_device_correlation", security_event_device_correlation_data(db, user_id))
 
 
 # ------------------------------
 # 用户满意度与设备使用频率的关系
 # ------------------------------
-def satisfaction_device_usage(db: Session, user_id: Optional[str] = None) -> str:
-    """生成用户满意度与设备使用频率关系的散点图并返回Base64"""
+@cached("satisfaction_device_usage_data", USAGE_TABLES + ("user_feedback",))
+def satisfaction_device_usage_data(db: Session, user_id: Optional[int] = None) -> Dict[str, Any]:
+    """每台设备各评分的反馈数与该设备的使用次数（先分别聚合再关联，避免笛卡尔积）"""
+    usage_counts = _usage_counts_by_device(db)
+    feedback_counts = db.query(
+        models.UserFeedback.device_id.label('device_id'),
+        models.UserFeedback.rating.label('rating'),
+        func.count(models.UserFeedback.id).label('feedback_count')
+    ).group_by(models.UserFeedback.device_id, models.UserFeedback.rating).subquery()
+
     query = db.query(
-        models.UserFeedback.device_id,
+        feedback_counts.c.device_id,
         models.Device.name,
-        models.UserFeedback.rating,
-        func.count(models.DeviceUsage.id).label('usage_count')
-    ).join(models.Device, models.Device.id == models.UserFeedback.device_id)\
-     .join(models.DeviceUsage, models.DeviceUsage.device_id == models.Device.id)
+        feedback_counts.c.rating,
+        usage_counts.c.usage_count,
+        feedback_counts.c.feedback_count
+    ).join(models.Device, models.Device.id == feedback_counts.c.device_id)\
+     .join(usage_counts, usage_counts.c.device_id == feedback_counts.c.device_id)
 
     if user_id:
         query = query.filter(models.Device.user_id == user_id)
 
-    feedback_data = query.group_by(
-        models.UserFeedback.device_id,
-        models.Device.name,
-        models.UserFeedback.rating
-    ).all()
+    feedback_data = query.order_by(feedback_counts.c.device_id, feedback_counts.c.rating).all()
+
+    return _columns(feedback_data, ["device_id", "device_name", "rating", "usage_count", "feedback_count"])
 
-    df = pd.DataFrame(feedback_data, columns=["device_id", "device_name", "rating", "usage_count"])
-    
-    # 创建散点图
-    plt.figure(figsize=(10, 6))
-    sns.scatterplot(x="usage_count", y="rating", hue="device_name", data=df, s=100)
-    plt.title("Satisfaction vs Device Usage Frequency")
-    plt.xlabel("Usage Count")
-    plt.ylabel("Satisfaction Rating")
-    
-    # 转换为Base64并返回
-    return fig_to_base64(plt)
+
+@cached("satisfaction_device_usage", USAGE_TABLES + ("user_feedback",))
+def satisfaction_device_usage(db: Session, user_id: Optional[int] = None) -> str:
+    """生成用户满意度与设备使用频率关系的散点图并返回Base64"""
+    return rendering.render("satisfaction_device_usage", satisfaction_device_usage_data(db, user_id))
 
 
 # ------------------------------
 # 设备能耗分布饼图
 # ------------------------------
-def energy_consumption_distribution(db: Session, user_id: Optional[str] = None) -> str:
+@cached("energy_consumption_distribution_data", USAGE_TABLES)
+def energy_consumption_distribution_data(db: Session, user_id: Optional[int] = None) -> Dict[str, Any]:
+    return _energy_from_profile(device_profile(db, user_id))
+
+
+def _energy_from_profile(profile: Dict[str, Any]) -> Dict[str, Any]:
+    totals = _group_sum(profile["device_name"], profile["total_energy"])
+    return {"device_name": list(totals), "total_energy": list(totals.values())}
+
+
+@cached("energy_consumption_distribution", USAGE_TABLES)
+def energy_consumption_distribution(db: Session, user_id: Optional[int] = None) -> str:
     """生成设备能耗分布的饼图并返回Base64"""
-    query = db.query(
-        models.Device.name,
-        func.sum(models.DeviceUsage.energy_consumption).label('total_energy')
-    ).join(models.DeviceUsage, models.Device.id == models.DeviceUsage.device_id)
+    return rendering.render("energy_consumption_distribution", energy_consumption_distribution_data(db, user_id))
 
-    if user_id:
-        query = query.filter(models.Device.user_id == user_id)
 
-    energy_data = query.group_by(models.Device.name).all()
+# ------------------------------
+# 二进制图像（png / webp / svg）
+# ------------------------------
+IMAGE_TYPES = {"png": "image/png", "webp": "image/webp", "svg": "image/svg+xml"}
+
+
+def image_etag(chart: str, data: Dict[str, Any], *options) -> str:
+    """由图表名、聚合数据和图像参数算出的 ETag：数据不变时客户端可凭 If-None-Match 免去渲染和传输"""
+    payload = orjson.dumps([chart, data, options], option=orjson.OPT_SERIALIZE_NUMPY)
+    return hashlib.sha1(payload).hexdigest()
 
-    df = pd.DataFrame(energy_data, columns=["device_name", "total_energy"])
 
-    # 创建饼图
-    plt.figure(figsize=(8, 8))
-    plt.pie(df['total_energy'], labels=df['device_name'], autopct='%1.1f%%', startangle=140, colors=sns.color_palette("Set3", len(df)))
-    plt.title("Energy Consumption Distribution by Device")
-    
-    # 转换为Base64并返回
-    return fig_to_base64(plt)
\ No newline at end of file
+def chart_image(chart: str, data: Dict[str, Any], etag: str, *options) -> bytes:
+    """渲染二进制图像，结果按 ETag 放入分析结果缓存"""
+    key = ("chart_image", etag)
+    if ANALYTICS_CACHE_ENABLED:
+        hit, image = cache.get(key)
+        if hit:
+            return image
+    image = rendering.render_image(chart, data, *options)
+    if ANALYTICS_CACHE_ENABLED:
+        cache.put(key, image)
+    return image
+
+
+# ------------------------------
+# 仪表盘：一次请求返回多项分析
+# ------------------------------
+# 名称与各分析的路由路径一致：(图表名, 数据函数)
+DASHBOARD_ANALYSES: Dict[str, Tuple[str, Callable[..., Dict[str, Any]]]] = {
+    "device-usage-frequency": ("device_usage_frequency", device_usage_frequency_data),
+    "device_usage_time_slot": ("device_usage_time_slot", device_usage_time_slot_data),
+    "usage-patterns": ("device_usage_patterns", device_usage_patterns_data),
+    "area-impact": ("house_area_device_usage", house_area_device_usage_data),
+    "security-device-correlation": ("security_event_device_correlation", security_event_device_correlation_data),
+    "satisfaction-analysis": ("satisfaction_device_usage", satisfaction_device_usage_data),
+    "energy-consumption-distribution": ("energy_consumption_distribution", energy_consumption_distribution_data),
+}
+
+# 这几项只是设备概况的不同汇总方式，仪表盘中共用一次查询
+_FROM_PROFILE = {
+    "device-usage-frequency": _frequency_from_profile,
+    "area-impact": _area_from_profile,
+    "energy-consumption-distribution": _energy_from_profile,
+}
+
+
+def dashboard(db: Session, analyses: Sequence[str], user_id: Optional[int] = None, format: str = "chart") -> Dict[str, Any]:
+    """在同一个数据库会话中取数，再并发渲染，返回 {"results": {名称: 图表或数据}, "errors": {名称: 错误}}
+
+    SQL 聚合在调用方的会话内依次执行（Session 不能跨线程共享，也不额外占用连接）；
+    频率、面积、能耗三项由同一次设备概况查询得出。format=chart 时各图表并发提交到渲染进程池。
+    单项失败只记录在 errors 中，不影响其余分析；等不到数据库连接时直接抛出 TimeoutError。
+    """
+    results: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+
+    profile = None
+    for name in analyses:
+        try:
+            if name in _FROM_PROFILE:
+                if profile is None:
+                    profile = device_profile(db, user_id)
+                results[name] = _FROM_PROFILE[name](profile)
+            else:
+                results[name] = DASHBOARD_ANALYSES[name][1](db, user_id)
+        except PoolTimeoutError:
+            # 连接池耗尽不是单项分析的错误，整个请求返回 503（见 main.py）
+            raise
+        except Exception as e:
+            # 查询出错后事务不可用，回滚后继续后面的分析
+            db.rollback()
+            errors[name] = str(e)
+
+    if format == "chart" and results:
+        with ThreadPoolExecutor(max_workers=min(len(results), rendering.RENDER_WORKERS)) as executor:
+            futures = {
+                name: executor.submit(rendering.render, DASHBOARD_ANALYSES[name][0], data)
+                for name, data in results.items()
+            }
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                del results[name]
+                errors[name] = str(e) or type(e).__name__
+
+    return {"results": results, "errors": errors}
@@ -0,0 +1,213 @@
+# app/analytics_cache.py
+"""
+分析结果缓存
+键为 (分析名, 参数, 数据水位)，数据水位由相关表的 max(id) 和本进程的写入计数组成：
+- 本进程内的 INSERT / UPDATE / DELETE（含 text() 写入）在事务提交后让相关缓存失效；
+- 其他进程的新增数据在 ANALYTICS_WATERMARK_INTERVAL 秒内体现在 max(id) 上；
+- 其他进程的修改、删除不改变 max(id)，由 TTL 兜底。
+淘汰策略为 LRU + TTL，并限制条目数和总字节数。
+"""
+import functools
+import inspect
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+import orjson
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from app.database import async_engine, engine
+
+ANALYTICS_CACHE_ENABLED = os.getenv("ANALYTICS_CACHE_ENABLED", "true").lower() == "true"
+ANALYTICS_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", "60"))
+ANALYTICS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYTICS_CACHE_MAX_ENTRIES", "256"))
+ANALYTICS_CACHE_MAX_BYTES = int(os.getenv("ANALYTICS_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+ANALYTICS_WATERMARK_INTERVAL = float(os.getenv("ANALYTICS_WATERMARK_INTERVAL", "1"))
+
+# 参与水位计算的表
+WATERMARK_TABLES = ("users", "devices", "device_usage", "security_events", "user_feedback")
+# 汇总表没有自增 id，只按写入计数失效（会话合并只改写已有行、归档只删行，原始表的 max(id) 都不变）
+ROLLUP_TABLES = ("device_usage_hourly", "device_usage_daily")
+
+
+# ------------------------------
+# 数据水位
+# ------------------------------
+class _Watermarks:
+    """各表的 max(id)（按间隔刷新）与本进程写入计数；counted_only 中的表只有写入计数"""
+
+    def __init__(self, tables: Sequence[str], interval: float, counted_only: Sequence[str] = ()):
+        self.tables = tuple(tables)
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._max_ids: Dict[str, Optional[int]] = {}
+        self._refreshed_at = 0.0
+        self._generations: Dict[str, int] = {table: 0 for table in self.tables + tuple(counted_only)}
+        self._query = text("SELECT " + ", ".join(f"(SELECT max(id) FROM {table})" for table in self.tables))
+
+    def bump(self, table: str):
+        with self._lock:
+            if table in self._generations:
+                self._generations[table] += 1
+
+    def current(self, db: Session, tables: Sequence[str]) -> Tuple:
+        now = time.monotonic()
+        if now - self._refreshed_at >= self.interval:
+            row = db.execute(self._query).one()
+            with self._lock:
+                self._max_ids = dict(zip(self.tables, row))
+                self._refreshed_at = now
+        with self._lock:
+            return tuple((table, self._max_ids.get(table), self._generations[table]) for table in tables)
+
+
+watermarks = _Watermarks(WATERMARK_TABLES, ANALYTICS_WATERMARK_INTERVAL, ROLLUP_TABLES)
+
+
+# 写入计数在提交之后才增加：若在执行时增加，并发的读请求可能用新水位读到提交前的数据并一直缓存到 TTL
+# 执行写语句时把表名记在连接上，提交时转入已提交集合、回滚时丢弃，连接归还连接池（已提交完成）时再计数
+_PENDING = "analytics_cache_pending"
+_COMMITTED = "analytics_cache_committed"
+# text() 写入（小时汇总回填、冷归档、去重等）没有 Core 语句对象，按 SQL 开头识别目标表
+_TEXT_DML = re.compile(r'^\s*(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM)\s+"?(\w+)', re.IGNORECASE)
+
+
+def _written_table(context, statement: str) -> Optional[str]:
+    if context.isinsert or context.isupdate or context.isdelete:
+        table = getattr(context.compiled.statement, "table", None)
+        return table.name if table is not None else None
+    match = _TEXT_DML.match(statement)
+    return match.group(1) if match else None
+
+
+def _track_writes(conn, cursor, statement, parameters, context, executemany):
+    table = _written_table(context, statement) if context is not None else None
+    if table is not None:
+        conn.info.setdefault(_PENDING, set()).add(table)
+
+
+def _track_commit(conn):
+    pending = conn.info.pop(_PENDING, None)
+    if pending:
+        conn.info.setdefault(_COMMITTED, set()).update(pending)
+
+
+def _track_rollback(conn):
+    conn.info.pop(_PENDING, None)
+
+
+def _bump_committed(dbapi_connection, connection_record):
+    connection_record.info.pop(_PENDING, None)  # 未提交的写入已随连接归还被回滚
+    for table in connection_record.info.pop(_COMMITTED, ()):
+        watermarks.bump(table)
+
+
+for _engine in (engine, async_engine.sync_engine):
+    event.listen(_engine, "after_cursor_execute", _track_writes)
+    event.listen(_engine, "commit", _track_commit)
+    event.listen(_engine, "rollback", _track_rollback)
+    event.listen(_engine, "checkin", _bump_committed)
+
+
+# ------------------------------
+# LRU + TTL 缓存
+# ------------------------------
+def _sizeof(value: Any) -> int:
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    return len(orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY))
+
+
+class ResultCache:
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple, Tuple[Any, int, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    def get(self, key: Tuple) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return False, None
+            value, size, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return True, value
+
+    def put(self, key: Tuple, value: Any):
+        size = _sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.monotonic() + self.ttl)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key: Tuple):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_s": self.ttl,
+                "enabled": ANALYTICS_CACHE_ENABLED,
+            }
+
+
+cache = ResultCache(ANALYTICS_CACHE_TTL, ANALYTICS_CACHE_MAX_ENTRIES, ANALYTICS_CACHE_MAX_BYTES)
+
+
+def cached(name: str, tables: Sequence[str]):
+    """缓存分析函数的结果；被装饰函数需有 db 参数，其余参数都计入缓存键"""
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ANALYTICS_CACHE_ENABLED:
+                return func(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            db = bound.arguments["db"]
+            params = tuple(sorted((k, v) for k, v in bound.arguments.items() if k != "db"))
+            key = (name, params, watermarks.current(db, tables))
+            hit, value = cache.get(key)
+            if hit:
+                return value
+            value = func(*args, **kwargs)
+            cache.put(key, value)
+            return value
+
+        return wrapper
+    return decorator
+
+
+def stats() -> Dict[str, Any]:
+    return cache.stats()
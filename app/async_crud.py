@@ -0,0 +1,109 @@
+# app/async_crud.py
+"""
+高频 CRUD 的异步版本（AsyncSession + asyncpg），参数与返回值和 app/crud.py 中的同名函数一致
+读取直接用 select() 查询；使用记录的写入要维护小时汇总、合并会话，
+通过 AsyncSession.run_sync 在同一个连接上复用同步实现，不另占线程。
+"""
+import datetime
+from typing import Any, List, Optional
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import crud, models, schemas
+from app.pagination import paginate_select
+
+
+async def _first(db: AsyncSession, stmt: Select):
+    return (await db.execute(stmt.limit(1))).scalars().first()
+
+
+async def _page(
+    db: AsyncSession,
+    model: Any,
+    conditions: List[Any],
+    skip: int,
+    limit: int,
+    after_id: Optional[int],
+    as_rows: bool,
+) -> List[Any]:
+    """按 id 分页；as_rows=True 时返回列元组（列表接口的快速序列化模式使用）"""
+    stmt = select(*model.__table__.columns) if as_rows else select(model)
+    stmt = paginate_select(stmt.where(*conditions), model.id, skip, limit, after_id)
+    result = await db.execute(stmt)
+    return result.all() if as_rows else result.scalars().all()
+
+
+# ------------------------
+# User
+# ------------------------
+
+async def get_user(db: AsyncSession, user_id: int):
+    return await _first(db, select(models.User).where(models.User.id == user_id))
+
+async def get_users(db: AsyncSession, skip: int = 0, limit: int = 100, after_id: Optional[int] = None, as_rows: bool = False):
+    return await _page(db, models.User, [], skip, limit, after_id, as_rows)
+
+# ------------------------
+# Device
+# ------------------------
+
+async def get_device(db: AsyncSession, device_id: int):
+    return await _first(db, select(models.Device).where(models.Device.id == device_id))
+
+async def get_devices(db: AsyncSession, skip: int = 0, limit: int = 100, user_id: Optional[int] = None, after_id: Optional[int] = None, as_rows: bool = False):
+    conditions = [models.Device.user_id == user_id] if user_id else []
+    return await _page(db, models.Device, conditions, skip, limit, after_id, as_rows)
+
+# ------------------------
+# DeviceUsage
+# ------------------------
+
+async def get_usage(db: AsyncSession, usage_id: int):
+    return await _first(db, select(models.DeviceUsage).where(models.DeviceUsage.id == usage_id))
+
+async def get_usages(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Optional[int] = None,
+    device_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    as_rows: bool = False,
+):
+    conditions = crud.usage_conditions(device_id, user_id, start, end)
+    return await _page(db, models.DeviceUsage, conditions, skip, limit, after_id, as_rows)
+
+async def create_usage(db: AsyncSession, usage: schemas.DeviceUsageCreate):
+    """幂等写入（同 crud.create_usage，含小时汇总维护与会话合并）"""
+    return await db.run_sync(crud.create_usage, usage)
+
+# ------------------------
+# SecurityEvent
+# ------------------------
+
+async def get_event(db: AsyncSession, event_id: int):
+    return await _first(db, select(models.SecurityEvent).where(models.SecurityEvent.id == event_id))
+
+async def get_events(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Optional[int] = None,
+    device_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    event_type: Optional[str] = None,
+    severity: Optional[str] = None,
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    as_rows: bool = False,
+):
+    conditions = crud.event_conditions(device_id, user_id, event_type, severity, start, end)
+    return await _page(db, models.SecurityEvent, conditions, skip, limit, after_id, as_rows)
+
+async def create_event(db: AsyncSession, event: schemas.SecurityEventCreate):
+    db_event = models.SecurityEvent(**event.dict())
+    db.add(db_event)
+    await db.commit()
+    await db.refresh(db_event)
+    return db_event
@@ -0,0 +1,195 @@
+# app/charts.py
+"""
+图表绘制（在渲染进程池的工作进程中执行）
+只使用面向对象的 Figure API，不触碰 pyplot 的全局状态；
+输入是 analytics 聚合好的纯数据（可 pickle 的 dict / list），输出是图像字节。
+"""
+import io
+import base64
+from typing import Any, Callable, Dict, Optional
+import matplotlib
+import pandas as pd
+import seaborn as sns
+from matplotlib.figure import Figure
+
+# 设置 Matplotlib 使用中文字体
+matplotlib.rcParams['font.sans-serif'] = ['SimHei']  # 指定中文字体
+matplotlib.rcParams['axes.unicode_minus'] = False  # 解决负号显示问题
+
+
+# ------------------------------
+# 工具函数：生成Base64图像
+# ------------------------------
+def fig_to_bytes(fig: Figure, format: str = "png", dpi: Optional[float] = None) -> bytes:
+    """将图表保存为指定格式（png / webp / svg）的字节"""
+    buf = io.BytesIO()
+    fig.savefig(buf, format=format, dpi=dpi)
+    return buf.getvalue()
+
+
+def fig_to_base64(fig: Figure) -> str:
+    """将图表转换为base64编码"""
+    return base64.b64encode(fig_to_bytes(fig)).decode("utf-8")
+
+
+def resize(fig: Figure, width: Optional[int] = None, height: Optional[int] = None, dpi: Optional[float] = None) -> float:
+    """按像素设置图表尺寸，只给宽或高时保持原宽高比；返回实际使用的 DPI
+
+    未指定 dpi 时按比例缩放 DPI 而不改变图表的英寸尺寸，缩略图中的文字与图形一起缩小，版面不变。
+    """
+    if not (width or height):
+        return dpi or fig.dpi
+    current_w, current_h = fig.get_size_inches()
+    if dpi is None:
+        dpi = min(width / current_w if width else float("inf"), height / current_h if height else float("inf"))
+    w = width / dpi if width else current_w * (height / dpi) / current_h
+    h = height / dpi if height else current_h * w / current_w
+    fig.set_size_inches(w, h)
+    return dpi
+
+
+# ------------------------------
+# 各类图表
+# ------------------------------
+def device_usage_frequency(data: Dict[str, Any]) -> Figure:
+    """设备使用频率柱状图"""
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    sns.barplot(x="usage_count", y="device_name", data=pd.DataFrame(data), palette="Blues_d", ax=ax)
+    ax.set_title("Device Usage Frequency")
+    ax.set_xlabel("Usage Count")
+    ax.set_ylabel("Device Name")
+    return fig
+
+
+def device_usage_time_slot(data: Dict[str, Any]) -> Figure:
+    """设备按小时的使用分布线形图（工作日/周末分开时左右两个子图）"""
+    names = list(data["series"])
+    fig = Figure(figsize=(10 * len(names), 6))
+    axes = fig.subplots(1, len(names), squeeze=False, sharey=True)[0]
+    ylabel = "Usage Hours" if data["weight"] == "duration" else "Usage Count"
+    for ax, name in zip(axes, names):
+        df = pd.DataFrame([
+            {"hour": hour, "device_name": device_name, "value": value}
+            for device_name, row in zip(data["device_name"], data["series"][name])
+            for hour, value in zip(data["hours"], row)
+        ], columns=["hour", "device_name", "value"])
+        sns.lineplot(x="hour", y="value", data=df, hue="device_name", marker="o", ax=ax)
+        ax.set_title("Device Usage by Hour of the Day" + ("" if name == "all" else f" ({name.capitalize()})"))
+        ax.set_xlabel("Hour of the Day")
+        ax.set_ylabel(ylabel)
+        ax.set_xticks(data["hours"])
+    return fig
+
+
+def device_usage_patterns(data: Dict[str, Any], max_devices: int = 20) -> Figure:
+    """设备共现使用热力图（值为重叠时长的 Jaccard 系数，只画重叠最多的 max_devices 台设备）"""
+    pairs = data["pairs"]
+    names = dict(zip(data["devices"]["id"], data["devices"]["name"]))
+    weight: Dict[int, float] = {}
+    for a, b, hours in zip(pairs["device_a"], pairs["device_b"], pairs["overlap_hours"]):
+        weight[a] = weight.get(a, 0.0) + hours
+        weight[b] = weight.get(b, 0.0) + hours
+    shown = sorted(weight, key=weight.get, reverse=True)[:max_devices] or data["devices"]["id"][:max_devices]
+    labels = [f"{names[device_id]}#{device_id}" for device_id in shown]
+
+    matrix = pd.DataFrame(0.0, index=labels, columns=labels)
+    position = dict(zip(shown, labels))
+    for a, b, score in zip(pairs["device_a"], pairs["device_b"], pairs["jaccard"]):
+        if a in position and b in position:
+            matrix.loc[position[a], position[b]] = score
+            matrix.loc[position[b], position[a]] = score
+
+    fig = Figure(figsize=(10, 8))
+    ax = fig.subplots()
+    sns.heatmap(matrix, annot=True, cmap="Blues", fmt=".2f", cbar_kws={"label": "Co-Usage (Overlap Jaccard)"}, ax=ax)
+    ax.set_title("Device Co-Usage Pattern")
+    return fig
+
+
+def house_area_device_usage(data: Dict[str, Any]) -> Figure:
+    """房屋面积与设备使用行为散点图"""
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    sns.scatterplot(x="house_area", y="usage_count", hue="device_name", data=pd.DataFrame(data), s=100, ax=ax)
+    ax.set_title("House Area vs Device Usage Behavior")
+    ax.set_xlabel("House Area (sq meters)")
+    ax.set_ylabel("Usage Count")
+    return fig
+
+
+def security_event_device_correlation(data: Dict[str, Any]) -> Figure:
+    """安防事件与设备使用关联性热力图（行标签附设备使用次数）"""
+    rows = [f"{name} ({count})" for name, count in zip(data["devices"], data["usage_count"])]
+    matrix = pd.DataFrame(data["matrix"], index=rows, columns=data["event_types"])
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    sns.heatmap(matrix, annot=True, fmt="d", cmap="YlGnBu", cbar_kws={'label': 'Event Count'}, ax=ax)
+    ax.set_title("Security Event vs Device Usage Correlation")
+    ax.set_ylabel("Device (Usage Count)")
+    return fig
+
+
+def satisfaction_device_usage(data: Dict[str, Any]) -> Figure:
+    """用户满意度与设备使用频率散点图（点大小为该评分的反馈数）"""
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    sns.scatterplot(
+        x="usage_count", y="rating", hue="device_name", size="feedback_count", sizes=(50, 300),
+        data=pd.DataFrame(data), ax=ax
+    )
+    ax.set_title("Satisfaction vs Device Usage Frequency")
+    ax.set_xlabel("Usage Count")
+    ax.set_ylabel("Satisfaction Rating")
+    return fig
+
+
+def energy_consumption_distribution(data: Dict[str, Any]) -> Figure:
+    """设备能耗分布饼图"""
+    fig = Figure(figsize=(8, 8))
+    ax = fig.subplots()
+    ax.pie(
+        data["total_energy"], labels=data["device_name"], autopct='%1.1f%%',
+        startangle=140, colors=sns.color_palette("Set3", len(data["device_name"]))
+    )
+    ax.set_title("Energy Consumption Distribution by Device")
+    return fig
+
+
+CHARTS: Dict[str, Callable[[Dict[str, Any]], Figure]] = {
+    "device_usage_frequency": device_usage_frequency,
+    "device_usage_time_slot": device_usage_time_slot,
+    "device_usage_patterns": device_usage_patterns,
+    "house_area_device_usage": house_area_device_usage,
+    "security_event_device_correlation": security_event_device_correlation,
+    "satisfaction_device_usage": satisfaction_device_usage,
+    "energy_consumption_distribution": energy_consumption_distribution,
+}
+
+
+def render_base64(chart: str, data: Dict[str, Any]) -> str:
+    """绘制图表并返回 Base64 PNG；无论成功与否都释放 Figure"""
+    fig = CHARTS[chart](data)
+    try:
+        return fig_to_base64(fig)
+    finally:
+        fig.clear()
+
+
+def render_image(
+    chart: str,
+    data: Dict[str, Any],
+    format: str = "png",
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+    dpi: Optional[float] = None,
+) -> bytes:
+    """绘制图表并返回指定格式、尺寸（像素）与 DPI 的图像字节"""
+    fig = CHARTS[chart](data)
+    try:
+        dpi = resize(fig, width, height, dpi)
+        # 宽高比改变时用紧凑布局，避免坐标轴标签被裁掉
+        fig.set_layout_engine("tight")
+        return fig_to_bytes(fig, format, dpi)
+    finally:
+        fig.clear()
@@ -0,0 +1,156 @@
+# app/compaction.py
+"""
+使用记录冷归档（降采样）
+早于 USAGE_ARCHIVE_AFTER_DAYS 天的原始使用记录按天、按批（USAGE_ARCHIVE_BATCH_SIZE 行）处理：
+1. 原始记录写成 zstd 压缩的 Parquet 文件并落盘：{USAGE_ARCHIVE_DIR}/device_usage/YYYY-MM/YYYY-MM-DD_<首个 id>.parquet；
+2. 同一事务内累加到每日汇总表 device_usage_daily、从小时汇总表扣除、删除原始记录。
+任何时刻 每日汇总 + 小时汇总 都覆盖全部历史，分析接口合并两表统计，归档前后结果一致。
+中途失败可直接重跑：已提交的批次不会再被选中，未提交批次的 Parquet 文件会被同名覆盖。
+"""
+import datetime
+import logging
+import os
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+from sqlalchemy import literal_column, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from app import export, models, rollups
+
+logger = logging.getLogger(__name__)
+
+USAGE_ARCHIVE_AFTER_DAYS = int(os.getenv("USAGE_ARCHIVE_AFTER_DAYS", "365"))
+USAGE_ARCHIVE_DIR = os.getenv("USAGE_ARCHIVE_DIR", "archive")
+USAGE_ARCHIVE_BATCH_SIZE = int(os.getenv("USAGE_ARCHIVE_BATCH_SIZE", "5000"))
+
+DAILY = models.DeviceUsageDaily.__table__
+USAGE = export.DATASETS["usage"]
+_LOCK_KEY = 0x5348_4152  # advisory lock 键，避免两个归档任务同时运行
+
+# 批内行锁定到提交为止，API 不能在写 Parquet 与删除之间修改这些记录
+_SELECT_BATCH = text("""
+    SELECT id, device_id, user_id, start_time, end_time, energy_consumption
+    FROM device_usage
+    WHERE start_time >= :lo AND start_time < :hi
+    ORDER BY id
+    LIMIT :limit
+    FOR UPDATE
+""")
+_DELETE_BATCH = text("DELETE FROM device_usage WHERE id = ANY(:ids) AND start_time >= :lo AND start_time < :hi")
+
+
+def archive_cutoff(days: int = USAGE_ARCHIVE_AFTER_DAYS, today: Optional[datetime.date] = None) -> datetime.datetime:
+    """归档界限：今天零点往前 days 天，start_time 早于它的记录会被归档"""
+    today = today or datetime.datetime.utcnow().date()
+    return datetime.datetime.combine(today - datetime.timedelta(days=days), datetime.time())
+
+
+def archive_path(directory: str, day: datetime.date, first_id: int) -> str:
+    return os.path.join(directory, USAGE.name, f"{day:%Y-%m}", f"{day:%Y-%m-%d}_{first_id}.parquet")
+
+
+# ------------------------------
+# 每日汇总
+# ------------------------------
+def daily_values(usages: Iterable[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+    """把一批使用记录聚合为 (设备, 日期) 行，含 24 小时分布"""
+    days: Dict[Tuple[int, datetime.date], Dict[str, Any]] = {}
+    for usage in usages:
+        if usage["device_id"] is None:
+            continue
+        start = usage["start_time"]
+        row = days.get((usage["device_id"], start.date()))
+        if row is None:
+            row = days[(usage["device_id"], start.date())] = {
+                "device_id": usage["device_id"], "day": start.date(),
+                "session_count": 0, "total_duration_s": 0.0, "total_energy": 0.0,
+                "hour_counts": [0] * 24, "hour_duration_s": [0.0] * 24,
+            }
+        duration = (usage["end_time"] - start).total_seconds()
+        row["session_count"] += 1
+        row["total_duration_s"] += duration
+        row["total_energy"] += usage["energy_consumption"] or 0.0
+        row["hour_counts"][start.hour] += 1
+        row["hour_duration_s"][start.hour] += duration
+    return list(days.values())
+
+
+def _add_arrays(column: str):
+    """逐项相加已有行与新行的 24 小时分布"""
+    return literal_column(
+        f"ARRAY(SELECT a + b FROM unnest(device_usage_daily.{column}, excluded.{column}) "
+        f"WITH ORDINALITY AS t(a, b, i) ORDER BY i)"
+    )
+
+
+def apply_daily(db: Session, usages: Iterable[Mapping[str, Any]]):
+    """把一批使用记录累加到每日汇总表（在调用方的事务内执行）"""
+    rows = daily_values(usages)
+    if not rows:
+        return
+    stmt = pg_insert(DAILY)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DAILY.c.device_id, DAILY.c.day],
+        set_={
+            "session_count": DAILY.c.session_count + stmt.excluded.session_count,
+            "total_duration_s": DAILY.c.total_duration_s + stmt.excluded.total_duration_s,
+            "total_energy": DAILY.c.total_energy + stmt.excluded.total_energy,
+            "hour_counts": _add_arrays("hour_counts"),
+            "hour_duration_s": _add_arrays("hour_duration_s"),
+        },
+    )
+    db.execute(stmt, rows)
+
+
+# ------------------------------
+# 归档
+# ------------------------------
+def archive_day(engine: Engine, day: datetime.date, directory: str, batch_size: int) -> Dict[str, int]:
+    """归档某一天的全部原始使用记录，每批一个 Parquet 文件、一个事务"""
+    lo = datetime.datetime.combine(day, datetime.time())
+    bounds = {"lo": lo, "hi": lo + datetime.timedelta(days=1)}
+    totals = {"rows": 0, "files": 0, "bytes": 0}
+    while True:
+        with Session(engine) as db:
+            batch = db.execute(_SELECT_BATCH, {**bounds, "limit": batch_size}).all()
+            if not batch:
+                break
+            totals["bytes"] += export.write_parquet(USAGE, batch, archive_path(directory, day, batch[0].id))
+            usages = [row._mapping for row in batch]
+            apply_daily(db, usages)
+            rollups.apply_usage_deltas(db, usages, sign=-1)
+            db.execute(_DELETE_BATCH, {**bounds, "ids": [row.id for row in batch]})
+            db.commit()
+        totals["rows"] += len(batch)
+        totals["files"] += 1
+    return totals
+
+
+def compact_usage(
+    engine: Engine,
+    days: int = USAGE_ARCHIVE_AFTER_DAYS,
+    directory: str = USAGE_ARCHIVE_DIR,
+    batch_size: int = USAGE_ARCHIVE_BATCH_SIZE,
+    today: Optional[datetime.date] = None,
+) -> Dict[str, Any]:
+    """归档早于 days 天的原始使用记录；另一个归档任务正在运行时直接返回"""
+    cutoff = archive_cutoff(days, today)
+    result: Dict[str, Any] = {"skipped": False, "cutoff": cutoff.isoformat(), "days": 0, "rows": 0, "files": 0, "bytes": 0}
+    with engine.connect() as lock_conn:
+        if not lock_conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": _LOCK_KEY}).scalar():
+            return {**result, "skipped": True}
+        try:
+            pending = lock_conn.execute(text(
+                "SELECT DISTINCT CAST(start_time AS date) FROM device_usage WHERE start_time < :cutoff ORDER BY 1"
+            ), {"cutoff": cutoff}).scalars().all()
+            lock_conn.commit()
+            for day in pending:
+                totals = archive_day(engine, day, directory, batch_size)
+                result["days"] += 1
+                for key, value in totals.items():
+                    result[key] += value
+                logger.info("%s: 归档 %d 条使用记录（%d 个文件，%d 字节）", day, totals["rows"], totals["files"], totals["bytes"])
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _LOCK_KEY})
+            lock_conn.commit()
+    return result
@@ -0,0 +1,81 @@
+# app/cousage.py
+"""
+设备共现使用挖掘（扫描线）
+对每个用户按开始时间顺序扫描使用区间 [start_time, end_time)，用以结束时间为键的小顶堆维护
+“当前仍在使用”的区间；新区间到来时先弹出已结束的区间，再与堆中其余区间逐一累加真实重叠时长。
+同一设备自身重叠的区间先合并（裁掉该设备已覆盖的部分），设备时长与设备对重叠时长都不重复计算。
+复杂度 O(n log n + 重叠对数)，内存只与同时活跃的区间数和出现过的设备对数有关。
+"""
+import datetime
+import heapq
+from typing import Dict, Iterable, Optional, Tuple
+
+# (user_id, device_id, start_time, end_time)，需按 (user_id, start_time) 排序
+Interval = Tuple[int, int, datetime.datetime, datetime.datetime]
+Pair = Tuple[int, int]
+
+
+class CoUsage:
+    """累加结果：各设备总使用时长与设备对（device_a < device_b）的重叠时长，单位秒"""
+
+    def __init__(self):
+        self.device_seconds: Dict[int, float] = {}
+        self.pair_seconds: Dict[Pair, float] = {}
+
+    def jaccard(self, pair: Pair) -> float:
+        """重叠时长 / 两设备合并使用时长"""
+        a, b = pair
+        overlap = self.pair_seconds[pair]
+        union = self.device_seconds[a] + self.device_seconds[b] - overlap
+        return overlap / union if union > 0 else 0.0
+
+
+def sweep(
+    intervals: Iterable[Interval],
+    window_start: Optional[datetime.datetime] = None,
+    window_end: Optional[datetime.datetime] = None,
+) -> CoUsage:
+    """扫描按 (user_id, start_time) 排序的区间，统计真实重叠时长；区间先裁剪到时间窗口内"""
+    result = CoUsage()
+    active = []  # 小顶堆：(end_time, 序号, 裁剪后的 start_time, device_id)
+    covered: Dict[int, datetime.datetime] = {}  # 当前用户下各设备已计入区间的最晚结束时间
+    current_user = None
+    sequence = 0
+
+    for user, device, start, end in intervals:
+        if window_start is not None and start < window_start:
+            start = window_start
+        if window_end is not None and end > window_end:
+            end = window_end
+        if end <= start:
+            continue
+
+        if user != current_user:
+            active.clear()
+            covered.clear()
+            current_user = user
+
+        # 输入按开始时间排序，结束时间不晚于当前开始时间的区间不会再与后续区间重叠
+        while active and active[0][0] <= start:
+            heapq.heappop(active)
+
+        # 与同一设备之前的区间合并：已覆盖的部分不再计入
+        begin = max(start, covered.get(device, start))
+        if end <= begin:
+            continue
+        covered[device] = end
+
+        for other_end, _, other_begin, other_device in active:
+            if other_device == device:
+                continue
+            overlap = (min(end, other_end) - max(begin, other_begin)).total_seconds()
+            if overlap <= 0:
+                continue
+            pair = (device, other_device) if device < other_device else (other_device, device)
+            result.pair_seconds[pair] = result.pair_seconds.get(pair, 0.0) + overlap
+
+        result.device_seconds[device] = result.device_seconds.get(device, 0.0) + (end - begin).total_seconds()
+        sequence += 1
+        heapq.heappush(active, (end, sequence, begin, device))
+
+    return result
@@ -1,6 +1,11 @@
+import datetime
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from app import models, schemas
+from typing import Any, Iterable, List, Optional, Set
+from app import models, rollups, schemas, sessions
+from app.pagination import paginate
 
 # ------------------------
 # User CRUD (已完成)
@@ -12,8 +17,16 @@ def get_user(db: Session, user_id: int):
 def get_user_by_email(db: Session, email: str):
     return db.query(models.User).filter(models.User.email == email).first()
 
-def get_users(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.User).offset(skip).limit(limit).all()
+def get_users(db: Session, skip: int = 0, limit: int = 100, after_id: Optional[int] = None, as_rows: bool = False):
+    columns = models.User.__table__.columns if as_rows else None
+    return paginate(db.query(models.User), models.User.id, skip, limit, after_id, columns)
+
+def get_existing_user_ids(db: Session, user_ids: Iterable[int]) -> Set[int]:
+    ids = set(user_ids)
+    if not ids:
+        return set()
+    rows = db.query(models.User.id).filter(models.User.id.in_(ids)).all()
+    return {row.id for row in rows}
 
 def create_user(db: Session, user: schemas.UserCreate):
     db_user = models.User(**user.dict())
@@ -45,11 +58,19 @@ def delete_user(db: Session, user_id: int):
 def get_device(db: Session, device_id: int):
     return db.query(models.Device).filter(models.Device.id == device_id).first()
 
-def get_devices(db: Session, skip: int = 0, limit: int = 100, user_id: Optional[int] = None):
+def get_existing_device_ids(db: Session, device_ids: Iterable[int]) -> Set[int]:
+    ids = set(device_ids)
+    if not ids:
+        return set()
+    rows = db.query(models.Device.id).filter(models.Device.id.in_(ids)).all()
+    return {row.id for row in rows}
+
+def get_devices(db: Session, skip: int = 0, limit: int = 100, user_id: Optional[int] = None, after_id: Optional[int] = None, as_rows: bool = False):
     query = db.query(models.Device)
     if user_id:
         query = query.filter(models.Device.user_id == user_id)
-    return query.offset(skip).limit(limit).all()
+    columns = models.Device.__table__.columns if as_rows else None
+    return paginate(query, models.Device.id, skip, limit, after_id, columns)
 
 def create_device(db: Session, device: schemas.DeviceCreate):
     db_device = models.Device(**device.dict())
@@ -81,28 +102,129 @@ def delete_device(db: Session, device_id: int):
 def get_usage(db: Session, usage_id: int):
     return db.query(models.DeviceUsage).filter(models.DeviceUsage.id == usage_id).first()
 
-def get_usages(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.DeviceUsage).offset(skip).limit(limit).all()
+def usage_conditions(
+    device_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+) -> List[Any]:
+    """按设备、用户、开始时间区间 [start, end) 过滤使用记录的条件（同步与异步查询共用）"""
+    conditions = []
+    if device_id is not None:
+        conditions.append(models.DeviceUsage.device_id == device_id)
+    if user_id is not None:
+        conditions.append(models.DeviceUsage.user_id == user_id)
+    if start is not None:
+        conditions.append(models.DeviceUsage.start_time >= start)
+    if end is not None:
+        conditions.append(models.DeviceUsage.start_time < end)
+    return conditions
+
+def usage_query(
+    db: Session,
+    device_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+):
+    """按设备、用户、开始时间区间 [start, end) 过滤的使用记录查询"""
+    return db.query(models.DeviceUsage).filter(*usage_conditions(device_id, user_id, start, end))
+
+def get_usages(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Optional[int] = None,
+    device_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    as_rows: bool = False,
+):
+    """as_rows=True 时返回列元组而不是 ORM 实体（列表接口的快速序列化模式使用）"""
+    query = usage_query(db, device_id=device_id, user_id=user_id, start=start, end=end)
+    columns = models.DeviceUsage.__table__.columns if as_rows else None
+    return paginate(query, models.DeviceUsage.id, skip, limit, after_id, columns)
+
+def get_usage_by_natural_key(db: Session, device_id: int, start_time: datetime.datetime):
+    return db.query(models.DeviceUsage).filter(
+        models.DeviceUsage.device_id == device_id,
+        models.DeviceUsage.start_time == start_time
+    ).first()
+
+def _usage_upsert():
+    # (device_id, start_time) 冲突时什么也不做，重复上报成为无副作用的空操作
+    return pg_insert(models.DeviceUsage).on_conflict_do_nothing(
+        index_elements=[models.DeviceUsage.device_id, models.DeviceUsage.start_time]
+    )
 
 def create_usage(db: Session, usage: schemas.DeviceUsageCreate):
-    db_usage = models.DeviceUsage(**usage.dict())
-    db.add(db_usage)
+    """幂等写入：记录已存在时直接返回已有记录；开启会话化时返回合并后所在的记录"""
+    values = usage.dict()
+    if sessions.USAGE_SESSIONIZE_ON_INGEST:
+        session = sessions.merge_on_ingest(db, [values])[0]
+        db.commit()
+        return get_usage(db, session["id"])
+    stmt = _usage_upsert().returning(models.DeviceUsage.id)
+    usage_id = db.execute(stmt, values).scalar()
+    if usage_id is not None:
+        rollups.apply_usage_deltas(db, [values])
     db.commit()
-    db.refresh(db_usage)
-    return db_usage
+    if usage_id is None:
+        return get_usage_by_natural_key(db, usage.device_id, usage.start_time)
+    return get_usage(db, usage_id)
+
+def create_usages_bulk(db: Session, usages: List[schemas.DeviceUsageCreate]) -> List[int]:
+    """批量幂等写入：多行 INSERT ... ON CONFLICT DO NOTHING，单事务提交
+
+    返回新插入记录的 id（按输入顺序），已存在或批内重复的记录被跳过。
+    开启会话化时返回新增或被合并改写的会话 id（每个会话一次），被已有会话完全覆盖的记录同样跳过。
+    """
+    rows = {}
+    for usage in usages:
+        values = usage.dict()
+        # 键要与 RETURNING 读回的值一致：写入值与键都用不带时区的 UTC 时间
+        values["start_time"] = schemas.naive_utc(values["start_time"])
+        values["end_time"] = schemas.naive_utc(values["end_time"])
+        rows.setdefault((values["device_id"], values["start_time"]), values)
+    if not rows:
+        return []
+    if sessions.USAGE_SESSIONIZE_ON_INGEST:
+        written = {}
+        for session in sessions.merge_on_ingest(db, list(rows.values())):
+            if session["written"]:
+                written.setdefault(session["id"], None)
+        db.commit()
+        return list(written)
+    stmt = _usage_upsert().returning(
+        models.DeviceUsage.id, models.DeviceUsage.device_id, models.DeviceUsage.start_time
+    )
+    inserted = {(row.device_id, row.start_time): row.id for row in db.execute(stmt, list(rows.values()))}
+    rollups.apply_usage_deltas(db, [rows[key] for key in inserted])
+    db.commit()
+    return [inserted[key] for key in rows if key in inserted]
 
 def update_usage(db: Session, usage_id: int, usage: schemas.DeviceUsageCreate):
-    db_usage = db.query(models.DeviceUsage).filter(models.DeviceUsage.id == usage_id).first()
+    """更新使用记录；改到与其他记录相同的 (device_id, start_time) 时抛出 IntegrityError"""
+    # 锁住该行再读取旧值，保证并发修改时汇总表的增减量一致
+    db_usage = db.query(models.DeviceUsage).filter(models.DeviceUsage.id == usage_id).with_for_update().first()
     if db_usage:
+        rollups.apply_usage_deltas(db, [rollups.usage_values(db_usage)], sign=-1)
         for key, value in usage.dict(exclude_unset=True).items():
             setattr(db_usage, key, value)
-        db.commit()
+        rollups.apply_usage_deltas(db, [rollups.usage_values(db_usage)])
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            raise
         db.refresh(db_usage)
     return db_usage
 
 def delete_usage(db: Session, usage_id: int):
-    db_usage = db.query(models.DeviceUsage).filter(models.DeviceUsage.id == usage_id).first()
+    db_usage = db.query(models.DeviceUsage).filter(models.DeviceUsage.id == usage_id).with_for_update().first()
     if db_usage:
+        rollups.apply_usage_deltas(db, [rollups.usage_values(db_usage)], sign=-1)
         db.delete(db_usage)
         db.commit()
     return db_usage
@@ -114,8 +236,65 @@ def delete_usage(db: Session, usage_id: int):
 def get_event(db: Session, event_id: int):
     return db.query(models.SecurityEvent).filter(models.SecurityEvent.id == event_id).first()
 
-def get_events(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.SecurityEvent).offset(skip).limit(limit).all()
+def event_conditions(
+    device_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    event_type: Optional[str] = None,
+    severity: Optional[str] = None,
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+) -> List[Any]:
+    """按设备、所属用户、事件类型、严重程度、时间区间 [start, end) 过滤安防事件的条件（同步与异步查询共用）"""
+    conditions = []
+    if device_id is not None:
+        conditions.append(models.SecurityEvent.device_id == device_id)
+    if user_id is not None:
+        conditions.append(models.SecurityEvent.device_id.in_(
+            select(models.Device.id).where(models.Device.user_id == user_id)
+        ))
+    if event_type is not None:
+        conditions.append(models.SecurityEvent.event_type == event_type)
+    if severity is not None:
+        conditions.append(models.SecurityEvent.severity == severity)
+    if start is not None:
+        conditions.append(models.SecurityEvent.timestamp >= start)
+    if end is not None:
+        conditions.append(models.SecurityEvent.timestamp < end)
+    return conditions
+
+def event_query(
+    db: Session,
+    device_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    event_type: Optional[str] = None,
+    severity: Optional[str] = None,
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+):
+    """按设备、所属用户、事件类型、严重程度、时间区间 [start, end) 过滤的安防事件查询"""
+    return db.query(models.SecurityEvent).filter(
+        *event_conditions(device_id, user_id, event_type, severity, start, end)
+    )
+
+def get_events(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Optional[int] = None,
+    device_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    event_type: Optional[str] = None,
+    severity: Optional[str] = None,
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    as_rows: bool = False,
+):
+    query = event_query(
+        db, device_id=device_id, user_id=user_id, event_type=event_type,
+        severity=severity, start=start, end=end
+    )
+    columns = models.SecurityEvent.__table__.columns if as_rows else None
+    return paginate(query, models.SecurityEvent.id, skip, limit, after_id, columns)
 
 def create_event(db: Session, event: schemas.SecurityEventCreate):
     db_event = models.SecurityEvent(**event.dict())
@@ -124,7 +303,24 @@ def create_event(db: Session, event: schemas.SecurityEventCreate):
     db.refresh(db_event)
     return db_event
 
-def update_event(db: Session, event_id: int, event: schemas.SecurityEventCreate):
+def create_events_bulk(db: Session, events: List[schemas.SecurityEventCreate]) -> List[int]:
+    """批量写入安防事件，单事务提交，返回的 id 与输入顺序一致"""
+    if not events:
+        return []
+    rows = []
+    for event in events:
+        row = event.dict()
+        # 批量 INSERT 中显式的 None 会覆盖列默认值，这里手动补上时间戳
+        if row["timestamp"] is None:
+            row["timestamp"] = datetime.datetime.utcnow()
+        rows.append(row)
+    stmt = insert(models.SecurityEvent).returning(models.SecurityEvent.id, sort_by_parameter_order=True)
+    ids = db.execute(stmt, rows).scalars().all()
+    db.commit()
+    return list(ids)
+
+def update_event(db: Session, event_id: int, event: schemas.SecurityEventUpdate):
+    """修改 timestamp 跨月时，PostgreSQL 会把该行移到对应的月分区"""
     db_event = db.query(models.SecurityEvent).filter(models.SecurityEvent.id == event_id).first()
     if db_event:
         for key, value in event.dict(exclude_unset=True).items():
@@ -147,8 +343,28 @@ def delete_event(db: Session, event_id: int):
 def get_feedback(db: Session, feedback_id: int):
     return db.query(models.UserFeedback).filter(models.UserFeedback.id == feedback_id).first()
 
-def get_feedbacks(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.UserFeedback).offset(skip).limit(limit).all()
+def feedback_query(
+    db: Session,
+    device_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+):
+    """按设备、用户、创建时间区间 [start, end) 过滤的反馈查询"""
+    query = db.query(models.UserFeedback)
+    if device_id is not None:
+        query = query.filter(models.UserFeedback.device_id == device_id)
+    if user_id is not None:
+        query = query.filter(models.UserFeedback.user_id == user_id)
+    if start is not None:
+        query = query.filter(models.UserFeedback.created_at >= start)
+    if end is not None:
+        query = query.filter(models.UserFeedback.created_at < end)
+    return query
+
+def get_feedbacks(db: Session, skip: int = 0, limit: int = 100, after_id: Optional[int] = None, as_rows: bool = False):
+    columns = models.UserFeedback.__table__.columns if as_rows else None
+    return paginate(db.query(models.UserFeedback), models.UserFeedback.id, skip, limit, after_id, columns)
 
 def create_feedback(db: Session, feedback: schemas.UserFeedbackCreate):
     db_feedback = models.UserFeedback(**feedback.dict())
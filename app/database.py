@@ -1,9 +1,11 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
 from dotenv import load_dotenv
 from urllib.parse import quote_plus
+from app.pool_metrics import TimedAsyncQueuePool, TimedQueuePool
 
 # 读取.env文件
 load_dotenv()
@@ -14,15 +16,38 @@ DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_PORT = os.getenv("DB_PORT", "5432")
 DB_NAME = os.getenv("DB_NAME")
 
+# 连接池：同步、异步引擎各自一个池，每个进程的连接上限为 2 * (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# 等待空闲连接的最长秒数，超时后接口返回 503（见 main.py）
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+# 连接使用超过该秒数后重建（-1 表示不回收），避免被数据库或中间代理静默断开
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# 签出前先 ping，数据库重启或主从切换后的失效连接会被丢弃重连，而不是让请求报错
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
 # 对用户名和密码进行URL编码，避免特殊字符问题
 DB_USER_ENCODED = quote_plus(DB_USER)
 DB_PASSWORD_ENCODED = quote_plus(DB_PASSWORD)
 
 DATABASE_URL = f"postgresql://{DB_USER_ENCODED}:{DB_PASSWORD_ENCODED}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{DB_USER_ENCODED}:{DB_PASSWORD_ENCODED}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+POOL_OPTIONS = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
 
-engine = create_engine(DATABASE_URL)
+engine = create_engine(DATABASE_URL, poolclass=TimedQueuePool, pool_logging_name="sync", **POOL_OPTIONS)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 异步引擎（asyncpg）：高频 CRUD 路由使用，等待数据库时不占用线程池中的线程
+async_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=TimedAsyncQueuePool, pool_logging_name="async", **POOL_OPTIONS)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 def get_db():
@@ -31,3 +56,7 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,270 @@
+# app/export.py
+
+import csv
+import datetime
+import io
+import json
+import os
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+from sqlalchemy.orm import Query, Session
+from app import crud, models
+from app.database import SessionLocal
+
+# 服务端游标每次取回的行数，也是每个输出块（Arrow record batch / Parquet row group）的行数
+EXPORT_BATCH_ROWS = 5000
+
+# 快照文件目录，按数据集分子目录、按日期命名
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots")
+
+
+# ------------------------------
+# 数据集定义
+# ------------------------------
+class Dataset:
+    """可导出的数据表：列名、列类型（Arrow 类型名）与过滤查询"""
+
+    def __init__(self, name: str, model: Any, columns: Dict[str, str], query: Callable[..., Query]):
+        self.name = name
+        self.model = model
+        self.columns = columns
+        self.query = query
+
+    @property
+    def column_names(self) -> List[str]:
+        return list(self.columns)
+
+    def arrow_schema(self):
+        import pyarrow as pa
+
+        types = {
+            "int32": pa.int32(),
+            "float64": pa.float64(),
+            "string": pa.string(),
+            "timestamp": pa.timestamp("us"),
+        }
+        return pa.schema([(name, types[kind]) for name, kind in self.columns.items()])
+
+
+DATASETS = {
+    "usage": Dataset(
+        "device_usage",
+        models.DeviceUsage,
+        {
+            "id": "int32",
+            "device_id": "int32",
+            "user_id": "int32",
+            "start_time": "timestamp",
+            "end_time": "timestamp",
+            "energy_consumption": "float64",
+        },
+        crud.usage_query,
+    ),
+    "events": Dataset(
+        "security_events",
+        models.SecurityEvent,
+        {
+            "id": "int32",
+            "device_id": "int32",
+            "event_type": "string",
+            "severity": "string",
+            "timestamp": "timestamp",
+        },
+        crud.event_query,
+    ),
+    "feedback": Dataset(
+        "user_feedback",
+        models.UserFeedback,
+        {
+            "id": "int32",
+            "user_id": "int32",
+            "device_id": "int32",
+            "feedback_type": "string",
+            "content": "string",
+            "rating": "int32",
+            "created_at": "timestamp",
+        },
+        crud.feedback_query,
+    ),
+}
+
+
+# ------------------------------
+# 服务端游标读取
+# ------------------------------
+def iter_batches(
+    dataset: Dataset,
+    batch_rows: int = EXPORT_BATCH_ROWS,
+    **filters: Any,
+) -> Iterator[Sequence[Any]]:
+    """按 id 顺序分批读取（只取列元组，不构造 ORM 对象）
+
+    使用服务端游标（stream_results / yield_per），无论导出多少行，进程内只保留一批数据。
+    流式响应在请求依赖清理后才被消费，因此这里自行创建会话。
+    """
+    db: Session = SessionLocal()
+    try:
+        columns = [getattr(dataset.model, name) for name in dataset.column_names]
+        query = dataset.query(db, **filters)\
+                       .with_entities(*columns)\
+                       .order_by(dataset.model.id)
+        result = db.execute(query.statement, execution_options={"yield_per": batch_rows})
+        for partition in result.partitions():
+            yield partition
+    finally:
+        db.close()
+
+
+# ------------------------------
+# 行式格式：CSV / NDJSON
+# ------------------------------
+def _json_default(value: Any):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f"无法序列化类型 {type(value).__name__}")
+
+
+def to_csv(dataset: Dataset, batches: Iterator[Sequence[Any]]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(dataset.column_names)
+    yield buf.getvalue().encode("utf-8")
+    for batch in batches:
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows(batch)
+        yield buf.getvalue().encode("utf-8")
+
+
+def to_ndjson(dataset: Dataset, batches: Iterator[Sequence[Any]]) -> Iterator[bytes]:
+    columns = dataset.column_names
+    for batch in batches:
+        lines = [json.dumps(dict(zip(columns, row)), default=_json_default, ensure_ascii=False) for row in batch]
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+# ------------------------------
+# 列式格式：Arrow IPC / Parquet
+# ------------------------------
+class _ChunkSink:
+    """只追加的内存输出流：写入器每写完一批，就把已产生的字节取走发送出去"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _record_batches(dataset: Dataset, batches: Iterator[Sequence[Any]]):
+    """把数据库行批次按列转置为 Arrow RecordBatch"""
+    import pyarrow as pa
+
+    schema = dataset.arrow_schema()
+    for batch in batches:
+        columns = list(zip(*batch))
+        arrays = [pa.array(values, type=field.type) for values, field in zip(columns, schema)]
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _open_writer(dataset: Dataset, sink: Any, format: str):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = dataset.arrow_schema()
+    if format == "parquet":
+        return pq.ParquetWriter(sink, schema, compression="zstd")
+    return pa.ipc.new_stream(sink, schema, options=pa.ipc.IpcWriteOptions(compression="zstd"))
+
+
+def to_columnar(dataset: Dataset, batches: Iterator[Sequence[Any]], format: str) -> Iterator[bytes]:
+    """流式输出 zstd 压缩的 Arrow IPC 流（format="arrow"）或 Parquet 文件（format="parquet"）"""
+    sink = _ChunkSink()
+    writer = _open_writer(dataset, sink, format)
+    for record_batch in _record_batches(dataset, batches):
+        writer.write_batch(record_batch)
+        data = sink.drain()
+        if data:
+            yield data
+    writer.close()
+    yield sink.drain()
+
+
+FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv", to_csv),
+    "ndjson": ("application/x-ndjson", "ndjson", to_ndjson),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows", lambda d, b: to_columnar(d, b, "arrow")),
+    "parquet": ("application/vnd.apache.parquet", "parquet", lambda d, b: to_columnar(d, b, "parquet")),
+}
+
+
+# ------------------------------
+# 快照文件
+# ------------------------------
+def write_snapshot(dataset: Dataset, directory: str = SNAPSHOT_DIR, day: Optional[datetime.date] = None) -> Dict[str, Any]:
+    """把整张表写成 {directory}/{表名}/{表名}-{日期}.parquet，返回文件路径与行数
+
+    先写临时文件再重命名，读取方不会看到写了一半的快照。
+    """
+    day = day or datetime.date.today()
+    target_dir = os.path.join(directory, dataset.name)
+    os.makedirs(target_dir, exist_ok=True)
+    path = os.path.join(target_dir, f"{dataset.name}-{day.isoformat()}.parquet")
+    tmp_path = path + ".tmp"
+
+    rows = 0
+    writer = _open_writer(dataset, tmp_path, "parquet")
+    try:
+        for record_batch in _record_batches(dataset, iter_batches(dataset)):
+            writer.write_batch(record_batch)
+            rows += record_batch.num_rows
+        writer.close()
+    except Exception:
+        writer.close()
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    return {"dataset": dataset.name, "path": path, "rows": rows, "bytes": os.path.getsize(path)}
+
+
+def write_parquet(dataset: Dataset, rows: Sequence[Sequence[Any]], path: str) -> int:
+    """把一批行写成 zstd 压缩的 Parquet 文件，返回文件字节数
+
+    先写临时文件并 fsync，再重命名并同步目录：函数返回后文件即已完整落盘，调用方可以放心删除源数据。
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    writer = _open_writer(dataset, tmp_path, "parquet")
+    try:
+        for record_batch in _record_batches(dataset, iter([rows])):
+            writer.write_batch(record_batch)
+    finally:
+        writer.close()
+    with open(tmp_path, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    return os.path.getsize(path)
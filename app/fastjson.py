@@ -0,0 +1,20 @@
+# app/fastjson.py
+
+from typing import Any, Dict, Optional, Sequence
+import orjson
+from fastapi import Response
+
+
+def rows_response(rows: Sequence[Any], headers: Optional[Dict[str, str]] = None) -> Response:
+    """把查询得到的列元组直接用 orjson 编码为 JSON 数组
+
+    数据来自本库自己的表，字段类型已由数据库保证，因此跳过 ORM 实体构造和
+    Pydantic 逐行校验；输出字段与对应的响应模型一致。
+    """
+    body = orjson.dumps([row._asdict() for row in rows])
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def json_response(payload: Any) -> Response:
+    """用 orjson 编码任意由 dict / list / 标量组成的结果（如分析接口的聚合数据）"""
+    return Response(content=orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY), media_type="application/json")
@@ -0,0 +1,180 @@
+# app/ingest.py
+
+import json
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type, TypeVar
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session
+from app import crud, schemas
+
+# 单次批量写入允许的最大行数
+BULK_MAX_ROWS = 10000
+
+SchemaT = TypeVar("SchemaT", bound=BaseModel)
+
+
+# ------------------------------
+# 工具函数：构造单行错误 / 逐行解析
+# ------------------------------
+def row_error(index: int, detail: Any) -> Dict[str, Any]:
+    return {"index": index, "detail": detail}
+
+
+def _parse_rows(
+    schema: Type[SchemaT], rows: Iterable[Tuple[int, Any]]
+) -> Tuple[List[Tuple[int, SchemaT]], List[Dict[str, Any]]]:
+    parsed: List[Tuple[int, SchemaT]] = []
+    errors: List[Dict[str, Any]] = []
+    for index, item in rows:
+        try:
+            parsed.append((index, schema.model_validate(item)))
+        except ValidationError as e:
+            errors.append(row_error(index, e.errors(include_url=False, include_context=False)))
+    return parsed, errors
+
+
+# ------------------------------
+# 使用记录批量校验
+# ------------------------------
+def validate_usages(
+    db: Session, rows: Iterable[Tuple[int, Any]]
+) -> Tuple[List[schemas.DeviceUsageCreate], List[Dict[str, Any]]]:
+    """一次遍历校验所有行：字段格式、时间先后、设备与用户是否存在
+
+    rows 为 (行号, 原始数据) 序列，返回 (合法记录列表, 错误列表)。
+    外键在这里提前检查，避免单行坏数据导致整个事务回滚。
+    """
+    parsed, errors = _parse_rows(schemas.DeviceUsageCreate, rows)
+
+    device_ids = crud.get_existing_device_ids(db, (u.device_id for _, u in parsed))
+    user_ids = crud.get_existing_user_ids(db, (u.user_id for _, u in parsed))
+
+    valid: List[schemas.DeviceUsageCreate] = []
+    for index, usage in parsed:
+        if usage.end_time < usage.start_time:
+            errors.append(row_error(index, "end_time 早于 start_time"))
+        elif usage.device_id not in device_ids:
+            errors.append(row_error(index, f"设备 {usage.device_id} 不存在"))
+        elif usage.user_id not in user_ids:
+            errors.append(row_error(index, f"用户 {usage.user_id} 不存在"))
+        else:
+            valid.append(usage)
+
+    errors.sort(key=lambda err: err["index"])
+    return valid, errors
+
+
+# ------------------------------
+# 安防事件批量校验
+# ------------------------------
+def validate_events(
+    db: Session, rows: Iterable[Tuple[int, Any]]
+) -> Tuple[List[schemas.SecurityEventCreate], List[Dict[str, Any]]]:
+    """校验安防事件字段格式及设备是否存在，返回 (合法事件列表, 错误列表)"""
+    parsed, errors = _parse_rows(schemas.SecurityEventCreate, rows)
+
+    device_ids = crud.get_existing_device_ids(db, (e.device_id for _, e in parsed))
+
+    valid: List[schemas.SecurityEventCreate] = []
+    for index, event in parsed:
+        if event.device_id not in device_ids:
+            errors.append(row_error(index, f"设备 {event.device_id} 不存在"))
+        else:
+            valid.append(event)
+
+    errors.sort(key=lambda err: err["index"])
+    return valid, errors
+
+
+# ------------------------------
+# NDJSON 流式写入
+# ------------------------------
+# 每累计多少行刷写一次数据库
+STREAM_CHUNK_ROWS = 500
+# 单行最大字节数，超出的行按错误处理并丢弃
+STREAM_MAX_LINE_BYTES = 1024 * 1024
+# 汇总中最多保留的错误条数（其余只计数），保证内存占用有上限
+STREAM_MAX_REPORTED_ERRORS = 100
+
+STREAM_RECORD_TYPES = ("usage", "event")
+
+
+class StreamIngestor:
+    """逐行解析 NDJSON 并按块写库
+
+    每行是一个 JSON 对象，用 "type" 字段（usage / event）区分记录类型；
+    若调用方指定了 record_type，则所有行都按该类型处理。
+    坏行只记错误，不会中断整个流。
+    """
+
+    def __init__(self, db: Session, record_type: Optional[str] = None):
+        self.db = db
+        self.record_type = record_type
+        self.lines = 0
+        self.inserted = {"usage": 0, "event": 0}
+        self.error_count = 0
+        self.errors: List[Dict[str, Any]] = []
+        self._pending: Dict[str, List[Tuple[int, Any]]] = {"usage": [], "event": []}
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending["usage"]) + len(self._pending["event"])
+
+    def _add_errors(self, errors: List[Dict[str, Any]]):
+        self.error_count += len(errors)
+        room = STREAM_MAX_REPORTED_ERRORS - len(self.errors)
+        if room > 0:
+            self.errors.extend(errors[:room])
+
+    def add_line(self, line: bytes):
+        """解析一行，合法的放入待写缓冲"""
+        self.lines += 1
+        index = self.lines
+        if not line.strip():
+            return
+        try:
+            item = json.loads(line)
+        except ValueError as e:
+            self._add_errors([row_error(index, f"JSON 解析失败: {e}")])
+            return
+        if not isinstance(item, dict):
+            self._add_errors([row_error(index, "每行必须是 JSON 对象")])
+            return
+        kind = self.record_type or item.pop("type", None)
+        if kind not in STREAM_RECORD_TYPES:
+            self._add_errors([row_error(index, f"未知记录类型: {kind}")])
+            return
+        self._pending[kind].append((index, item))
+
+    def add_oversized_line(self):
+        self.lines += 1
+        self._add_errors([row_error(self.lines, f"单行超过 {STREAM_MAX_LINE_BYTES} 字节")])
+
+    def flush(self):
+        """校验并写入当前缓冲，每种记录类型各一个事务"""
+        usages, self._pending["usage"] = self._pending["usage"], []
+        events, self._pending["event"] = self._pending["event"], []
+        for kind, rows, validate, create in (
+            ("usage", usages, validate_usages, crud.create_usages_bulk),
+            ("event", events, validate_events, crud.create_events_bulk),
+        ):
+            if not rows:
+                continue
+            try:
+                valid, errors = validate(self.db, rows)
+                self._add_errors(errors)
+                self.inserted[kind] += len(create(self.db, valid))
+            except PoolTimeoutError:
+                # 等不到数据库连接不是数据的问题，整个请求返回 503（见 main.py），客户端稍后重试
+                raise
+            except SQLAlchemyError as e:
+                self.db.rollback()
+                first, last = rows[0][0], rows[-1][0]
+                self._add_errors([row_error(first, f"第 {first}-{last} 行写入失败: {e.__class__.__name__}")])
+
+    def progress(self) -> Dict[str, Any]:
+        return {"lines": self.lines, "inserted": dict(self.inserted), "error_count": self.error_count}
+
+    def summary(self) -> Dict[str, Any]:
+        return {**self.progress(), "errors": self.errors}
@@ -0,0 +1,37 @@
+# app/maintenance.py
+
+import logging
+from typing import List
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+
+# ------------------------------
+# 使用记录去重
+# ------------------------------
+def dedup_usages(engine: Engine, chunk_size: int = 5000) -> int:
+    """按自然键 (device_id, start_time) 去重，保留 id 最小的一条，返回删除行数
+
+    用一次窗口函数扫描找出重复行的 id（服务端游标流式读取，内存恒定），
+    再用另一个连接按 chunk_size 分块删除并逐块提交，每个事务只锁少量行。
+    """
+    find_duplicates = text("""
+        SELECT id FROM (
+            SELECT id, row_number() OVER (PARTITION BY device_id, start_time ORDER BY id) AS rn
+            FROM device_usage
+        ) ranked
+        WHERE rn > 1
+    """)
+    delete_chunk = text("DELETE FROM device_usage WHERE id = ANY(:ids)")
+
+    deleted = 0
+    with engine.connect() as reader, engine.connect() as writer:
+        result = reader.execution_options(stream_results=True, yield_per=chunk_size).execute(find_duplicates)
+        for partition in result.partitions():
+            ids: List[int] = [row.id for row in partition]
+            deleted += writer.execute(delete_chunk, {"ids": ids}).rowcount
+            writer.commit()
+            logger.info("已删除 %d 条重复使用记录", deleted)
+    return deleted
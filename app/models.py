@@ -1,6 +1,7 @@
 # app/models.py
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Text, UniqueConstraint, Index, DDL, event
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 import datetime
@@ -39,28 +40,78 @@ class Device(Base):
 
 
 # 设备使用记录表
+# 按 start_time 月分区（见 app/partitions.py）；分区表的主键必须包含分区键
 class DeviceUsage(Base):
     __tablename__ = "device_usage"
-
-    id = Column(Integer, primary_key=True, index=True)
+    __table_args__ = (
+        # 自然键：同一设备同一开始时间只保留一条，设备重试上报时幂等
+        UniqueConstraint("device_id", "start_time", name="uq_device_usage_device_start"),
+        Index("ix_device_usage_user_start", "user_id", "start_time"),
+        {"postgresql_partition_by": "RANGE (start_time)"},
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     device_id = Column(Integer, ForeignKey("devices.id"))
     user_id = Column(Integer, ForeignKey("users.id"))
-    start_time = Column(DateTime, nullable=False)
+    start_time = Column(DateTime, primary_key=True, nullable=False)
     end_time = Column(DateTime, nullable=False)
     energy_consumption = Column(Float, nullable=True)
 
     device = relationship("Device", back_populates="usage_records")
 
 
+# 使用记录小时汇总表：每设备每小时一行，随使用记录的增删改增量维护（见 app/rollups.py）
+class DeviceUsageHourly(Base):
+    __tablename__ = "device_usage_hourly"
+
+    device_id = Column(Integer, ForeignKey("devices.id", ondelete="CASCADE"), primary_key=True)
+    hour = Column(DateTime, primary_key=True)  # date_trunc('hour', start_time)
+    session_count = Column(Integer, nullable=False, default=0)
+    total_duration_s = Column(Float, nullable=False, default=0)  # 按开始时间归入小时桶
+    total_energy = Column(Float, nullable=False, default=0)
+
+
+# 使用记录每日汇总表：已冷归档的原始记录降采样为每设备每天一行（见 app/compaction.py）
+# 附带按开始时刻所在小时的 24 项分布，按小时的分析对归档数据仍然准确
+class DeviceUsageDaily(Base):
+    __tablename__ = "device_usage_daily"
+
+    device_id = Column(Integer, ForeignKey("devices.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)  # start_time 所在日期
+    session_count = Column(Integer, nullable=False, default=0)
+    total_duration_s = Column(Float, nullable=False, default=0)
+    total_energy = Column(Float, nullable=False, default=0)
+    hour_counts = Column(ARRAY(Integer), nullable=False)  # 24 项，每小时的使用次数
+    hour_duration_s = Column(ARRAY(Float), nullable=False)  # 24 项，每小时的使用时长（秒）
+
+
+# 分析结果预计算表：每项分析 x 每个用户一行（user_id=0 为全局），由 app/scheduler.py 定时刷新
+class AnalyticsResult(Base):
+    __tablename__ = "analytics_results"
+
+    analysis = Column(String(64), primary_key=True)
+    user_id = Column(Integer, primary_key=True)  # 0 表示全局分析
+    data = Column(Text, nullable=True)  # format=data 的 JSON
+    chart = Column(Text, nullable=True)  # Base64 PNG，渲染繁忙时为空
+    error = Column(Text, nullable=True)  # 分析本身报错（如数据不足）时的错误信息
+    computed_at = Column(DateTime, nullable=False)
+    duration_ms = Column(Float, nullable=False, default=0)
+
+
 # 安防事件表
+# 按 timestamp 月分区
 class SecurityEvent(Base):
     __tablename__ = "security_events"
+    __table_args__ = (
+        Index("ix_security_events_device_timestamp", "device_id", "timestamp"),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     device_id = Column(Integer, ForeignKey("devices.id"))
     event_type = Column(String(100), nullable=False)
     severity = Column(String(50), nullable=False)
-    timestamp = Column(DateTime, default=datetime.datetime.utcnow)
+    timestamp = Column(DateTime, primary_key=True, nullable=False, default=datetime.datetime.utcnow)
 
     device = relationship("Device", back_populates="security_events")
 
@@ -79,3 +130,8 @@ class UserFeedback(Base):
 
     user = relationship("User", back_populates="feedbacks")
     device = relationship("Device", back_populates="feedbacks")
+
+
+# create_all 建出的分区表没有任何分区，补一个 DEFAULT 分区保证可以写入；月分区由 app/partitions.py 维护
+for _table in (DeviceUsage.__table__, SecurityEvent.__table__):
+    event.listen(_table, "after_create", DDL(f"CREATE TABLE IF NOT EXISTS {_table.name}_default PARTITION OF {_table.name} DEFAULT"))
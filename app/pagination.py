@@ -0,0 +1,83 @@
+# app/pagination.py
+
+import base64
+import json
+from typing import Any, Dict, List, Optional, Sequence
+from fastapi import HTTPException, Response
+from sqlalchemy import Select
+from sqlalchemy.orm import Query
+
+# 列表接口通过该响应头返回下一页游标，没有下一页时不返回
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+# ------------------------------
+# 游标编解码（对客户端不透明）
+# ------------------------------
+def encode_cursor(last_id: int) -> str:
+    raw = json.dumps({"id": last_id}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    """解析游标，返回上一页最后一条记录的 id；格式不对时返回 400"""
+    if cursor is None:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        last_id = json.loads(base64.urlsafe_b64decode(padded))["id"]
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+    if not isinstance(last_id, int):
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+    return last_id
+
+
+# ------------------------------
+# 分页查询
+# ------------------------------
+def paginate(
+    query: Query,
+    id_column: Any,
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Optional[int] = None,
+    columns: Optional[Sequence[Any]] = None,
+) -> List[Any]:
+    """按 id 升序分页
+
+    给出 after_id 时走游标分页（WHERE id > after_id，走主键索引，任意深度都是常数代价）；
+    否则退回 OFFSET/LIMIT 以兼容旧客户端。
+    给出 columns 时只查询这些列，返回行元组而不是 ORM 实体。
+    """
+    if columns is not None:
+        query = query.with_entities(*columns)
+    query = query.order_by(id_column)
+    if after_id is not None:
+        return query.filter(id_column > after_id).limit(limit).all()
+    return query.offset(skip).limit(limit).all()
+
+
+def paginate_select(
+    stmt: Select,
+    id_column: Any,
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Optional[int] = None,
+) -> Select:
+    """paginate 的 select() 版本（异步会话使用）：返回加上排序与分页条件的语句"""
+    stmt = stmt.order_by(id_column)
+    if after_id is not None:
+        return stmt.where(id_column > after_id).limit(limit)
+    return stmt.offset(skip).limit(limit)
+
+
+def next_cursor_headers(items: List[Any], limit: int) -> Dict[str, str]:
+    """本页取满时把最后一条的 id 编码为下一页游标"""
+    if items and len(items) == limit:
+        return {NEXT_CURSOR_HEADER: encode_cursor(items[-1].id)}
+    return {}
+
+
+def set_next_cursor(response: Response, items: List[Any], limit: int):
+    response.headers.update(next_cursor_headers(items, limit))
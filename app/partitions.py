@@ -0,0 +1,146 @@
+# app/partitions.py
+"""
+按月范围分区的维护
+device_usage 按 start_time、security_events 按 timestamp 分区，每月一个分区（如 device_usage_y2026m10），
+另有一个 DEFAULT 分区接收没有对应月份分区的数据。
+- 预建未来若干个月的分区，避免新数据落入 DEFAULT 分区；
+- DEFAULT 分区中已有数据的月份会补建分区并把数据移过去；
+- 超过保留期的分区先 DETACH 再按需 DROP（默认只分离，便于归档后再删除）。
+"""
+import datetime
+import logging
+import os
+import re
+from typing import Dict, List, Optional
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+# 分区表 -> 分区键
+PARTITIONED_TABLES: Dict[str, str] = {
+    "device_usage": "start_time",
+    "security_events": "timestamp",
+}
+
+PARTITIONS_AHEAD = int(os.getenv("PARTITIONS_AHEAD", "3"))
+# 保留月数，0 表示永久保留
+RETENTION_MONTHS: Dict[str, int] = {
+    "device_usage": int(os.getenv("USAGE_RETENTION_MONTHS", "0")),
+    "security_events": int(os.getenv("EVENT_RETENTION_MONTHS", "0")),
+}
+
+_NAME = re.compile(r"_y(\d{4})m(\d{2})$")
+
+
+def month_start(moment: datetime.datetime) -> datetime.datetime:
+    return datetime.datetime(moment.year, moment.month, 1)
+
+
+def add_months(month: datetime.datetime, months: int) -> datetime.datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime.datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: datetime.datetime) -> str:
+    return f"{table}_y{month.year:04d}m{month.month:02d}"
+
+
+def default_partition(table: str) -> str:
+    return f"{table}_default"
+
+
+def list_partitions(conn: Connection, table: str) -> Dict[datetime.datetime, str]:
+    """当前挂在 table 上的月分区：{月份: 分区名}"""
+    rows = conn.execute(text("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = CAST(:table AS regclass)
+    """), {"table": table}).scalars()
+    partitions = {}
+    for name in rows:
+        match = _NAME.search(name)
+        if match:
+            partitions[datetime.datetime(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+
+def create_month_partition(conn: Connection, table: str, month: datetime.datetime) -> str:
+    """建立 table 在 month 的分区；DEFAULT 分区中该月的数据一并移入新分区
+
+    不能直接 CREATE ... PARTITION OF（DEFAULT 分区中有该月数据时会失败），
+    因此先建普通表、搬数据、加 CHECK 约束，再 ATTACH（有 CHECK 约束时 ATTACH 不再全表校验）。
+    """
+    key = PARTITIONED_TABLES[table]
+    name = partition_name(table, month)
+    lo, hi = f"'{month:%Y-%m-%d}'", f"'{add_months(month, 1):%Y-%m-%d}'"
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)"))
+    moved = conn.execute(text(
+        f'WITH moved AS (DELETE FROM {default_partition(table)} WHERE "{key}" >= {lo} AND "{key}" < {hi} RETURNING *) '
+        f"INSERT INTO {name} SELECT * FROM moved"
+    )).rowcount
+    conn.execute(text(
+        f'ALTER TABLE {name} ADD CONSTRAINT {name}_bounds CHECK ("{key}" IS NOT NULL AND "{key}" >= {lo} AND "{key}" < {hi})'
+    ))
+    conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM ({lo}) TO ({hi})"))
+    conn.execute(text(f"ALTER TABLE {name} DROP CONSTRAINT {name}_bounds"))
+    if moved:
+        logger.info("%s: 从 DEFAULT 分区移入 %d 行", name, moved)
+    return name
+
+
+def ensure_partitions(
+    engine: Engine,
+    table: str,
+    ahead: int = PARTITIONS_AHEAD,
+    today: Optional[datetime.datetime] = None,
+) -> List[str]:
+    """预建当月及之后 ahead 个月的分区，并为 DEFAULT 分区中已有数据的月份补建分区；返回新建的分区名"""
+    current = month_start(today or datetime.datetime.utcnow())
+    key = PARTITIONED_TABLES[table]
+    created = []
+    with engine.begin() as conn:
+        existing = list_partitions(conn, table)
+        in_default = conn.execute(text(
+            f'SELECT DISTINCT date_trunc(\'month\', "{key}") FROM {default_partition(table)} WHERE "{key}" IS NOT NULL'
+        )).scalars().all()
+        wanted = {add_months(current, i) for i in range(ahead + 1)} | set(in_default)
+    for month in sorted(wanted - set(existing)):
+        # 每个分区单独提交，ATTACH 只短暂持有父表锁
+        with engine.begin() as conn:
+            created.append(create_month_partition(conn, table, month))
+    return created
+
+
+def apply_retention(
+    engine: Engine,
+    table: str,
+    months: Optional[int] = None,
+    drop: bool = False,
+    today: Optional[datetime.datetime] = None,
+) -> List[str]:
+    """分离（drop=True 时删除）整月都早于保留期的分区，返回处理的分区名；months 为 0 时不处理"""
+    months = RETENTION_MONTHS[table] if months is None else months
+    if months <= 0:
+        return []
+    cutoff = add_months(month_start(today or datetime.datetime.utcnow()), -months)
+    with engine.connect() as conn:
+        expired = [name for month, name in sorted(list_partitions(conn, table).items()) if add_months(month, 1) <= cutoff]
+    for name in expired:
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+            if drop:
+                conn.execute(text(f"DROP TABLE {name}"))
+        logger.info("%s: %s（保留 %d 个月）", name, "已删除" if drop else "已分离", months)
+    return expired
+
+
+def maintain(engine: Engine, ahead: int = PARTITIONS_AHEAD, drop: bool = False) -> Dict[str, Dict[str, List[str]]]:
+    """对全部分区表执行预建与保留策略"""
+    return {
+        table: {
+            "created": ensure_partitions(engine, table, ahead),
+            "expired": apply_retention(engine, table, drop=drop),
+        }
+        for table in PARTITIONED_TABLES
+    }
@@ -0,0 +1,108 @@
+# app/pool_metrics.py
+"""
+数据库连接池监控
+同步与异步引擎使用带计时的 QueuePool，按引擎（pool_logging_name）分别统计：
+- 每次签出等待连接的耗时（直方图）与签出超时次数；
+- 超出 pool_size 后新建的溢出连接数；
+当前签出数、溢出数、空闲连接数直接读取连接池。
+"""
+import threading
+import time
+from typing import Any, Dict, Optional
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
+# 等待耗时直方图的桶上界（毫秒），最后一个桶收集更慢的签出
+WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+class _PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Any] = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "overflow_opened": 0,
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+        }
+        self._buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+
+    def record_wait(self, elapsed_ms: float):
+        index = next((i for i, bound in enumerate(WAIT_BUCKETS_MS) if elapsed_ms <= bound), len(WAIT_BUCKETS_MS))
+        with self._lock:
+            self._stats["checkouts"] += 1
+            self._stats["total_wait_ms"] += elapsed_ms
+            self._stats["max_wait_ms"] = max(self._stats["max_wait_ms"], elapsed_ms)
+            self._buckets[index] += 1
+
+    def count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            buckets = list(self._buckets)
+        total_wait_ms = stats.pop("total_wait_ms")
+        stats["avg_wait_ms"] = round(total_wait_ms / stats["checkouts"], 3) if stats["checkouts"] else 0.0
+        stats["max_wait_ms"] = round(stats["max_wait_ms"], 3)
+        stats["wait_histogram_ms"] = {
+            **{f"le_{bound}": count for bound, count in zip(WAIT_BUCKETS_MS, buckets)},
+            f"gt_{WAIT_BUCKETS_MS[-1]}": buckets[-1],
+        }
+        return stats
+
+
+# 引擎 dispose() 会重建连接池实例，统计按名字保存，不随之清零
+_pools: Dict[str, _PoolStats] = {}
+_pools_lock = threading.Lock()
+
+
+def _stats_for(name: Optional[str]) -> _PoolStats:
+    name = name or "default"
+    with _pools_lock:
+        return _pools.setdefault(name, _PoolStats())
+
+
+class _TimedPoolMixin:
+    """为 QueuePool 的签出计时；等待超过 pool_timeout 时计数后照常抛出 TimeoutError"""
+
+    def _do_get(self):
+        metrics = _stats_for(self._orig_logging_name)
+        begin = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            metrics.count("timeouts")
+            raise
+        metrics.record_wait((time.perf_counter() - begin) * 1000)
+        return connection
+
+    def _create_connection(self):
+        connection = super()._create_connection()
+        if self.overflow() > 0:
+            _stats_for(self._orig_logging_name).count("overflow_opened")
+        return connection
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def stats(pool: Pool) -> Dict[str, Any]:
+    snapshot = _stats_for(pool._orig_logging_name).snapshot()
+    if isinstance(pool, QueuePool):
+        snapshot.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow,
+            "timeout_s": pool.timeout(),
+        })
+    return snapshot
@@ -0,0 +1,179 @@
+# app/rendering.py
+"""
+图表渲染进程池
+matplotlib 不是线程安全的，且单次渲染占用数十 MB 内存，因此渲染放到独立的有界进程池中执行：
+- 同时进行的渲染数有上限，超出时快速返回 503，不占满 API 线程池；
+- 每次渲染有超时，超时的工作进程会被结束并重建进程池；
+- 工作进程执行一定次数后自动替换，防止内存缓慢增长。
+"""
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "2"))
+RENDER_MAX_CONCURRENT = int(os.getenv("RENDER_MAX_CONCURRENT", str(RENDER_WORKERS * 2)))
+RENDER_TIMEOUT = float(os.getenv("RENDER_TIMEOUT", "20"))
+RENDER_QUEUE_TIMEOUT = float(os.getenv("RENDER_QUEUE_TIMEOUT", "1"))
+RENDER_MAX_TASKS_PER_CHILD = int(os.getenv("RENDER_MAX_TASKS_PER_CHILD", "200"))
+# 启动时预热工作进程（导入 matplotlib / seaborn）；只处理 CRUD 的实例可关闭，首次渲染时再创建进程池
+RENDER_WARM_UP = os.getenv("RENDER_WARM_UP", "true").lower() == "true"
+
+
+class RenderBusy(Exception):
+    """渲染并发已满或进程池不可用，调用方应返回 503 让客户端稍后重试"""
+
+
+class RenderTimeout(Exception):
+    """单次渲染超过 RENDER_TIMEOUT 秒"""
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(RENDER_MAX_CONCURRENT)
+_stats_lock = threading.Lock()
+_stats = {
+    "rendered": 0,
+    "rejected": 0,
+    "timed_out": 0,
+    "failed": 0,
+    "in_flight": 0,
+    "last_render_ms": 0.0,
+    "max_render_ms": 0.0,
+}
+
+
+def _count(key: str, delta: int = 1):
+    with _stats_lock:
+        _stats[key] += delta
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # API 进程里有多个线程，fork 出的子进程可能继承被持有的锁，因此使用 spawn
+            _pool = ProcessPoolExecutor(
+                max_workers=RENDER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                max_tasks_per_child=RENDER_MAX_TASKS_PER_CHILD,
+            )
+            # 工作进程导入 matplotlib / seaborn 需要一两秒，新建进程池时立即预热，避免首个请求承担这部分耗时
+            for _ in range(RENDER_WORKERS):
+                _pool.submit(_warm_up_worker)
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor):
+    """已在执行的任务无法取消，只能结束工作进程；下一次渲染时重建进程池"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    for process in list((pool._processes or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _warm_up_worker():
+    from app import charts  # noqa: F401
+
+
+def _render_in_worker(chart: str, data: Dict[str, Any]) -> str:
+    # matplotlib / seaborn 只在工作进程中导入
+    from app import charts
+    return charts.render_base64(chart, data)
+
+
+def _render_image_in_worker(chart: str, data: Dict[str, Any], *options) -> bytes:
+    from app import charts
+    return charts.render_image(chart, data, *options)
+
+
+# ------------------------------
+# 渲染入口
+# ------------------------------
+def render(chart: str, data: Dict[str, Any]) -> str:
+    """在进程池中绘制图表，返回 Base64 PNG"""
+    return _submit(_render_in_worker, chart, data)
+
+
+def render_image(
+    chart: str,
+    data: Dict[str, Any],
+    format: str = "png",
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+    dpi: Optional[float] = None,
+) -> bytes:
+    """在进程池中绘制图表，返回 png / webp / svg 字节"""
+    return _submit(_render_image_in_worker, chart, data, format, width, height, dpi)
+
+
+def _submit(task, chart: str, data: Dict[str, Any], *options):
+    """占用一个渲染名额，在进程池中执行 task 并等待结果（受 RENDER_TIMEOUT 限制）"""
+    if not _slots.acquire(timeout=RENDER_QUEUE_TIMEOUT):
+        _count("rejected")
+        raise RenderBusy("图表渲染繁忙，请稍后重试")
+    _count("in_flight")
+    begin = time.perf_counter()
+    try:
+        # 创建进程池也可能失败（如无法启动子进程），名额必须在 finally 中归还
+        pool = _get_pool()
+        future = pool.submit(task, chart, data, *options)
+        try:
+            result = future.result(timeout=RENDER_TIMEOUT)
+        except FutureTimeoutError:
+            _count("timed_out")
+            logger.warning("图表 %s 渲染超过 %.0f 秒，重建渲染进程池", chart, RENDER_TIMEOUT)
+            _discard_pool(pool)
+            raise RenderTimeout(f"图表渲染超时（{RENDER_TIMEOUT:.0f} 秒）")
+        except BrokenProcessPool:
+            _count("failed")
+            _discard_pool(pool)
+            raise RenderBusy("渲染进程异常退出，请稍后重试")
+        except Exception:
+            _count("failed")
+            raise
+    finally:
+        _count("in_flight", -1)
+        _slots.release()
+
+    elapsed_ms = (time.perf_counter() - begin) * 1000
+    with _stats_lock:
+        _stats["rendered"] += 1
+        _stats["last_render_ms"] = round(elapsed_ms, 2)
+        _stats["max_render_ms"] = round(max(_stats["max_render_ms"], elapsed_ms), 2)
+    return result
+
+
+def start():
+    """应用启动时创建并预热进程池"""
+    _get_pool()
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def stats() -> Dict[str, Any]:
+    with _stats_lock:
+        snapshot = dict(_stats)
+    snapshot.update({
+        "workers": RENDER_WORKERS,
+        "max_concurrent": RENDER_MAX_CONCURRENT,
+        "timeout_s": RENDER_TIMEOUT,
+        "pool_running": _pool is not None,
+    })
+    return snapshot
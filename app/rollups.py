@@ -0,0 +1,122 @@
+# app/rollups.py
+
+import datetime
+import logging
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple
+from sqlalchemy import and_, bindparam, delete, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from app import models
+
+logger = logging.getLogger(__name__)
+
+HOURLY = models.DeviceUsageHourly.__table__
+
+
+def hour_bucket(moment: datetime.datetime) -> datetime.datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def usage_values(usage: Any) -> Dict[str, Any]:
+    """ORM 对象转为汇总所需的字段"""
+    return {
+        "device_id": usage.device_id,
+        "start_time": usage.start_time,
+        "end_time": usage.end_time,
+        "energy_consumption": usage.energy_consumption,
+    }
+
+
+# ------------------------------
+# 增量维护
+# ------------------------------
+def apply_usage_deltas(db: Session, usages: Iterable[Mapping[str, Any]], sign: int = 1):
+    """把一批使用记录的增（sign=1）或减（sign=-1）累加到小时汇总表
+
+    在调用方的事务内执行，与使用记录的写入一起提交或回滚。
+    同一小时桶的增量先在内存中合并，每个桶只做一次 UPSERT；
+    用增量而不是重算，并发写入同一个桶时也不会互相覆盖。
+    """
+    deltas: Dict[Tuple[int, datetime.datetime], list] = {}
+    for usage in usages:
+        if usage["device_id"] is None:
+            continue
+        key = (usage["device_id"], hour_bucket(usage["start_time"]))
+        delta = deltas.setdefault(key, [0, 0.0, 0.0])
+        delta[0] += sign
+        delta[1] += sign * (usage["end_time"] - usage["start_time"]).total_seconds()
+        delta[2] += sign * (usage["energy_consumption"] or 0.0)
+    if not deltas:
+        return
+
+    stmt = pg_insert(HOURLY)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[HOURLY.c.device_id, HOURLY.c.hour],
+        set_={
+            "session_count": HOURLY.c.session_count + stmt.excluded.session_count,
+            "total_duration_s": HOURLY.c.total_duration_s + stmt.excluded.total_duration_s,
+            "total_energy": HOURLY.c.total_energy + stmt.excluded.total_energy,
+        },
+    )
+    db.execute(stmt, [
+        {"device_id": device_id, "hour": hour, "session_count": count, "total_duration_s": duration, "total_energy": energy}
+        for (device_id, hour), (count, duration, energy) in deltas.items()
+    ])
+
+    if sign < 0:
+        # 桶内记录全部删除后移除该行，避免统计中出现 0 次使用的设备
+        db.execute(
+            delete(HOURLY).where(and_(
+                HOURLY.c.device_id == bindparam("b_device_id"),
+                HOURLY.c.hour == bindparam("b_hour"),
+                HOURLY.c.session_count <= 0,
+            )),
+            [{"b_device_id": device_id, "b_hour": hour} for device_id, hour in deltas],
+        )
+
+
+# ------------------------------
+# 全量回填
+# ------------------------------
+_DELETE_RANGE = text("DELETE FROM device_usage_hourly WHERE hour >= :lo AND hour < :hi")
+_INSERT_RANGE = text("""
+    INSERT INTO device_usage_hourly (device_id, hour, session_count, total_duration_s, total_energy)
+    SELECT device_id,
+           date_trunc('hour', start_time),
+           count(*),
+           sum(extract(epoch FROM end_time - start_time)),
+           coalesce(sum(energy_consumption), 0)
+    FROM device_usage
+    WHERE device_id IS NOT NULL AND start_time >= :lo AND start_time < :hi
+    GROUP BY 1, 2
+""")
+
+
+def backfill_usage_hourly(
+    engine: Engine,
+    since: Optional[datetime.datetime] = None,
+    chunk: datetime.timedelta = datetime.timedelta(days=31),
+) -> int:
+    """从原始使用记录重建小时汇总（since 之后，默认全部），返回写入的汇总行数
+
+    按 chunk 时间段分块：每块先删后插并单独提交，单个事务不会过大；可重复执行。
+    回填期间同一时间段的实时写入可能被覆盖，建议在写入低峰执行。
+    已冷归档的记录在归档时已从小时汇总扣除、并入每日汇总（app/compaction.py），回填不会重复计入。
+    """
+    with engine.connect() as conn:
+        bounds = conn.execute(text("SELECT min(start_time), max(start_time) FROM device_usage")).one()
+    if bounds[0] is None:
+        return 0
+    lo = hour_bucket(max(since, bounds[0]) if since else bounds[0])
+    end = bounds[1]
+
+    written = 0
+    while lo <= end:
+        hi = lo + chunk
+        with engine.begin() as conn:
+            conn.execute(_DELETE_RANGE, {"lo": lo, "hi": hi})
+            written += conn.execute(_INSERT_RANGE, {"lo": lo, "hi": hi}).rowcount
+        logger.info("小时汇总已回填至 %s，共 %d 行", hi, written)
+        lo = hi
+    return written
@@ -1,77 +1,178 @@
+import inspect
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app import analytics
+from app import analytics, fastjson, rendering, scheduler, schemas
 
 router = APIRouter(
     prefix="/api/v1/analytics",
     tags=["Analytics"]
 )
 
-@router.get("/device-usage-frequency")
-def device_usage_frequency(user_id: Optional[int] = Query(None), db: Session = Depends(get_db)):
-    """设备使用频率分析"""
+
+# format=chart 返回 Base64 图像；format=data 只返回 SQL 聚合结果（列式 JSON），不经过 matplotlib；
+# format=png / webp / svg 直接返回图像字节，可用 width / height（像素）与 dpi 控制尺寸
+FORMAT_PATTERN = "^(chart|data|png|webp|svg)$"
+
+# 图像按 ETag 校验：数据没变时返回 304，客户端每次使用前都需要重新校验
+IMAGE_CACHE_CONTROL = "private, no-cache"
+
+
+class ImageOptions:
+    """二进制图像格式的尺寸参数与请求中的 If-None-Match"""
+
+    def __init__(
+        self,
+        request: Request,
+        width: Optional[int] = Query(None, ge=16, le=4000, description="图像宽度（像素）"),
+        height: Optional[int] = Query(None, ge=16, le=4000, description="图像高度（像素）"),
+        dpi: Optional[float] = Query(None, ge=20, le=600),
+    ):
+        self.width = width
+        self.height = height
+        self.dpi = dpi
+        self.if_none_match = request.headers.get("if-none-match")
+
+
+def _precomputed(chart, data, format: str, db: Session, user_id: Optional[int] = None, **params):
+    """默认参数的请求优先使用定时预计算的结果（app/scheduler.py），没有足够新的结果时返回 None"""
+    defaults = inspect.signature(data).parameters
+    if any(defaults[name].default != value for name, value in params.items()):
+        return None
+    result = scheduler.fresh_result(db, chart.__name__, user_id, format)
+    if result is None:
+        return None
+    if result.error is not None:
+        raise HTTPException(status_code=500, detail=result.error)
+    if format == "data":
+        return Response(content=b'{"data":' + result.data.encode() + b'}', media_type="application/json")
+    return {"chart": result.chart}
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 为逗号分隔的 ETag 列表，按弱比较（忽略 W/ 前缀）；* 匹配任意 ETag"""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag.strip('"') == etag:
+            return True
+    return False
+
+
+def _image_response(chart, data, format: str, image: ImageOptions, **kwargs) -> Response:
+    payload = data(**kwargs)
+    options = (format, image.width, image.height, image.dpi)
+    etag = analytics.image_etag(chart.__name__, payload, *options)
+    headers = {"ETag": f'"{etag}"', "Cache-Control": IMAGE_CACHE_CONTROL}
+    if _etag_matches(image.if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    content = analytics.chart_image(chart.__name__, payload, etag, *options)
+    return Response(content=content, media_type=analytics.IMAGE_TYPES[format], headers=headers)
+
+
+def _respond(chart, data, format: str, image: Optional[ImageOptions] = None, **kwargs):
+    """执行分析并把渲染层的异常映射为 HTTP 状态码"""
+    if format in ("chart", "data"):
+        precomputed = _precomputed(chart, data, format, **kwargs)
+        if precomputed is not None:
+            return precomputed
     try:
-        chart = analytics.device_usage_frequency(db=db, user_id=user_id)
-        return {"chart": chart}
+        if format in analytics.IMAGE_TYPES:
+            return _image_response(chart, data, format, image, **kwargs)
+        if format == "data":
+            return fastjson.json_response({"data": data(**kwargs)})
+        return {"chart": chart(**kwargs)}
+    except rendering.RenderBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except rendering.RenderTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except PoolTimeoutError:
+        # 等不到数据库连接：交给 main.py 的处理器返回 503
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/device-usage-frequency")
+def device_usage_frequency(user_id: Optional[int] = Query(None), format: str = Query("chart", pattern=FORMAT_PATTERN), image: ImageOptions = Depends(), db: Session = Depends(get_db)):
+    """设备使用频率分析"""
+    return _respond(analytics.device_usage_frequency, analytics.device_usage_frequency_data, format, image, db=db, user_id=user_id)
+
+
 @router.get("/device_usage_time_slot")
-def device_usage_time_slot(user_id: Optional[int] = Query(None), db: Session = Depends(get_db)):
-    """设备使用时间段分析"""
-    try:
-        chart = analytics.device_usage_time_slot(db=db, user_id=user_id)
-        return {"chart": chart}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+def device_usage_time_slot(
+    user_id: Optional[int] = Query(None),
+    format: str = Query("chart", pattern=FORMAT_PATTERN),
+    split_weekend: bool = False,
+    weight: str = Query("count", pattern="^(count|duration)$"),
+    image: ImageOptions = Depends(),
+    db: Session = Depends(get_db)
+):
+    """设备使用时间段分析（每台设备 24 小时分布；可按工作日/周末拆分，可按使用时长加权）"""
+    return _respond(
+        analytics.device_usage_time_slot, analytics.device_usage_time_slot_data, format, image,
+        db=db, user_id=user_id, split_weekend=split_weekend, weight=weight
+    )
 
 @router.get("/usage-patterns")
-def device_usage_patterns(user_id: Optional[int] = Query(None), db: Session = Depends(get_db)):
-    """用户使用习惯分析（设备共现使用热力图）"""
-    try:
-        chart = analytics.device_usage_patterns(user_id=user_id, db=db)
-        return {"chart": chart}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+def device_usage_patterns(
+    user_id: Optional[int] = Query(None),
+    format: str = Query("chart", pattern=FORMAT_PATTERN),
+    start: Optional[schemas.UtcDatetime] = None,
+    end: Optional[schemas.UtcDatetime] = None,
+    image: ImageOptions = Depends(),
+    db: Session = Depends(get_db)
+):
+    """用户使用习惯分析（按使用区间真实重叠时长计算的设备共现，可限定时间窗口 [start, end)）"""
+    return _respond(
+        analytics.device_usage_patterns, analytics.device_usage_patterns_data, format, image,
+        user_id=user_id, db=db, start=start, end=end
+    )
 
 @router.get("/area-impact")
-def house_area_device_usage(user_id: Optional[int] = Query(None), db: Session = Depends(get_db)):
+def house_area_device_usage(user_id: Optional[int] = Query(None), format: str = Query("chart", pattern=FORMAT_PATTERN), image: ImageOptions = Depends(), db: Session = Depends(get_db)):
     """房屋面积与设备使用行为分析"""
-    try:
-        chart = analytics.house_area_device_usage(db=db, user_id=user_id)
-        return {"chart": chart}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return _respond(analytics.house_area_device_usage, analytics.house_area_device_usage_data, format, image, db=db, user_id=user_id)
 
 
 @router.get("/security-device-correlation")
-def security_event_device_correlation(user_id: Optional[int] = Query(None), db: Session = Depends(get_db)):
+def security_event_device_correlation(user_id: Optional[int] = Query(None), format: str = Query("chart", pattern=FORMAT_PATTERN), image: ImageOptions = Depends(), db: Session = Depends(get_db)):
     """安防事件与设备使用关联性分析"""
-    try:
-        chart = analytics.security_event_device_correlation(db=db, user_id=user_id)
-        return {"chart": chart}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return _respond(analytics.security_event_device_correlation, analytics.security_event_device_correlation_data, format, image, db=db, user_id=user_id)
 
 
 @router.get("/satisfaction-analysis")
-def satisfaction_device_usage(user_id: Optional[int] = Query(None), db: Session = Depends(get_db)):
+def satisfaction_device_usage(user_id: Optional[int] = Query(None), format: str = Query("chart", pattern=FORMAT_PATTERN), image: ImageOptions = Depends(), db: Session = Depends(get_db)):
     """用户满意度与设备使用频率的关系分析"""
-    try:
-        chart = analytics.satisfaction_device_usage(db=db, user_id=user_id)
-        return {"chart": chart}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return _respond(analytics.satisfaction_device_usage, analytics.satisfaction_device_usage_data, format, image, db=db, user_id=user_id)
 
 
 @router.get("/energy-consumption-distribution")
-def energy_consumption_distribution(user_id: Optional[int] = Query(None), db: Session = Depends(get_db)):
+def energy_consumption_distribution(user_id: Optional[int] = Query(None), format: str = Query("chart", pattern=FORMAT_PATTERN), image: ImageOptions = Depends(), db: Session = Depends(get_db)):
     """设备能耗分布分析"""
-    try:
-        chart = analytics.energy_consumption_distribution(db=db, user_id=user_id)
-        return {"chart": chart}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return _respond(analytics.energy_consumption_distribution, analytics.energy_consumption_distribution_data, format, image, db=db, user_id=user_id)
+
+
+@router.get("/dashboard")
+def dashboard(
+    user_id: Optional[int] = Query(None),
+    analyses: Optional[str] = Query(None, description="逗号分隔的分析名称（与各分析的路由路径一致），默认全部"),
+    format: str = Query("chart", pattern="^(chart|data)$"),
+    db: Session = Depends(get_db)
+):
+    """仪表盘：一次请求、一个数据库会话返回多项分析，单项失败记录在 errors 中"""
+    names = [name.strip() for name in analyses.split(",") if name.strip()] if analyses else list(analytics.DASHBOARD_ANALYSES)
+    unknown = [name for name in names if name not in analytics.DASHBOARD_ANALYSES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"未知的分析名称: {'、'.join(unknown)}")
+    result = analytics.dashboard(db, list(dict.fromkeys(names)), user_id=user_id, format=format)
+    if format == "data":
+        return fastjson.json_response(result)
+    return result
@@ -1,10 +1,11 @@
 # app/routers/device_router.py
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from app import crud, schemas
-from app.database import get_db
+from app import async_crud, crud, fastjson, pagination, schemas
+from app.database import get_async_db, get_db
 
 router = APIRouter(
     prefix="/api/v1/devices",
@@ -12,14 +13,18 @@ router = APIRouter(
 )
 
 @router.get("/", response_model=List[schemas.Device])
-def get_devices(skip: int = 0, limit: int = 100, user_id: Optional[int] = None, db: Session = Depends(get_db)):
-    """获取设备列表（可选按用户过滤）"""
-    return crud.get_devices(db, skip=skip, limit=limit, user_id=user_id)
+async def get_devices(response: Response, cursor: Optional[str] = None, limit: int = 100, skip: int = 0, user_id: Optional[int] = None, fast: bool = False, db: AsyncSession = Depends(get_async_db)):
+    """获取设备列表（可选按用户过滤；游标分页，下一页游标见 X-Next-Cursor 响应头；fast=true 时跳过逐行模型校验，直接输出 JSON）"""
+    devices = await async_crud.get_devices(db, skip=skip, limit=limit, user_id=user_id, after_id=pagination.decode_cursor(cursor), as_rows=fast)
+    if fast:
+        return fastjson.rows_response(devices, headers=pagination.next_cursor_headers(devices, limit))
+    pagination.set_next_cursor(response, devices, limit)
+    return devices
 
 @router.get("/{device_id}", response_model=schemas.Device)
-def get_device(device_id: int, db: Session = Depends(get_db)):
+async def get_device(device_id: int, db: AsyncSession = Depends(get_async_db)):
     """获取设备详情"""
-    device = crud.get_device(db, device_id=device_id)
+    device = await async_crud.get_device(db, device_id=device_id)
     if device is None:
         raise HTTPException(status_code=404, detail="设备不存在")
     return device
@@ -0,0 +1,46 @@
+# app/routers/export_router.py
+
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Path, Query
+from fastapi.responses import StreamingResponse
+from app import export, schemas
+
+router = APIRouter(
+    prefix="/api/v1/export",
+    tags=["Export"]
+)
+
+DATASET_PATTERN = "^(usage|events|feedback)$"
+
+
+@router.get("/{dataset}")
+def export_dataset(
+    dataset: str = Path(..., pattern=DATASET_PATTERN),
+    format: str = Query("csv", pattern="^(csv|ndjson|arrow|parquet)$"),
+    device_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    start: Optional[schemas.UtcDatetime] = None,
+    end: Optional[schemas.UtcDatetime] = None,
+):
+    """流式导出使用记录 / 安防事件 / 用户反馈
+
+    支持 CSV、NDJSON 以及 zstd 压缩的 Arrow IPC 流、Parquet；
+    可按设备、用户、时间 [start, end) 过滤。
+    """
+    ds = export.DATASETS[dataset]
+    media_type, extension, writer = export.FORMATS[format]
+    batches = export.iter_batches(ds, device_id=device_id, user_id=user_id, start=start, end=end)
+    return StreamingResponse(
+        writer(ds, batches),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{ds.name}.{extension}"'},
+    )
+
+
+@router.post("/{dataset}/snapshot")
+def snapshot_dataset(dataset: str = Path(..., pattern=DATASET_PATTERN)):
+    """把整张表写成当天的 Parquet 快照文件（目录由 SNAPSHOT_DIR 配置）"""
+    try:
+        return export.write_snapshot(export.DATASETS[dataset])
+    except OSError as e:
+        raise HTTPException(status_code=500, detail=f"快照写入失败: {e}")
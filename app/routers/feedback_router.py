@@ -1,9 +1,9 @@
 # app/routers/feedback_router.py
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
-from typing import List
-from app import crud, schemas
+from typing import List, Optional
+from app import crud, fastjson, pagination, schemas
 from app.database import get_db
 
 router = APIRouter(
@@ -12,9 +12,13 @@ router = APIRouter(
 )
 
 @router.get("/", response_model=List[schemas.UserFeedback])
-def get_feedbacks(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """获取用户反馈列表"""
-    return crud.get_feedbacks(db, skip=skip, limit=limit)
+def get_feedbacks(response: Response, cursor: Optional[str] = None, limit: int = 100, skip: int = 0, fast: bool = False, db: Session = Depends(get_db)):
+    """获取用户反馈列表（游标分页，下一页游标见 X-Next-Cursor 响应头；fast=true 时跳过逐行模型校验，直接输出 JSON）"""
+    feedbacks = crud.get_feedbacks(db, skip=skip, limit=limit, after_id=pagination.decode_cursor(cursor), as_rows=fast)
+    if fast:
+        return fastjson.rows_response(feedbacks, headers=pagination.next_cursor_headers(feedbacks, limit))
+    pagination.set_next_cursor(response, feedbacks, limit)
+    return feedbacks
 
 @router.get("/{feedback_id}", response_model=schemas.UserFeedback)
 def get_feedback(feedback_id: int, db: Session = Depends(get_db)):
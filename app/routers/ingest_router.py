@@ -0,0 +1,61 @@
+# app/routers/ingest_router.py
+
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app import ingest
+from app.database import get_db
+
+router = APIRouter(
+    prefix="/api/v1/ingest",
+    tags=["Ingest"]
+)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+@router.post("/ndjson")
+async def ingest_ndjson(
+    request: Request,
+    record_type: Optional[str] = Query(None, pattern="^(usage|event)$"),
+    db: Session = Depends(get_db),
+):
+    """流式写入使用记录与安防事件（application/x-ndjson）
+
+    每行一个 JSON 对象，"type" 字段取 usage 或 event。请求体边读边解析，
+    每累计 STREAM_CHUNK_ROWS 行写一次库，结束后返回写入数量与错误汇总。
+    """
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith(NDJSON_MEDIA_TYPE):
+        raise HTTPException(status_code=415, detail=f"请求体类型必须为 {NDJSON_MEDIA_TYPE}")
+
+    ingestor = ingest.StreamIngestor(db, record_type=record_type)
+    buffer = b""
+    skipping = False  # 正在丢弃一条超长行的剩余部分
+    chunks = 0
+    async for data in request.stream():
+        *lines, buffer = (buffer + data).split(b"\n")
+        for line in lines:
+            if skipping:
+                skipping = False
+            elif len(line) > ingest.STREAM_MAX_LINE_BYTES:
+                ingestor.add_oversized_line()
+            else:
+                ingestor.add_line(line)
+        if not skipping and len(buffer) > ingest.STREAM_MAX_LINE_BYTES:
+            ingestor.add_oversized_line()
+            skipping = True
+        if skipping:
+            buffer = b""
+
+        if ingestor.pending >= ingest.STREAM_CHUNK_ROWS:
+            await run_in_threadpool(ingestor.flush)
+            chunks += 1
+
+    if buffer and not skipping:
+        ingestor.add_line(buffer)
+    if ingestor.pending:
+        await run_in_threadpool(ingestor.flush)
+        chunks += 1
+    return {**ingestor.summary(), "chunks": chunks}
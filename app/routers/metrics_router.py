@@ -0,0 +1,39 @@
+# app/routers/metrics_router.py
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from app.database import async_engine, engine, get_db
+from app import analytics_cache, pool_metrics, rendering, scheduler, write_buffer
+
+router = APIRouter(
+    prefix="/api/v1/metrics",
+    tags=["Metrics"]
+)
+
+@router.get("/write-buffer")
+def write_buffer_metrics():
+    """写后缓冲队列深度、刷写次数与耗时"""
+    return write_buffer.stats()
+
+@router.get("/render")
+def render_metrics():
+    """图表渲染进程池的并发、超时与耗时"""
+    return rendering.stats()
+
+@router.get("/analytics-cache")
+def analytics_cache_metrics():
+    """分析结果缓存的命中率、条目数与占用字节"""
+    return analytics_cache.stats()
+
+@router.get("/precompute")
+def precompute_metrics(db: Session = Depends(get_db)):
+    """分析预计算的运行耗时与各分析结果的新鲜度"""
+    return scheduler.stats(db)
+
+@router.get("/pool")
+def pool_metrics_view():
+    """同步、异步引擎连接池的签出数、溢出连接、等待耗时直方图与签出超时次数"""
+    return {
+        "sync": pool_metrics.stats(engine.pool),
+        "async": pool_metrics.stats(async_engine.sync_engine.pool),
+    }
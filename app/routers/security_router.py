@@ -1,10 +1,11 @@
 # app/routers/security_router.py
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
-from app import crud, schemas
-from app.database import get_db
+from typing import List, Optional, Union
+from app import async_crud, crud, fastjson, pagination, schemas, write_buffer
+from app.database import get_async_db, get_db
 
 router = APIRouter(
     prefix="/api/v1/security",
@@ -12,25 +13,53 @@ router = APIRouter(
 )
 
 @router.get("/", response_model=List[schemas.SecurityEvent])
-def get_events(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """获取安防事件列表"""
-    return crud.get_events(db, skip=skip, limit=limit)
+async def get_events(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    skip: int = 0,
+    device_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    event_type: Optional[str] = None,
+    severity: Optional[str] = None,
+    start: Optional[schemas.UtcDatetime] = None,
+    end: Optional[schemas.UtcDatetime] = None,
+    fast: bool = False,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """获取安防事件列表（可按设备、用户、事件类型、严重程度、时间 [start, end) 过滤；游标分页，下一页游标见 X-Next-Cursor 响应头；fast=true 时跳过逐行模型校验，直接输出 JSON）"""
+    events = await async_crud.get_events(
+        db, skip=skip, limit=limit, after_id=pagination.decode_cursor(cursor),
+        device_id=device_id, user_id=user_id, event_type=event_type,
+        severity=severity, start=start, end=end, as_rows=fast
+    )
+    if fast:
+        return fastjson.rows_response(events, headers=pagination.next_cursor_headers(events, limit))
+    pagination.set_next_cursor(response, events, limit)
+    return events
 
 @router.get("/{event_id}", response_model=schemas.SecurityEvent)
-def get_event(event_id: int, db: Session = Depends(get_db)):
+async def get_event(event_id: int, db: AsyncSession = Depends(get_async_db)):
     """获取某条安防事件"""
-    event = crud.get_event(db, event_id=event_id)
+    event = await async_crud.get_event(db, event_id=event_id)
     if event is None:
         raise HTTPException(status_code=404, detail="事件不存在")
     return event
 
-@router.post("/", response_model=schemas.SecurityEvent)
-def create_event(event: schemas.SecurityEventCreate, db: Session = Depends(get_db)):
-    """创建安防事件"""
-    return crud.create_event(db, event=event)
+@router.post("/", response_model=Union[schemas.SecurityEvent, schemas.WriteAccepted])
+async def create_event(event: schemas.SecurityEventCreate, response: Response, db: AsyncSession = Depends(get_async_db)):
+    """创建安防事件（开启写后缓冲时入队后立即返回 202）"""
+    if write_buffer.WRITE_BEHIND_ENABLED:
+        try:
+            write_buffer.event_buffer.submit(event)
+        except write_buffer.WriteBufferUnavailable as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+        response.status_code = 202
+        return {"queue_depth": write_buffer.event_buffer.stats()["queue_depth"]}
+    return await async_crud.create_event(db, event=event)
 
 @router.put("/{event_id}", response_model=schemas.SecurityEvent)
-def update_event(event_id: int, event: schemas.SecurityEventCreate, db: Session = Depends(get_db)):
+def update_event(event_id: int, event: schemas.SecurityEventUpdate, db: Session = Depends(get_db)):
     """更新安防事件"""
     db_event = crud.update_event(db, event_id=event_id, event=event)
     if db_event is None:
@@ -1,10 +1,14 @@
 # app/routers/usage_router.py
 
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import timedelta
+from itertools import islice
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Response
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
-from app import crud, schemas
-from app.database import get_db
+from typing import Any, List, Optional, Union
+from app import async_crud, crud, fastjson, ingest, models, pagination, schemas, sessions, write_buffer
+from app.database import get_async_db, get_db
 
 router = APIRouter(
     prefix="/api/v1/usage",
@@ -12,27 +16,85 @@ router = APIRouter(
 )
 
 @router.get("/", response_model=List[schemas.DeviceUsage])
-def get_usages(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """获取设备使用记录列表"""
-    return crud.get_usages(db, skip=skip, limit=limit)
+async def get_usages(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    skip: int = 0,
+    device_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    start: Optional[schemas.UtcDatetime] = None,
+    end: Optional[schemas.UtcDatetime] = None,
+    fast: bool = False,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """获取设备使用记录列表（可按设备、用户、开始时间 [start, end) 过滤；游标分页，下一页游标见 X-Next-Cursor 响应头；fast=true 时跳过逐行模型校验，直接输出 JSON）"""
+    usages = await async_crud.get_usages(
+        db, skip=skip, limit=limit, after_id=pagination.decode_cursor(cursor),
+        device_id=device_id, user_id=user_id, start=start, end=end, as_rows=fast
+    )
+    if fast:
+        return fastjson.rows_response(usages, headers=pagination.next_cursor_headers(usages, limit))
+    pagination.set_next_cursor(response, usages, limit)
+    return usages
+
+@router.get("/sessions", response_model=List[schemas.UsageSession])
+def get_usage_sessions(
+    device_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    start: Optional[schemas.UtcDatetime] = None,
+    end: Optional[schemas.UtcDatetime] = None,
+    gap_seconds: float = Query(sessions.USAGE_SESSION_GAP.total_seconds(), ge=0, le=86400),
+    limit: int = Query(1000, ge=1, le=10000),
+    db: Session = Depends(get_db)
+):
+    """按设备合并重叠或间隔不超过 gap_seconds 秒的使用记录，返回会话列表（按设备、开始时间排序，最多 limit 个）
+
+    只读取时合并，不改写数据；过滤条件与列表接口相同，记录较多时请按设备或时间窗口缩小范围。
+    """
+    usage = models.DeviceUsage
+    rows = crud.usage_query(db, device_id=device_id, user_id=user_id, start=start, end=end)\
+        .with_entities(usage.device_id, usage.user_id, usage.start_time, usage.end_time, usage.energy_consumption)\
+        .order_by(usage.device_id, usage.start_time)\
+        .yield_per(5000)
+    return list(islice(sessions.iter_sessions(rows, gap=timedelta(seconds=gap_seconds)), limit))
 
 @router.get("/{usage_id}", response_model=schemas.DeviceUsage)
-def get_usage(usage_id: int, db: Session = Depends(get_db)):
+async def get_usage(usage_id: int, db: AsyncSession = Depends(get_async_db)):
     """获取某条设备使用记录"""
-    usage = crud.get_usage(db, usage_id=usage_id)
+    usage = await async_crud.get_usage(db, usage_id=usage_id)
     if usage is None:
         raise HTTPException(status_code=404, detail="使用记录不存在")
     return usage
 
-@router.post("/", response_model=schemas.DeviceUsage)
-def create_usage(usage: schemas.DeviceUsageCreate, db: Session = Depends(get_db)):
-    """创建设备使用记录"""
-    return crud.create_usage(db, usage=usage)
+@router.post("/", response_model=Union[schemas.DeviceUsage, schemas.WriteAccepted])
+async def create_usage(usage: schemas.DeviceUsageCreate, response: Response, db: AsyncSession = Depends(get_async_db)):
+    """创建设备使用记录（开启写后缓冲时入队后立即返回 202）"""
+    if write_buffer.WRITE_BEHIND_ENABLED:
+        try:
+            write_buffer.usage_buffer.submit(usage)
+        except write_buffer.WriteBufferUnavailable as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+        response.status_code = 202
+        return {"queue_depth": write_buffer.usage_buffer.stats()["queue_depth"]}
+    return await async_crud.create_usage(db, usage=usage)
+
+@router.post("/bulk", response_model=schemas.DeviceUsageBulkResult)
+def create_usages_bulk(usages: List[Any] = Body(...), db: Session = Depends(get_db)):
+    """批量创建设备使用记录（单事务多行写入，逐行返回校验错误）"""
+    if len(usages) > ingest.BULK_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"单次最多写入 {ingest.BULK_MAX_ROWS} 条记录")
+    valid, errors = ingest.validate_usages(db, enumerate(usages))
+    inserted_ids = crud.create_usages_bulk(db, usages=valid)
+    return {"inserted_ids": inserted_ids, "duplicate_count": len(valid) - len(inserted_ids), "errors": errors}
 
 @router.put("/{usage_id}", response_model=schemas.DeviceUsage)
 def update_usage(usage_id: int, usage: schemas.DeviceUsageCreate, db: Session = Depends(get_db)):
     """更新设备使用记录"""
-    db_usage = crud.update_usage(db, usage_id=usage_id, usage=usage)
+    try:
+        db_usage = crud.update_usage(db, usage_id=usage_id, usage=usage)
+    except IntegrityError:
+        raise HTTPException(status_code=409, detail="与已有数据冲突：该设备在此开始时间已有记录，或设备/用户不存在")
     if db_usage is None:
         raise HTTPException(status_code=404, detail="使用记录不存在")
     return db_usage
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
-from app import crud, schemas
-from app.database import get_db
+from typing import List, Optional
+from app import async_crud, crud, fastjson, pagination, schemas
+from app.database import get_async_db, get_db
 
 router = APIRouter(
     prefix="/api/v1/users",
@@ -10,14 +11,18 @@ router = APIRouter(
 )
 
 @router.get("/", response_model=List[schemas.User])
-def get_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """获取用户列表"""
-    return crud.get_users(db, skip=skip, limit=limit)
+async def get_users(response: Response, cursor: Optional[str] = None, limit: int = 100, skip: int = 0, fast: bool = False, db: AsyncSession = Depends(get_async_db)):
+    """获取用户列表（游标分页，下一页游标见 X-Next-Cursor 响应头；skip 为兼容旧的偏移分页；fast=true 时跳过逐行模型校验，直接输出 JSON）"""
+    users = await async_crud.get_users(db, skip=skip, limit=limit, after_id=pagination.decode_cursor(cursor), as_rows=fast)
+    if fast:
+        return fastjson.rows_response(users, headers=pagination.next_cursor_headers(users, limit))
+    pagination.set_next_cursor(response, users, limit)
+    return users
 
 @router.get("/{user_id}", response_model=schemas.User)
-def get_user(user_id: int, db: Session = Depends(get_db)):
+async def get_user(user_id: int, db: AsyncSession = Depends(get_async_db)):
     """获取用户详情"""
-    user = crud.get_user(db, user_id=user_id)
+    user = await async_crud.get_user(db, user_id=user_id)
     if user is None:
         raise HTTPException(status_code=404, detail="用户不存在")
     return user
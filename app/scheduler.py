@@ -0,0 +1,246 @@
+# app/scheduler.py
+"""
+分析结果定时预计算
+后台线程按固定周期为全局视图和每个用户计算 app/analytics.py 中的全部分析（默认参数），
+写入 analytics_results 表：重启后结果仍在，接口在结果足够新时直接返回，不再现场计算。
+- 用户按最近使用时间排序，活跃用户先算；
+- 多个 API 进程同时运行时用 PostgreSQL advisory lock 保证同一时刻只有一个进程在算；
+- 图表渲染繁忙（RenderBusy）时只保存数据，图表留空，接口回退到现场渲染。
+"""
+import datetime
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+import orjson
+from sqlalchemy import func, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app import analytics, models, rendering
+from app.database import SessionLocal, engine
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_PRECOMPUTE_ENABLED = os.getenv("ANALYTICS_PRECOMPUTE_ENABLED", "false").lower() == "true"
+ANALYTICS_PRECOMPUTE_INTERVAL = float(os.getenv("ANALYTICS_PRECOMPUTE_INTERVAL", "600"))
+ANALYTICS_PRECOMPUTE_MAX_AGE = float(os.getenv("ANALYTICS_PRECOMPUTE_MAX_AGE", "900"))
+ANALYTICS_PRECOMPUTE_MAX_USERS = int(os.getenv("ANALYTICS_PRECOMPUTE_MAX_USERS", "0"))  # 0 表示全部用户
+ANALYTICS_PRECOMPUTE_CHARTS = os.getenv("ANALYTICS_PRECOMPUTE_CHARTS", "true").lower() == "true"
+
+GLOBAL_USER = 0
+_LOCK_KEY = 0x5348_4150  # advisory lock 键，各进程一致即可
+
+# 预计算的分析：表中的 analysis 列 -> (图表函数, 数据函数)
+ANALYSES = {
+    chart: (getattr(analytics, chart), data)
+    for chart, data in analytics.DASHBOARD_ANALYSES.values()
+}
+
+RESULTS = models.AnalyticsResult.__table__
+
+_thread: Optional[threading.Thread] = None
+_stopping = threading.Event()
+_stats_lock = threading.Lock()
+_stats = {
+    "runs": 0,
+    "failed_runs": 0,
+    "skipped_runs": 0,  # 其他进程正在计算
+    "last_run_at": None,
+    "last_run_ms": 0.0,
+    "max_run_ms": 0.0,
+    "last_scopes": 0,
+    "last_results": 0,
+    "last_errors": 0,
+    "served": 0,
+    "stale": 0,
+}
+
+
+def _count(key: str, delta: int = 1):
+    with _stats_lock:
+        _stats[key] += delta
+
+
+# ------------------------------
+# 计算与保存
+# ------------------------------
+def _users_by_activity(db: Session) -> List[int]:
+    """按最近一次设备使用时间倒序排列的用户，没有使用记录的用户排在最后"""
+    last_active = func.max(models.DeviceUsageHourly.hour)
+    query = db.query(models.User.id)\
+        .outerjoin(models.Device, models.Device.user_id == models.User.id)\
+        .outerjoin(models.DeviceUsageHourly, models.DeviceUsageHourly.device_id == models.Device.id)\
+        .group_by(models.User.id)\
+        .order_by(last_active.desc().nullslast(), models.User.id)
+    if ANALYTICS_PRECOMPUTE_MAX_USERS > 0:
+        query = query.limit(ANALYTICS_PRECOMPUTE_MAX_USERS)
+    return [row.id for row in query.all()]
+
+
+def compute_scope(db: Session, user_id: int) -> List[Dict[str, Any]]:
+    """计算一个视图（全局或单个用户）的全部分析，返回待写入 analytics_results 的行"""
+    rows = []
+    for analysis, (chart, data) in ANALYSES.items():
+        started = time.perf_counter()
+        row = {"analysis": analysis, "user_id": user_id, "data": None, "chart": None, "error": None}
+        # 按关键字传参：各分析函数的参数顺序并不一致（如 device_usage_patterns 为 user_id 在前）
+        try:
+            payload = data(db=db, user_id=user_id or None)
+            row["data"] = orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+        except Exception as e:
+            db.rollback()
+            row["error"] = str(e)
+        if row["error"] is None and ANALYTICS_PRECOMPUTE_CHARTS:
+            # 图表失败不影响已算好的数据：chart 留空，图表请求回退到实时计算
+            try:
+                row["chart"] = chart(db=db, user_id=user_id or None)
+            except (rendering.RenderBusy, rendering.RenderTimeout) as e:
+                logger.info("预计算 %s[%s] 图表跳过: %s", analysis, user_id, e)
+            except Exception:
+                db.rollback()
+                logger.exception("预计算 %s[%s] 图表失败", analysis, user_id)
+        row["computed_at"] = datetime.datetime.utcnow()
+        row["duration_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        rows.append(row)
+    return rows
+
+
+def save_results(db: Session, rows: List[Dict[str, Any]]):
+    stmt = pg_insert(RESULTS)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[RESULTS.c.analysis, RESULTS.c.user_id],
+        set_={name: stmt.excluded[name] for name in ("data", "chart", "error", "computed_at", "duration_ms")},
+    )
+    db.execute(stmt, rows)
+    db.commit()
+
+
+def run_once() -> Dict[str, Any]:
+    """执行一轮预计算：全局视图在前，用户按活跃度排序；其他进程正在计算时直接返回"""
+    started = time.perf_counter()
+    with engine.connect() as lock_conn:
+        if not lock_conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": _LOCK_KEY}).scalar():
+            _count("skipped_runs")
+            return {"skipped": True}
+        try:
+            db = SessionLocal()
+            try:
+                scopes = [GLOBAL_USER] + _users_by_activity(db)
+                results = errors = 0
+                for user_id in scopes:
+                    if _stopping.is_set():
+                        break
+                    rows = compute_scope(db, user_id)
+                    save_results(db, rows)
+                    results += len(rows)
+                    errors += sum(1 for row in rows if row["error"])
+                # 清理已删除用户的结果
+                db.execute(text(
+                    "DELETE FROM analytics_results r WHERE r.user_id <> 0 "
+                    "AND NOT EXISTS (SELECT 1 FROM users u WHERE u.id = r.user_id)"
+                ))
+                db.commit()
+            finally:
+                db.close()
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _LOCK_KEY})
+            lock_conn.commit()
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    with _stats_lock:
+        _stats["runs"] += 1
+        _stats["last_run_at"] = datetime.datetime.utcnow().isoformat()
+        _stats["last_run_ms"] = round(elapsed_ms, 3)
+        _stats["max_run_ms"] = max(_stats["max_run_ms"], round(elapsed_ms, 3))
+        _stats["last_scopes"] = len(scopes)
+        _stats["last_results"] = results
+        _stats["last_errors"] = errors
+    logger.info("分析预计算完成：%d 个视图，%d 项结果，耗时 %.0f ms", len(scopes), results, elapsed_ms)
+    return {"skipped": False, "scopes": len(scopes), "results": results, "errors": errors, "ms": round(elapsed_ms, 3)}
+
+
+# ------------------------------
+# 读取
+# ------------------------------
+def fresh_result(db: Session, analysis: str, user_id: Optional[int], format: str) -> Optional[models.AnalyticsResult]:
+    """返回不超过 ANALYTICS_PRECOMPUTE_MAX_AGE 秒的预计算结果；没有、过期或缺少所需格式时返回 None"""
+    if not ANALYTICS_PRECOMPUTE_ENABLED or analysis not in ANALYSES:
+        return None
+    result = db.get(models.AnalyticsResult, (analysis, user_id or GLOBAL_USER))
+    if result is None:
+        return None
+    age = (datetime.datetime.utcnow() - result.computed_at).total_seconds()
+    if age > ANALYTICS_PRECOMPUTE_MAX_AGE or (result.error is None and (result.chart if format == "chart" else result.data) is None):
+        _count("stale")
+        return None
+    _count("served")
+    return result
+
+
+# ------------------------------
+# 后台线程
+# ------------------------------
+def _seconds_until_due() -> float:
+    """距下一轮的等待时间：以表中全局结果的计算时间为准，重启后不重复计算仍然新鲜的结果"""
+    with SessionLocal() as db:
+        last = db.query(func.min(RESULTS.c.computed_at)).filter(RESULTS.c.user_id == GLOBAL_USER).scalar()
+    if last is None:
+        return 0.0
+    return max(0.0, ANALYTICS_PRECOMPUTE_INTERVAL - (datetime.datetime.utcnow() - last).total_seconds())
+
+
+def _run():
+    try:
+        wait = _seconds_until_due()
+    except Exception:
+        logger.exception("读取预计算结果时间失败")
+        wait = 0.0
+    while not _stopping.wait(wait):
+        try:
+            run_once()
+        except Exception:
+            _count("failed_runs")
+            logger.exception("分析预计算失败")
+        wait = ANALYTICS_PRECOMPUTE_INTERVAL
+
+
+def start():
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return
+    _stopping.clear()
+    _thread = threading.Thread(target=_run, name="analytics-precompute", daemon=True)
+    _thread.start()
+
+
+def stop(timeout: float = 30):
+    """通知后台线程停止；正在计算的一轮会在当前视图完成后结束"""
+    if _thread is None:
+        return
+    _stopping.set()
+    _thread.join(timeout)
+
+
+def stats(db: Session) -> Dict[str, Any]:
+    """运行统计与各分析结果的新鲜度（秒）"""
+    with _stats_lock:
+        snapshot = dict(_stats)
+    now = datetime.datetime.utcnow()
+    staleness = {}
+    for analysis, oldest, newest, count in db.query(
+        RESULTS.c.analysis, func.min(RESULTS.c.computed_at), func.max(RESULTS.c.computed_at), func.count()
+    ).group_by(RESULTS.c.analysis).all():
+        staleness[analysis] = {
+            "results": count,
+            "max_age_s": round((now - oldest).total_seconds(), 3),
+            "min_age_s": round((now - newest).total_seconds(), 3),
+        }
+    snapshot.update({
+        "enabled": ANALYTICS_PRECOMPUTE_ENABLED,
+        "running": _thread is not None and _thread.is_alive(),
+        "interval_s": ANALYTICS_PRECOMPUTE_INTERVAL,
+        "max_age_s": ANALYTICS_PRECOMPUTE_MAX_AGE,
+        "staleness": staleness,
+    })
+    return snapshot
@@ -1,8 +1,20 @@
 # app/schemas.py
 
-from typing import Optional, List
-from datetime import datetime
-from pydantic import BaseModel, Field
+from typing import Annotated, Any, Optional, List
+from datetime import datetime, timezone
+from pydantic import AfterValidator, BaseModel, Field
+
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """带时区的时间换算为 UTC 后去掉时区信息；库中时间列均为不带时区的 UTC 时间"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+# 请求体字段与查询参数共用：客户端传 ...Z / +08:00 时统一转成不带时区的 UTC，
+# asyncpg 不接受带时区的值写入/比较 timestamp 列，合并、去重时也不会混用两种时间
+UtcDatetime = Annotated[datetime, AfterValidator(naive_utc)]
 
 
 # -----------------------------
@@ -71,8 +83,8 @@ class Device(DeviceBase):
 class DeviceUsageBase(BaseModel):
     device_id: int
     user_id: int
-    start_time: datetime
-    end_time: datetime
+    start_time: UtcDatetime
+    end_time: UtcDatetime
     energy_consumption: Optional[float]
 
 
@@ -87,6 +99,34 @@ class DeviceUsage(DeviceUsageBase):
         from_attributes = True
 
 
+class BulkRowError(BaseModel):
+    index: int  # 该行在请求列表中的下标
+    detail: Any
+
+
+class DeviceUsageBulkResult(BaseModel):
+    inserted_ids: List[int]  # 开启会话化时为新增或被合并改写的会话 id
+    duplicate_count: int = 0  # 已存在（或合并进同一会话）而没有单独成行的记录数
+    errors: List[BulkRowError]
+
+
+class UsageSession(BaseModel):
+    """读取时按间隔合并出的使用会话"""
+    device_id: int
+    user_id: int
+    start_time: datetime
+    end_time: datetime
+    energy_consumption: Optional[float]
+    duration_s: float
+    segment_count: int  # 合并的记录条数
+
+
+class WriteAccepted(BaseModel):
+    """写后缓冲模式下的受理回执（记录尚未落库，没有 id）"""
+    status: str = "accepted"
+    queue_depth: int
+
+
 # -----------------------------
 # 安防事件部分
 # -----------------------------
@@ -95,13 +135,18 @@ class SecurityEventBase(BaseModel):
     device_id: int
     event_type: str
     severity: str
-    timestamp: Optional[datetime] = None
+    timestamp: Optional[UtcDatetime] = None
 
 
 class SecurityEventCreate(SecurityEventBase):
     pass
 
 
+class SecurityEventUpdate(SecurityEventBase):
+    # timestamp 是分区表主键的一部分：可以省略（保持原值），但不接受 null
+    timestamp: UtcDatetime = None
+
+
 class SecurityEvent(SecurityEventBase):
     id: int
 
@@ -119,7 +164,7 @@ class UserFeedbackBase(BaseModel):
     feedback_type: str
     content: Optional[str]
     rating: Optional[int]
-    created_at: Optional[datetime] = None
+    created_at: Optional[UtcDatetime] = None
 
 
 class UserFeedbackCreate(UserFeedbackBase):
@@ -0,0 +1,255 @@
+# app/sessions.py
+"""
+使用记录会话化
+同一设备（同一用户）重叠或间隔不超过 USAGE_SESSION_GAP_SECONDS 秒的使用记录合并为一个会话（一行）：
+- 写入时（USAGE_SESSIONIZE_ON_INGEST）新记录与已有的相邻记录合并后落库；
+- 历史数据由 `python manage.py sessionize-usage` 按设备分批合并；
+- 会话最长 USAGE_SESSION_MAX_HOURS 小时，超出后另起一个会话，按时间窗口查询时的分区裁剪仍然成立。
+能耗按功率恒定计算：与会话已覆盖时段重叠的部分不重复计入，只计入延伸出来的那一段。
+"""
+import datetime
+import logging
+import os
+from itertools import groupby
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from sqlalchemy import bindparam, delete, insert, text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from app import models, rollups, schemas
+
+logger = logging.getLogger(__name__)
+
+# 默认关闭：开启后写入接口返回合并后的记录，之前返回的 id 可能被后续合并删除，批量写入也改为按设备加锁合并
+USAGE_SESSIONIZE_ON_INGEST = os.getenv("USAGE_SESSIONIZE_ON_INGEST", "false").lower() == "true"
+USAGE_SESSION_GAP = datetime.timedelta(seconds=float(os.getenv("USAGE_SESSION_GAP_SECONDS", "60")))
+USAGE_SESSION_MAX = datetime.timedelta(hours=float(os.getenv("USAGE_SESSION_MAX_HOURS", "24")))
+USAGE_SESSION_BATCH_SIZE = int(os.getenv("USAGE_SESSION_BATCH_SIZE", "5000"))
+
+FIELDS = ("device_id", "user_id", "start_time", "end_time", "energy_consumption")
+_LOCK_KEY = 0x5345  # advisory lock 第一个键，第二个键为 device_id
+
+_SELECT = """
+    SELECT id, device_id, user_id, start_time, end_time, energy_consumption
+    FROM device_usage
+    WHERE device_id = :device_id AND {where}
+    ORDER BY start_time, id
+    {limit}
+    FOR UPDATE
+"""
+# 改写与删除用 Core 语句而不是 text()：分析缓存按语句的目标表记录写入（app/analytics_cache.py）
+_USAGE = models.DeviceUsage.__table__
+_BY_KEY = (_USAGE.c.id == bindparam("b_id"), _USAGE.c.start_time == bindparam("b_start"))
+_DELETE = delete(_USAGE).where(*_BY_KEY)
+_UPDATE = update(_USAGE).where(*_BY_KEY)  # SET 的列取自参数中的 start_time / end_time / energy_consumption
+
+
+# ------------------------------
+# 合并
+# ------------------------------
+def _new_energy(segment: Dict[str, Any], covered_until: datetime.datetime) -> Optional[float]:
+    """segment 中 covered_until 之后那一段的能耗（按时长比例）"""
+    energy = segment["energy_consumption"]
+    if energy is None or segment["start_time"] >= covered_until:
+        return energy
+    if segment["end_time"] <= covered_until:
+        return 0.0
+    duration = (segment["end_time"] - segment["start_time"]).total_seconds()
+    return energy * (segment["end_time"] - covered_until).total_seconds() / duration
+
+
+def merge_segments(
+    segments: Iterable[Dict[str, Any]],
+    gap: datetime.timedelta = USAGE_SESSION_GAP,
+    max_length: datetime.timedelta = USAGE_SESSION_MAX,
+) -> List[Dict[str, Any]]:
+    """把按 start_time 排序的同一设备记录合并为会话
+
+    每个会话包含 FIELDS 各字段与 members（合并进来的原始记录，保持输入顺序）。
+    """
+    sessions: List[Dict[str, Any]] = []
+    current: Optional[Dict[str, Any]] = None
+    for segment in segments:
+        if (
+            current is not None
+            and segment["user_id"] == current["user_id"]
+            and segment["start_time"] <= current["end_time"] + gap
+            and max(segment["end_time"], current["end_time"]) - current["start_time"] <= max_length
+        ):
+            energy = _new_energy(segment, current["end_time"])
+            if energy is not None:
+                current["energy_consumption"] = (current["energy_consumption"] or 0.0) + energy
+            current["end_time"] = max(current["end_time"], segment["end_time"])
+            current["members"].append(segment)
+            continue
+        current = {name: segment[name] for name in FIELDS}
+        current["members"] = [segment]
+        sessions.append(current)
+    return sessions
+
+
+def save_sessions(db: Session, sessions: List[Dict[str, Any]]):
+    """把合并结果写回 device_usage 并增量维护小时汇总（在调用方的事务内）
+
+    会话中已有的记录保留最早的一行并改写为会话的值，其余删除；全部由新记录组成的会话插入一行。
+    每个会话补上 "id"（对应的行）与 "written"（该行是否新增或被改写）。
+    """
+    deleted: List[Dict[str, Any]] = []
+    changed: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []  # (会话, 被改写的原有行)
+    created: List[Dict[str, Any]] = []
+    for session in sessions:
+        existing = [member for member in session["members"] if member.get("id") is not None]
+        if not existing:
+            created.append(session)
+            continue
+        keep = existing[0]
+        deleted.extend(existing[1:])
+        session["id"] = keep["id"]
+        session["written"] = any(keep[name] != session[name] for name in FIELDS)
+        if session["written"]:
+            changed.append((session, keep))
+
+    # 先删后改：保留行的新 start_time 可能与被删除的行相同
+    if deleted:
+        db.execute(_DELETE, [{"b_id": row["id"], "b_start": row["start_time"]} for row in deleted])
+    if changed:
+        db.execute(_UPDATE, [
+            {
+                "start_time": session["start_time"],
+                "end_time": session["end_time"],
+                "energy_consumption": session["energy_consumption"],
+                "b_id": keep["id"],
+                "b_start": keep["start_time"],
+            }
+            for session, keep in changed
+        ])
+    if created:
+        stmt = insert(models.DeviceUsage).returning(models.DeviceUsage.id, sort_by_parameter_order=True)
+        ids = db.execute(stmt, [{name: session[name] for name in FIELDS} for session in created]).scalars().all()
+        for session, usage_id in zip(created, ids):
+            session["id"] = usage_id
+            session["written"] = True
+
+    rollups.apply_usage_deltas(db, deleted + [keep for _, keep in changed], sign=-1)
+    rollups.apply_usage_deltas(db, [session for session in sessions if session["written"]])
+
+
+def _lock_device(db: Session, device_id: int):
+    """同一设备的合并串行执行，直到事务结束"""
+    db.execute(text("SELECT pg_advisory_xact_lock(:key, :device_id)"), {"key": _LOCK_KEY, "device_id": device_id})
+
+
+# ------------------------------
+# 写入时合并
+# ------------------------------
+def merge_on_ingest(db: Session, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """新记录与同设备已有的重叠/相邻记录合并后写入（在调用方的事务内）
+
+    返回与 rows 一一对应的会话（含 "id" 与 "written"）。重复上报或完全落在已有会话内的记录不改动任何行。
+    时间先统一为不带时区的 UTC，才能与库中读出的记录比较、排序。
+    """
+    by_device: Dict[int, List[Dict[str, Any]]] = {}
+    for index, row in enumerate(rows):
+        by_device.setdefault(row["device_id"], []).append({
+            **row,
+            "start_time": schemas.naive_utc(row["start_time"]),
+            "end_time": schemas.naive_utc(row["end_time"]),
+            "id": None,
+            "index": index,
+        })
+
+    result: List[Optional[Dict[str, Any]]] = [None] * len(rows)
+    # 按设备 id 顺序加锁，并发批次之间不会死锁
+    for device_id in sorted(by_device):
+        new = by_device[device_id]
+        _lock_device(db, device_id)
+        lo = min(row["start_time"] for row in new) - USAGE_SESSION_GAP
+        hi = max(row["end_time"] for row in new) + USAGE_SESSION_GAP
+        existing = db.execute(
+            text(_SELECT.format(where="start_time <= :hi AND end_time >= :lo AND start_time >= :lo_start", limit="")),
+            {"device_id": device_id, "lo": lo, "hi": hi, "lo_start": lo - USAGE_SESSION_MAX},
+        ).mappings().all()
+        # 与已有记录自然键 (device_id, start_time) 相同的新记录是重复上报，不参与合并
+        known = {row["start_time"]: row["id"] for row in existing}
+        fresh = [row for row in new if row["start_time"] not in known]
+        sessions = merge_segments(sorted([dict(row) for row in existing] + fresh, key=lambda row: row["start_time"]))
+        save_sessions(db, sessions)
+        by_row_id = {}
+        for session in sessions:
+            for member in session["members"]:
+                if member["id"] is None:
+                    result[member["index"]] = session
+                else:
+                    by_row_id[member["id"]] = session
+        for row in new:
+            if row["start_time"] in known:
+                result[row["index"]] = by_row_id[known[row["start_time"]]]
+    return result
+
+
+# ------------------------------
+# 历史数据合并
+# ------------------------------
+def sessionize_device(
+    engine: Engine,
+    device_id: int,
+    since: Optional[datetime.datetime] = None,
+    batch_size: int = USAGE_SESSION_BATCH_SIZE,
+) -> int:
+    """合并某台设备 since 之后的历史记录，返回减少的行数
+
+    按 start_time 分批读取，每批一个事务；下一批从上一批最后一个会话开始，跨批的会话也能合并。
+    batch_size 至少为 2：每批只读一行时游标停在原地，永远读不到下一行。
+    """
+    if batch_size < 2:
+        raise ValueError("batch_size 至少为 2")
+    merged = 0
+    cursor = since
+    while True:
+        with Session(engine) as db:
+            _lock_device(db, device_id)
+            rows = db.execute(
+                text(_SELECT.format(where="start_time >= :cursor" if cursor else "TRUE", limit="LIMIT :limit")),
+                {"device_id": device_id, "cursor": cursor, "limit": batch_size},
+            ).mappings().all()
+            sessions = merge_segments([dict(row) for row in rows])
+            save_sessions(db, sessions)
+            db.commit()
+        merged += len(rows) - len(sessions)
+        if len(rows) < batch_size:
+            return merged
+        cursor = sessions[-1]["start_time"]
+
+
+def sessionize_history(
+    engine: Engine,
+    since: Optional[datetime.datetime] = None,
+    batch_size: int = USAGE_SESSION_BATCH_SIZE,
+) -> Dict[str, int]:
+    """逐台设备合并历史使用记录"""
+    with engine.connect() as conn:
+        device_ids = conn.execute(text("SELECT id FROM devices ORDER BY id")).scalars().all()
+    result = {"devices": 0, "merged": 0}
+    for device_id in device_ids:
+        merged = sessionize_device(engine, device_id, since, batch_size)
+        result["devices"] += 1
+        result["merged"] += merged
+        if merged:
+            logger.info("设备 %d: 合并减少 %d 行", device_id, merged)
+    return result
+
+
+# ------------------------------
+# 读取时合并
+# ------------------------------
+def iter_sessions(
+    rows: Iterable[Any],
+    gap: datetime.timedelta = USAGE_SESSION_GAP,
+    max_length: datetime.timedelta = USAGE_SESSION_MAX,
+) -> Iterator[Dict[str, Any]]:
+    """把按 (device_id, start_time) 排序的记录流式合并为会话，不改写数据"""
+    for _, device_rows in groupby(rows, key=lambda row: row.device_id):
+        for session in merge_segments(({name: getattr(row, name) for name in FIELDS} for row in device_rows), gap, max_length):
+            members = session.pop("members")
+            session["segment_count"] = len(members)
+            session["duration_s"] = (session["end_time"] - session["start_time"]).total_seconds()
+            yield session
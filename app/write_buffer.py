@@ -0,0 +1,176 @@
+# app/write_buffer.py
+
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from sqlalchemy.orm import Session
+from app import crud, ingest
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# 写后缓冲（write-behind）配置：开启后单条写入先入队立即返回，由后台线程批量落库
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "false").lower() == "true"
+WRITE_BEHIND_MAX_QUEUE = int(os.getenv("WRITE_BEHIND_MAX_QUEUE", "10000"))
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "500"))
+WRITE_BEHIND_FLUSH_MS = int(os.getenv("WRITE_BEHIND_FLUSH_MS", "200"))
+WRITE_BEHIND_DRAIN_TIMEOUT = float(os.getenv("WRITE_BEHIND_DRAIN_TIMEOUT", "30"))
+
+
+class WriteBufferUnavailable(Exception):
+    """队列已满或正在关闭，调用方应返回 503 让客户端稍后重试"""
+
+
+class WriteBehindBuffer:
+    """有界队列 + 后台刷写线程
+
+    每累计 batch_size 条或距本批第一条超过 flush_ms 毫秒即写库一次（单事务）。
+    入队前数据已通过 Pydantic 校验，外键等依赖数据库的校验在刷写时按批完成，
+    不合法的行会被丢弃并计入 dropped。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        validate: Callable[[Session, Any], Any],
+        write_batch: Callable[[Session, List[Any]], List[int]],
+        max_queue: int = WRITE_BEHIND_MAX_QUEUE,
+        batch_size: int = WRITE_BEHIND_BATCH_SIZE,
+        flush_ms: int = WRITE_BEHIND_FLUSH_MS,
+    ):
+        self.name = name
+        self._validate = validate
+        self._write_batch = write_batch
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {
+            "accepted": 0,
+            "rejected": 0,
+            "flushed": 0,
+            "dropped": 0,
+            "failed": 0,
+            "flushes": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name=f"write-behind-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = WRITE_BEHIND_DRAIN_TIMEOUT):
+        """停止接收新数据，并等待队列中剩余数据全部写库"""
+        if not self.running:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.error("write-behind[%s] 未能在 %.0fs 内排空，剩余 %d 条", self.name, timeout, self._queue.qsize())
+
+    def submit(self, item: Any):
+        if self._stopping.is_set() or not self.running:
+            self._count("rejected")
+            raise WriteBufferUnavailable(f"{self.name} 写入队列未运行")
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._count("rejected")
+            raise WriteBufferUnavailable(f"{self.name} 写入队列已满")
+        self._count("accepted")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        total_flush_ms = stats.pop("total_flush_ms")
+        stats["avg_flush_ms"] = round(total_flush_ms / stats["flushes"], 3) if stats["flushes"] else 0.0
+        stats["queue_depth"] = self._queue.qsize()
+        stats["max_queue"] = self._queue.maxsize
+        stats["running"] = self.running
+        return stats
+
+    def _count(self, key: str, value: int = 1):
+        with self._lock:
+            self._stats[key] += value
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                if self._stopping.is_set():
+                    return
+                continue
+
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining <= 0 or self._stopping.is_set():
+                        batch.append(self._queue.get_nowait())
+                    else:
+                        batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch: List[Any]):
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            valid, errors = self._validate(db, enumerate(batch))
+            written = len(self._write_batch(db, valid))
+            self._count("flushed", written)
+            if errors:
+                self._count("dropped", len(errors))
+                logger.warning("write-behind[%s] 丢弃 %d 条不合法记录: %s", self.name, len(errors), errors[:5])
+        except Exception:
+            db.rollback()
+            self._count("failed", len(batch))
+            logger.exception("write-behind[%s] 批量写入 %d 条失败", self.name, len(batch))
+        finally:
+            db.close()
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._stats["flushes"] += 1
+            self._stats["last_flush_ms"] = round(elapsed_ms, 3)
+            self._stats["max_flush_ms"] = max(self._stats["max_flush_ms"], round(elapsed_ms, 3))
+            self._stats["total_flush_ms"] += elapsed_ms
+
+
+usage_buffer = WriteBehindBuffer("usage", ingest.validate_usages, crud.create_usages_bulk)
+event_buffer = WriteBehindBuffer("event", ingest.validate_events, crud.create_events_bulk)
+
+
+def start():
+    usage_buffer.start()
+    event_buffer.start()
+
+
+def stop():
+    usage_buffer.stop()
+    event_buffer.stop()
+
+
+def stats() -> Dict[str, Any]:
+    return {
+        "enabled": WRITE_BEHIND_ENABLED,
+        "usage": usage_buffer.stats(),
+        "event": event_buffer.stats(),
+    }
@@ -0,0 +1,116 @@
+# benchmarks/bulk_ingest.py
+"""
+使用记录写入吞吐对比：逐条 POST /api/v1/usage/ 与一次 POST /api/v1/usage/bulk
+每种规模新建一个用户和若干设备写入不重复的记录，结束后删除；统计行/秒、加速比，
+以及批量请求中数据库耗时（各语句执行时间之和）所占比例。
+固定关闭写后缓冲与写入时会话化，比较的是默认的 INSERT ... ON CONFLICT 写入路径。
+用法: python benchmarks/bulk_ingest.py [--rows 1000 10000] [--devices 20]
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["WRITE_BEHIND_ENABLED"] = "false"
+os.environ["USAGE_SESSIONIZE_ON_INGEST"] = "false"
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event, text
+from app.database import engine
+from main import app
+
+
+class DbTimer:
+    """通过引擎事件累计同步引擎上的语句执行时间"""
+
+    def __init__(self):
+        self.db_ms = 0.0
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("bench_start", []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        self.db_ms += (time.perf_counter() - conn.info["bench_start"].pop()) * 1000
+
+
+def make_rows(client: TestClient, rows: int, devices: int):
+    """新建一个用户及其名下 devices 台设备，返回 (用户 id, 设备 id 列表, 记录列表)"""
+    user = client.post("/api/v1/users/", json={
+        "name": "压测用户", "email": f"bench-{uuid.uuid4().hex[:12]}@smarthome.com", "phone": None, "house_area": 100.0,
+    }).json()
+    device_ids = [
+        client.post("/api/v1/devices/", json={
+            "name": f"压测设备-{i}", "type": "smart_plug", "location": "客厅", "user_id": user["id"],
+        }).json()["id"]
+        for i in range(devices)
+    ]
+    begin = datetime.datetime(2026, 1, 1)
+    payload = []
+    for i in range(rows):
+        start = begin + datetime.timedelta(minutes=2 * (i // devices))
+        payload.append({
+            "device_id": device_ids[i % devices], "user_id": user["id"], "energy_consumption": 0.01,
+            "start_time": start.isoformat(), "end_time": (start + datetime.timedelta(minutes=1)).isoformat(),
+        })
+    return user["id"], device_ids, payload
+
+
+def cleanup(user_id: int, device_ids):
+    """删除压测数据（汇总表随设备级联删除）"""
+    with engine.begin() as conn:
+        params = {"ids": list(device_ids)}
+        conn.execute(text("DELETE FROM device_usage WHERE device_id = ANY(:ids)"), params)
+        conn.execute(text("DELETE FROM devices WHERE id = ANY(:ids)"), params)
+        conn.execute(text("DELETE FROM users WHERE id = :id"), {"id": user_id})
+
+
+def per_row(client: TestClient, rows: int, devices: int) -> float:
+    user_id, device_ids, payload = make_rows(client, rows, devices)
+    try:
+        begin = time.perf_counter()
+        for row in payload:
+            client.post("/api/v1/usage/", json=row).raise_for_status()
+        return time.perf_counter() - begin
+    finally:
+        cleanup(user_id, device_ids)
+
+
+def bulk(client: TestClient, rows: int, devices: int, timer: DbTimer):
+    """返回 (耗时秒, 数据库耗时毫秒)"""
+    user_id, device_ids, payload = make_rows(client, rows, devices)
+    try:
+        timer.db_ms = 0.0
+        begin = time.perf_counter()
+        response = client.post("/api/v1/usage/bulk", json=payload)
+        elapsed = time.perf_counter() - begin
+        response.raise_for_status()
+        assert len(response.json()["inserted_ids"]) == rows, response.json()["errors"][:3]
+        return elapsed, timer.db_ms
+    finally:
+        cleanup(user_id, device_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="使用记录逐条写入与批量写入吞吐对比")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--devices", type=int, default=20)
+    args = parser.parse_args()
+
+    timer = DbTimer()
+    with TestClient(app) as client:
+        bulk(client, 100, args.devices, timer)  # 预热
+        print(f"{'行数':>8} {'逐条 行/秒':>12} {'批量 行/秒':>12} {'加速比':>8} {'批量 DB 占比':>12}")
+        for rows in args.rows:
+            single = per_row(client, rows, args.devices)
+            elapsed, db_ms = bulk(client, rows, args.devices, timer)
+            print(f"{rows:>8} {rows / single:>12.0f} {rows / elapsed:>12.0f} {single / elapsed:>7.1f}x "
+                  f"{db_ms / 1000 / elapsed:>11.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# benchmarks/correlation_scaling.py
+"""
+安防关联 / 满意度分析的查询形态对比：直接三表关联（使用记录 x 事件 的笛卡尔积）与先按设备预聚合再关联
+数据在临时表中按规模生成，不影响业务表；事件数为使用记录的 1/100，反馈数为 1/1000。
+用法: python benchmarks/correlation_scaling.py [--rows 100000 1000000 10000000] [--devices 200] [--timeout 60]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from app.database import engine
+
+SETUP = [
+    "DROP TABLE IF EXISTS b_devices, b_usage, b_events, b_feedback",
+    "CREATE TEMP TABLE b_devices AS SELECT g AS id, 'device' || (g % 50) AS name FROM generate_series(1, :devices) g",
+    "CREATE TEMP TABLE b_usage AS SELECT g AS id, (g % :devices) + 1 AS device_id FROM generate_series(1, :rows) g",
+    "CREATE TEMP TABLE b_events AS SELECT g AS id, (g % :devices) + 1 AS device_id, 'type' || (g % 8) AS event_type "
+    "FROM generate_series(1, :rows / 100) g",
+    "CREATE TEMP TABLE b_feedback AS SELECT g AS id, (g % :devices) + 1 AS device_id, (g % 5) + 1 AS rating "
+    "FROM generate_series(1, :rows / 1000) g",
+    "ANALYZE b_devices",
+    "ANALYZE b_usage",
+    "ANALYZE b_events",
+    "ANALYZE b_feedback",
+]
+
+QUERIES = {
+    "security/fan-out": """
+        SELECT d.name, e.event_type, count(u.id)
+        FROM b_usage u JOIN b_devices d ON d.id = u.device_id JOIN b_events e ON e.device_id = d.id
+        GROUP BY d.name, e.event_type
+    """,
+    "security/pre-agg": """
+        SELECT d.id, d.name, e.event_type, e.event_count, u.usage_count
+        FROM b_devices d
+        JOIN (SELECT device_id, count(*) AS usage_count FROM b_usage GROUP BY device_id) u ON u.device_id = d.id
+        JOIN (SELECT device_id, event_type, count(*) AS event_count FROM b_events GROUP BY device_id, event_type) e
+          ON e.device_id = d.id
+    """,
+    "satisfaction/fan-out": """
+        SELECT f.device_id, d.name, f.rating, count(u.id)
+        FROM b_feedback f JOIN b_devices d ON d.id = f.device_id JOIN b_usage u ON u.device_id = d.id
+        GROUP BY f.device_id, d.name, f.rating
+    """,
+    "satisfaction/pre-agg": """
+        SELECT f.device_id, d.name, f.rating, u.usage_count, f.feedback_count
+        FROM (SELECT device_id, rating, count(*) AS feedback_count FROM b_feedback GROUP BY device_id, rating) f
+        JOIN b_devices d ON d.id = f.device_id
+        JOIN (SELECT device_id, count(*) AS usage_count FROM b_usage GROUP BY device_id) u ON u.device_id = f.device_id
+    """,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="关联分析查询规模测试")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000, 10_000_000])
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--timeout", type=int, default=60, help="单条查询超时（秒）")
+    args = parser.parse_args()
+
+    print(f"{'使用记录':>10} " + " ".join(f"{name:>22}" for name in QUERIES))
+    with engine.connect() as conn:
+        for rows in args.rows:
+            for statement in SETUP:
+                conn.execute(text(statement), {"rows": rows, "devices": args.devices})
+            conn.commit()
+            results = []
+            for sql in QUERIES.values():
+                conn.execute(text(f"SET statement_timeout = {args.timeout * 1000}"))
+                begin = time.perf_counter()
+                try:
+                    conn.execute(text(sql)).all()
+                    results.append(f"{(time.perf_counter() - begin) * 1000:>19.1f} ms")
+                except OperationalError:
+                    conn.rollback()
+                    results.append(f"{'> ' + str(args.timeout) + ' s':>22}")
+                conn.commit()
+            print(f"{rows:>10} " + " ".join(results))
+
+
+if __name__ == "__main__":
+    main()
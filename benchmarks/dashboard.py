@@ -0,0 +1,112 @@
+# benchmarks/dashboard.py
+"""
+仪表盘数据库开销对比：并发调用 7 个分析接口 与 一次调用 /api/v1/analytics/dashboard
+统计 SQL 语句数、数据库耗时（各语句执行时间之和）、连接签出次数与同时占用的最大连接数。
+使用 format=data，只比较取数部分；分析结果缓存会被关闭，每轮都真正查询数据库。
+用法: python benchmarks/dashboard.py [--user-id 1] [--repeat 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["ANALYTICS_CACHE_ENABLED"] = "false"
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from app.database import engine
+from main import app
+
+ROUTES = [
+    "device-usage-frequency",
+    "device_usage_time_slot",
+    "usage-patterns",
+    "area-impact",
+    "security-device-correlation",
+    "satisfaction-analysis",
+    "energy-consumption-distribution",
+]
+
+
+class Probe:
+    """通过引擎事件统计语句数、数据库耗时与连接签出"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+        event.listen(engine.pool, "checkout", self._checkout)
+        event.listen(engine.pool, "checkin", self._checkin)
+
+    def reset(self):
+        self.statements = 0
+        self.db_ms = 0.0
+        self.checkouts = 0
+        self.in_use = 0
+        self.peak = 0
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("bench_start", []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = (time.perf_counter() - conn.info["bench_start"].pop()) * 1000
+        with self.lock:
+            self.statements += 1
+            self.db_ms += elapsed
+
+    def _checkout(self, dbapi_conn, record, proxy):
+        with self.lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.peak = max(self.peak, self.in_use)
+
+    def _checkin(self, dbapi_conn, record):
+        with self.lock:
+            self.in_use -= 1
+
+
+def separate_calls(client: TestClient, params: dict):
+    with ThreadPoolExecutor(max_workers=len(ROUTES)) as executor:
+        responses = list(executor.map(lambda route: client.get(f"/api/v1/analytics/{route}", params=params), ROUTES))
+    for response in responses:
+        response.raise_for_status()
+
+
+def dashboard_call(client: TestClient, params: dict):
+    response = client.get("/api/v1/analytics/dashboard", params=params)
+    response.raise_for_status()
+    assert not response.json()["errors"], response.json()["errors"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="仪表盘数据库开销对比")
+    parser.add_argument("--user-id", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    params = {"format": "data"}
+    if args.user_id is not None:
+        params["user_id"] = args.user_id
+
+    probe = Probe()
+    with TestClient(app) as client:
+        print(f"{'方式':<12} {'耗时 ms':>10} {'SQL 语句':>10} {'DB 耗时 ms':>12} {'连接签出':>10} {'最大连接数':>10}")
+        for label, call in [("7 次调用", separate_calls), ("dashboard", dashboard_call)]:
+            call(client, params)  # 预热
+            rows = []
+            for _ in range(args.repeat):
+                probe.reset()
+                begin = time.perf_counter()
+                call(client, params)
+                rows.append(((time.perf_counter() - begin) * 1000, probe.statements, probe.db_ms, probe.checkouts, probe.peak))
+            wall, statements, db_ms, checkouts, peak = (statistics.median(column) for column in zip(*rows))
+            print(f"{label:<12} {wall:>10.1f} {statements:>10.0f} {db_ms:>12.1f} {checkouts:>10.0f} {peak:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
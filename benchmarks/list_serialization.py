@@ -0,0 +1,50 @@
+# benchmarks/list_serialization.py
+"""
+列表接口序列化性能对比：默认模式（ORM 实体 + Pydantic 校验）与 fast=true（列元组 + orjson）
+用法: python benchmarks/list_serialization.py [--rows 100 1000 10000] [--repeat 20]
+需要 .env 指向一个至少有 10000 条使用记录的数据库（可先运行 generator.py）
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+from main import app
+
+
+def measure(client: TestClient, path: str, params: dict, repeat: int):
+    """返回 (中位耗时毫秒, 响应字节数)"""
+    client.get(path, params=params)  # 预热
+    timings = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        response = client.get(path, params=params)
+        timings.append((time.perf_counter() - begin) * 1000)
+        response.raise_for_status()
+    return statistics.median(timings), len(response.content)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="列表接口序列化基准")
+    parser.add_argument("--path", default="/api/v1/usage/")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    client = TestClient(app)
+    print(f"{'行数':>8} {'默认(ms)':>10} {'fast(ms)':>10} {'加速比':>8}")
+    for rows in args.rows:
+        slow, slow_bytes = measure(client, args.path, {"limit": rows}, args.repeat)
+        fast, fast_bytes = measure(client, args.path, {"limit": rows, "fast": "true"}, args.repeat)
+        if slow_bytes < 2:
+            print(f"{rows:>8} 无数据")
+            continue
+        print(f"{rows:>8} {slow:>10.2f} {fast:>10.2f} {slow / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
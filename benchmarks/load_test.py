@@ -0,0 +1,138 @@
+# benchmarks/load_test.py
+"""
+高频 CRUD 接口压测：对运行中的服务发起固定并发的请求，统计吞吐（请求/秒）与延迟分位数
+请求混合：用户/设备/使用记录/安防事件的列表页与按 id 查询，--write-ratio 比例的请求为创建安防事件。
+每个虚拟客户端一条 keep-alive 连接，直接用 asyncio 收发 HTTP/1.1（比 httpx 连接池开销小得多）；
+客户端按 --processes 拆成多个进程（每个进程一个事件循环），避免压测端自身成为瓶颈。
+用法:
+    uvicorn main:app --workers 1 &
+    python benchmarks/load_test.py [--url http://127.0.0.1:8000] [--concurrency 500] [--duration 20]
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import random
+import statistics
+import time
+import urllib.request
+from multiprocessing import Pool
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+RESOURCES = ["users", "devices", "usage", "security"]
+SECURITY_EVENT_TYPES = ["intrusion", "fire", "gas_leak", "door_open"]
+REQUEST_TIMEOUT = 60  # 单个请求超时（秒）
+
+
+def fetch_ids(url: str, resource: str, count: int) -> List[int]:
+    with urllib.request.urlopen(f"{url}/api/v1/{resource}/?limit={count}&fast=true", timeout=30) as response:
+        return [row["id"] for row in json.load(response)]
+
+
+def next_request(ids: Dict[str, List[int]], write_ratio: float, rng: random.Random) -> Tuple[str, str, Optional[dict]]:
+    """随机选一个请求：(方法, 路径, 请求体)"""
+    if rng.random() < write_ratio:
+        return "POST", "/api/v1/security/", {
+            "device_id": rng.choice(ids["devices"]),
+            "event_type": rng.choice(SECURITY_EVENT_TYPES),
+            "severity": "low",
+            "timestamp": datetime.datetime.utcnow().isoformat(),
+        }
+    resource = rng.choice(RESOURCES)
+    if rng.random() < 0.5:
+        return "GET", f"/api/v1/{resource}/?{urlencode({'limit': 20})}", None
+    return "GET", f"/api/v1/{resource}/{rng.choice(ids[resource])}", None
+
+
+async def _request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, host: str, method: str, path: str, payload: Optional[dict]) -> int:
+    """在 keep-alive 连接上发送一个请求并读完响应，返回状态码"""
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    headers = dict(line.split(":", 1) for line in lines[1:] if ":" in line)
+    length = next((int(value) for name, value in headers.items() if name.lower() == "content-length"), 0)
+    await reader.readexactly(length)
+    return int(lines[0].split()[1])
+
+
+async def _client(url: str, deadline: float, ids, write_ratio: float, seed: int, latencies: List[float], errors: Dict[str, int]):
+    rng = random.Random(seed)
+    target = urlsplit(url)
+    connection = None
+    while time.perf_counter() < deadline:
+        method, path, payload = next_request(ids, write_ratio, rng)
+        begin = time.perf_counter()
+        try:
+            if connection is None:
+                connection = await asyncio.open_connection(target.hostname, target.port or 80)
+            status = await asyncio.wait_for(_request(*connection, target.netloc, method, path, payload), REQUEST_TIMEOUT)
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            if connection is not None:
+                connection[1].close()
+            connection = None
+            continue
+        if status >= 400:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+            continue
+        latencies.append((time.perf_counter() - begin) * 1000)
+    if connection is not None:
+        connection[1].close()
+
+
+async def _run(url: str, concurrency: int, duration: float, ids, write_ratio: float, seed: int):
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(
+        _client(url, deadline, ids, write_ratio, seed * 100_000 + i, latencies, errors)
+        for i in range(concurrency)
+    ))
+    return latencies, errors
+
+
+def worker(args) -> Tuple[List[float], Dict[str, int]]:
+    return asyncio.run(_run(*args))
+
+
+def percentile(values: List[float], q: float) -> float:
+    return statistics.quantiles(values, n=1000, method="inclusive")[int(q * 1000) - 1] if len(values) > 1 else (values or [0.0])[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="高频 CRUD 接口压测")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=500, help="并发客户端总数")
+    parser.add_argument("--duration", type=float, default=20, help="压测时长（秒）")
+    parser.add_argument("--warmup", type=float, default=3, help="预热时长（秒），不计入结果")
+    parser.add_argument("--processes", type=int, default=4, help="压测端进程数")
+    parser.add_argument("--write-ratio", type=float, default=0.0, help="创建安防事件的请求比例")
+    args = parser.parse_args()
+
+    ids = {resource: fetch_ids(args.url, resource, 200) for resource in RESOURCES}
+    per_process = [args.concurrency // args.processes + (i < args.concurrency % args.processes) for i in range(args.processes)]
+    with Pool(args.processes) as pool:
+        if args.warmup:
+            pool.map(worker, [(args.url, n, args.warmup, ids, args.write_ratio, i) for i, n in enumerate(per_process)])
+        begin = time.perf_counter()
+        results = pool.map(worker, [(args.url, n, args.duration, ids, args.write_ratio, i) for i, n in enumerate(per_process)])
+        elapsed = time.perf_counter() - begin
+
+    latencies = [value for result, _ in results for value in result]
+    errors: Dict[str, int] = {}
+    for _, result in results:
+        for key, count in result.items():
+            errors[key] = errors.get(key, 0) + count
+    print(f"并发 {args.concurrency}，时长 {elapsed:.1f}s，写入比例 {args.write_ratio:.0%}")
+    print(f"成功请求 {len(latencies)}，吞吐 {len(latencies) / elapsed:.1f} req/s，错误 {sum(errors.values())} {errors or ''}")
+    print(f"延迟 ms: p50 {percentile(latencies, 0.50):.1f}  p95 {percentile(latencies, 0.95):.1f}  "
+          f"p99 {percentile(latencies, 0.99):.1f}  max {max(latencies or [0.0]):.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/startup_time.py
+"""
+API 进程启动耗时与导入预算检查
+每轮在新的解释器中导入 main（即 uvicorn 加载应用的过程）并执行启动钩子，记录耗时、内存和已加载的重型库。
+导入耗时中位数超过 --budget-ms，或 API 进程加载了 matplotlib / seaborn / pandas 时以非零状态退出，可放在 CI 中使用。
+用法: python benchmarks/startup_time.py [--repeat 5] [--budget-ms 1500]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 这些库只应在渲染工作进程中导入
+FORBIDDEN = ("matplotlib", "seaborn", "pandas")
+
+PROBE = """
+import json, resource, sys, time
+begin = time.perf_counter()
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app):
+    started = time.perf_counter()
+    loaded = [name for name in %r if name in sys.modules]
+print(json.dumps({
+    "import_ms": (imported - begin) * 1000,
+    "startup_ms": (started - begin) * 1000,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "loaded": loaded,
+}))
+""" % (FORBIDDEN,)
+
+
+def measure() -> dict:
+    # 关闭渲染预热和后台任务，只测 API 进程本身
+    env = dict(os.environ, RENDER_WARM_UP="false", ANALYTICS_PRECOMPUTE_ENABLED="false", WRITE_BEHIND_ENABLED="false")
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API 启动耗时与导入预算检查")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1500, help="导入 main 的耗时预算（中位数）")
+    args = parser.parse_args()
+
+    runs = [measure() for _ in range(args.repeat)]
+    import_ms = statistics.median(run["import_ms"] for run in runs)
+    startup_ms = statistics.median(run["startup_ms"] for run in runs)
+    rss_mb = statistics.median(run["rss_mb"] for run in runs)
+    loaded = sorted({name for run in runs for name in run["loaded"]})
+
+    print(f"导入 main:   {import_ms:8.1f} ms（预算 {args.budget_ms:.0f} ms）")
+    print(f"启动完成:    {startup_ms:8.1f} ms")
+    print(f"峰值内存:    {rss_mb:8.1f} MB")
+    print(f"重型库:      {', '.join(loaded) or '无'}")
+
+    failures = []
+    if import_ms > args.budget_ms:
+        failures.append(f"导入耗时 {import_ms:.0f} ms 超出预算 {args.budget_ms:.0f} ms")
+    if loaded:
+        failures.append(f"API 进程加载了 {', '.join(loaded)}")
+    for failure in failures:
+        print(f"✗ {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,7 @@ import os
 # 添加app目录到Python路径
 sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
 
+from app import rollups
 from app.database import SessionLocal, engine
 from app.models import Base, User, Device, DeviceUsage, SecurityEvent, UserFeedback
 
@@ -363,6 +364,7 @@ def generate_test_data():
         
         for device, device_type in all_devices:
             device_power = random.uniform(*DEVICE_TYPES[device_type]["power"])
+            seen_start_times = set()  # (device_id, start_time) 唯一，随机生成的重复开始时间直接跳过
             
             # 为每一天生成使用记录
             for day in range(DATA_DAYS):
@@ -370,6 +372,9 @@ def generate_test_data():
                 usage_records = generate_usage_times(device_type, current_date, device_power)
                 
                 for start_time, end_time, energy in usage_records:
+                    if start_time in seen_start_times:
+                        continue
+                    seen_start_times.add(start_time)
                     usage = DeviceUsage(
                         device_id=device.id,
                         user_id=device.user_id,
@@ -387,6 +392,11 @@ def generate_test_data():
         
         db.commit()
         print(f"✓ 设备使用记录生成完成，共生成 {usage_count} 条记录")
+
+        # 使用记录直接用 ORM 写入，不经过增量维护；分析接口读取汇总表，需按原始记录重建小时汇总
+        # （每日汇总只包含冷归档的记录，生成的数据都是原始记录，无需回填）
+        written = rollups.backfill_usage_hourly(engine)
+        print(f"✓ 小时汇总回填完成，共写入 {written} 行")
         
         # 4. 生成安防事件
         print("正在生成安防事件...")
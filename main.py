@@ -1,8 +1,11 @@
 # main.py
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from app.database import engine
+from app import rendering, scheduler, write_buffer
 
 
 # 导入各模块路由
@@ -12,7 +15,10 @@ from app.routers import (
     usage_router,
     security_router,
     feedback_router,
-    analytics_router
+    analytics_router,
+    ingest_router,
+    export_router,
+    metrics_router
 )
 
 
@@ -30,3 +36,48 @@ app.include_router(usage_router.router)
 app.include_router(security_router.router)
 app.include_router(feedback_router.router)
 app.include_router(analytics_router.router)
+app.include_router(ingest_router.router)
+app.include_router(export_router.router)
+app.include_router(metrics_router.router)
+
+
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    # DB_POOL_TIMEOUT 秒内等不到空闲连接：快速失败，让客户端稍后重试，而不是继续排队
+    return JSONResponse(status_code=503, content={"detail": "数据库连接繁忙，请稍后重试"}, headers={"Retry-After": "1"})
+
+
+@app.on_event("startup")
+def start_write_buffers():
+    if write_buffer.WRITE_BEHIND_ENABLED:
+        write_buffer.start()
+
+
+@app.on_event("shutdown")
+def drain_write_buffers():
+    # 关闭前把队列中已受理的数据全部写库
+    write_buffer.stop()
+
+
+@app.on_event("startup")
+def start_render_pool():
+    # 工作进程在后台导入绘图库，不阻塞启动；关闭预热时首次渲染才创建进程池
+    if rendering.RENDER_WARM_UP:
+        rendering.start()
+
+
+@app.on_event("startup")
+def start_precompute():
+    if scheduler.ANALYTICS_PRECOMPUTE_ENABLED:
+        scheduler.start()
+
+
+# 关闭钩子按注册顺序执行：先停预计算，再关闭它使用的渲染进程池
+@app.on_event("shutdown")
+def stop_precompute():
+    scheduler.stop()
+
+
+@app.on_event("shutdown")
+def stop_render_pool():
+    rendering.shutdown()
@@ -0,0 +1,105 @@
+# manage.py
+"""
+运维命令入口
+用法: python manage.py <命令> [参数]
+"""
+import argparse
+import datetime
+import logging
+
+from app import compaction, export, maintenance, partitions, rollups, sessions
+from app.database import engine
+
+
+def cmd_dedup_usage(args):
+    deleted = maintenance.dedup_usages(engine, chunk_size=args.chunk_size)
+    print(f"✓ 去重完成，共删除 {deleted} 条重复使用记录")
+    if deleted:
+        # 去重直接删除原始记录，不经过增量维护，需要重建小时汇总
+        written = rollups.backfill_usage_hourly(engine)
+        print(f"✓ 小时汇总已重建，共写入 {written} 行")
+
+
+def cmd_snapshot(args):
+    names = list(export.DATASETS) if args.dataset == "all" else [args.dataset]
+    for name in names:
+        info = export.write_snapshot(export.DATASETS[name], directory=args.dir)
+        print(f"✓ {info['dataset']}: {info['rows']} 行 -> {info['path']} ({info['bytes']} 字节)")
+
+
+def cmd_rollup_backfill(args):
+    written = rollups.backfill_usage_hourly(engine, since=args.since)
+    print(f"✓ 小时汇总回填完成，共写入 {written} 行")
+
+
+def cmd_partitions(args):
+    for table, retention in (("device_usage", args.usage_retention), ("security_events", args.event_retention)):
+        created = partitions.ensure_partitions(engine, table, ahead=args.ahead)
+        expired = partitions.apply_retention(engine, table, months=retention, drop=args.drop)
+        print(f"✓ {table}: 新建分区 {len(created)} 个，{'删除' if args.drop else '分离'}过期分区 {len(expired)} 个")
+        for name in created + expired:
+            print(f"  - {name}")
+
+
+def cmd_compact_usage(args):
+    result = compaction.compact_usage(engine, days=args.older_than_days, directory=args.dir, batch_size=args.batch_size)
+    if result["skipped"]:
+        print("✗ 另一个归档任务正在运行，本次跳过")
+        return
+    print(f"✓ 已归档 {result['cutoff']} 之前的 {result['rows']} 条使用记录"
+          f"（{result['days']} 天，{result['files']} 个文件，{result['bytes']} 字节）")
+
+
+def cmd_sessionize_usage(args):
+    if args.batch_size < 2:
+        raise SystemExit("✗ --batch-size 至少为 2")
+    result = sessions.sessionize_history(engine, since=args.since, batch_size=args.batch_size)
+    print(f"✓ 会话合并完成：{result['devices']} 台设备，减少 {result['merged']} 条使用记录")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="智能家居 API 运维命令")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    dedup = subparsers.add_parser("dedup-usage", help="按 (device_id, start_time) 清理重复的使用记录")
+    dedup.add_argument("--chunk-size", type=int, default=5000, help="每个事务删除的行数")
+    dedup.set_defaults(func=cmd_dedup_usage)
+
+    snapshot = subparsers.add_parser("snapshot", help="把数据表写成按日期命名的 Parquet 快照")
+    snapshot.add_argument("--dataset", choices=["all", *export.DATASETS], default="all")
+    snapshot.add_argument("--dir", default=export.SNAPSHOT_DIR, help="快照目录")
+    snapshot.set_defaults(func=cmd_snapshot)
+
+    backfill = subparsers.add_parser("rollup-backfill", help="从原始使用记录重建小时汇总表 device_usage_hourly")
+    backfill.add_argument("--since", type=datetime.datetime.fromisoformat, help="只重建该时间之后的数据，如 2024-01-01")
+    backfill.set_defaults(func=cmd_rollup_backfill)
+
+    parts = subparsers.add_parser("partitions", help="预建月分区，并按保留期分离或删除过期分区")
+    parts.add_argument("--ahead", type=int, default=partitions.PARTITIONS_AHEAD, help="预建当月之后几个月的分区")
+    parts.add_argument("--usage-retention", type=int, default=partitions.RETENTION_MONTHS["device_usage"],
+                       help="使用记录保留月数，0 为永久保留")
+    parts.add_argument("--event-retention", type=int, default=partitions.RETENTION_MONTHS["security_events"],
+                       help="安防事件保留月数，0 为永久保留")
+    parts.add_argument("--drop", action="store_true", help="直接删除过期分区（默认只分离，保留为独立表）")
+    parts.set_defaults(func=cmd_partitions)
+
+    compact = subparsers.add_parser("compact-usage", help="把过旧的原始使用记录归档为 Parquet 并降采样为每日汇总")
+    compact.add_argument("--older-than-days", type=int, default=compaction.USAGE_ARCHIVE_AFTER_DAYS,
+                         help="归档开始时间早于多少天前的记录")
+    compact.add_argument("--dir", default=compaction.USAGE_ARCHIVE_DIR, help="归档目录")
+    compact.add_argument("--batch-size", type=int, default=compaction.USAGE_ARCHIVE_BATCH_SIZE,
+                         help="每个事务（每个 Parquet 文件）的行数")
+    compact.set_defaults(func=cmd_compact_usage)
+
+    sessionize = subparsers.add_parser("sessionize-usage", help="把同一设备重叠或相邻的历史使用记录合并为会话")
+    sessionize.add_argument("--since", type=datetime.datetime.fromisoformat, help="只合并该时间之后开始的记录，如 2024-01-01")
+    sessionize.add_argument("--batch-size", type=int, default=sessions.USAGE_SESSION_BATCH_SIZE, help="每个事务读取的行数")
+    sessionize.set_defaults(func=cmd_sessionize_usage)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# tests/conftest.py
+"""
+测试使用独立的 PostgreSQL 数据库 {DB_NAME}_test（可用 TEST_DB_NAME 指定），连接参数与应用相同（.env / 环境变量）。
+每次测试会话开始时重建该库（与 generator.py 相同，create_all 后 alembic stamp head）；数据库不可用时跳过依赖它的测试。
+"""
+import os
+import sys
+
+import pytest
+from dotenv import load_dotenv
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+load_dotenv(os.path.join(ROOT, ".env"))
+
+# 必须在导入 app 之前设置：引擎在 app.database 导入时按 DB_NAME 创建
+TEST_DB_NAME = os.getenv("TEST_DB_NAME", f"{os.getenv('DB_NAME', 'smart_home')}_test")
+os.environ["DB_NAME"] = TEST_DB_NAME
+# 测试进程不预热渲染进程池、不运行后台预计算
+os.environ["RENDER_WARM_UP"] = "false"
+os.environ["ANALYTICS_PRECOMPUTE_ENABLED"] = "false"
+
+
+@pytest.fixture(scope="session")
+def database():
+    """重建测试库并建立最新表结构，返回同步引擎"""
+    from alembic import command
+    from alembic.config import Config
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.exc import OperationalError
+    from sqlalchemy.pool import NullPool
+    from app.database import engine
+    from app.models import Base
+
+    admin = create_engine(engine.url.set(database="postgres"), isolation_level="AUTOCOMMIT", poolclass=NullPool)
+    try:
+        with admin.connect() as conn:
+            conn.execute(text(f'DROP DATABASE IF EXISTS "{TEST_DB_NAME}" WITH (FORCE)'))
+            conn.execute(text(f"CREATE DATABASE \"{TEST_DB_NAME}\" ENCODING 'UTF8' TEMPLATE template0"))
+    except OperationalError as e:
+        pytest.skip(f"PostgreSQL 不可用：{e}")
+    finally:
+        admin.dispose()
+
+    Base.metadata.create_all(bind=engine)
+    command.stamp(Config(os.path.join(ROOT, "alembic.ini")), "head")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def client(database):
+    """整个会话共用一个 TestClient：异步引擎的连接绑定在它的事件循环上"""
+    from fastapi.testclient import TestClient
+    from main import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def device(client):
+    """一个用户及其名下的一台设备"""
+    user = client.post("/api/v1/users/", json={
+        "name": "测试用户", "email": "tester@smarthome.com", "phone": None, "house_area": 80.0,
+    }).json()
+    return client.post("/api/v1/devices/", json={
+        "name": "测试插座", "type": "smart_plug", "location": "客厅", "user_id": user["id"],
+    }).json()
+
+
+@pytest.fixture(scope="session")
+def seeded(database):
+    """用 generator.py 填充测试库（固定随机种子）并更新统计信息"""
+    import random
+    from sqlalchemy import text
+    import generator
+
+    random.seed(0)
+    assert generator.generate_test_data()
+    with database.connect() as conn:
+        conn.execute(text("ANALYZE"))
+        conn.commit()
+    return database
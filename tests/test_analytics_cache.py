@@ -0,0 +1,65 @@
+# tests/test_analytics_cache.py
+"""分析结果缓存：写入（含会话合并这类只改写已有行的写入）之后不再返回旧结果"""
+from app import analytics_cache
+
+
+def test_merge_invalidates_cached_analytics(client, monkeypatch):
+    monkeypatch.setattr(analytics_cache, "ANALYTICS_CACHE_ENABLED", True)
+    user = client.post("/api/v1/users/", json={
+        "name": "缓存用户", "email": "cache@smarthome.com", "phone": None, "house_area": 90.0,
+    }).json()
+    device = client.post("/api/v1/devices/", json={"name": "热水器", "type": "heater", "location": "浴室", "user_id": user["id"]}).json()
+    usage = {"device_id": device["id"], "user_id": user["id"]}
+
+    def total_energy():
+        r = client.get("/api/v1/analytics/energy-consumption-distribution", params={"user_id": user["id"], "format": "data"})
+        assert r.status_code == 200, r.text
+        return r.json()["data"]["total_energy"]
+
+    client.post("/api/v1/usage/", json={**usage, "start_time": "2030-07-01T08:00:00", "end_time": "2030-07-01T09:00:00", "energy_consumption": 1.0})
+    assert total_energy() == [1.0]
+    # 与上一条相邻，合并进同一行（只 UPDATE，不产生新 id）
+    r = client.post("/api/v1/usage/", json={**usage, "start_time": "2030-07-01T09:00:00", "end_time": "2030-07-01T10:00:00", "energy_consumption": 5.0})
+    assert r.json()["end_time"] == "2030-07-01T10:00:00"
+    assert total_energy() == [6.0]
+
+
+def _generation(table):
+    return analytics_cache.watermarks._generations[table]
+
+
+def test_generation_bumps_after_commit(database, client):
+    from sqlalchemy import insert
+    from sqlalchemy.orm import Session
+    from app import models
+
+    before = _generation("users")
+    with Session(database) as db:
+        db.execute(insert(models.User).values(name="提交前", email="uncommitted@smarthome.com"))
+        # 提交之前的读请求不能用新水位缓存旧数据
+        assert _generation("users") == before
+        db.commit()
+    assert _generation("users") == before + 1
+
+
+def test_rollback_does_not_bump(database):
+    from sqlalchemy import insert
+    from sqlalchemy.orm import Session
+    from app import models
+
+    before = _generation("users")
+    with Session(database) as db:
+        db.execute(insert(models.User).values(name="回滚", email="rollback@smarthome.com"))
+        db.rollback()
+    with Session(database) as db:
+        db.commit()
+    assert _generation("users") == before
+
+
+def test_text_writes_bump(database):
+    from sqlalchemy import text
+
+    before = _generation("device_usage_hourly")
+    with database.begin() as conn:
+        conn.execute(text("DELETE FROM device_usage_hourly WHERE hour < '1970-01-02'"))
+    assert _generation("device_usage_hourly") == before + 1
@@ -0,0 +1,54 @@
+# tests/test_cousage.py
+"""设备共现扫描线：同一设备的重叠区间只计一次"""
+import datetime
+import random
+
+import pytest
+from app import cousage
+
+T0 = datetime.datetime(2030, 1, 1)
+
+
+def _at(minutes: int) -> datetime.datetime:
+    return T0 + datetime.timedelta(minutes=minutes)
+
+
+def test_self_overlap_counted_once():
+    # 设备 1 的两段记录 [0, 60) 与 [30, 90) 自身重叠，设备 2 使用 [0, 90)
+    result = cousage.sweep([
+        (1, 1, _at(0), _at(60)),
+        (1, 2, _at(0), _at(90)),
+        (1, 1, _at(30), _at(90)),
+    ])
+    assert result.device_seconds == {1: 5400.0, 2: 5400.0}
+    assert result.pair_seconds == {(1, 2): 5400.0}
+    assert result.jaccard((1, 2)) == 1.0
+
+
+def test_matches_minute_grid():
+    """随机区间与按分钟逐格统计的结果一致"""
+    rng = random.Random(0)
+    intervals = []
+    for user in (1, 2):
+        for _ in range(60):
+            start = rng.randrange(0, 600)
+            intervals.append((user, rng.randrange(1, 5), _at(start), _at(start + rng.randrange(1, 120))))
+    intervals.sort(key=lambda row: (row[0], row[2]))
+
+    minutes = {}
+    for user, device, start, end in intervals:
+        begin, finish = int((start - T0).total_seconds() // 60), int((end - T0).total_seconds() // 60)
+        for minute in range(begin, finish):
+            minutes.setdefault((user, minute), set()).add(device)
+    device_seconds, pair_seconds = {}, {}
+    for devices in minutes.values():
+        for device in devices:
+            device_seconds[device] = device_seconds.get(device, 0.0) + 60
+        for a in devices:
+            for b in devices:
+                if a < b:
+                    pair_seconds[(a, b)] = pair_seconds.get((a, b), 0.0) + 60
+
+    result = cousage.sweep(intervals)
+    assert result.device_seconds == pytest.approx(device_seconds)
+    assert result.pair_seconds == pytest.approx(pair_seconds)
@@ -0,0 +1,8 @@
+# tests/test_dashboard.py
+"""仪表盘参数校验"""
+
+
+def test_unknown_analyses(client):
+    r = client.get("/api/v1/analytics/dashboard", params={"analyses": "area-impact,foo,bar"})
+    assert r.status_code == 400
+    assert r.json()["detail"] == "未知的分析名称: foo、bar"
@@ -0,0 +1,15 @@
+# tests/test_etag.py
+"""图像接口的 If-None-Match 匹配"""
+from app.routers.analytics_router import _etag_matches
+
+
+def test_etag_matches():
+    assert _etag_matches('"abc"', "abc")
+    assert _etag_matches('W/"abc"', "abc")
+    assert _etag_matches('"x", W/"abc" ,"y"', "abc")
+    assert _etag_matches("*", "abc")
+    assert not _etag_matches(None, "abc")
+    assert not _etag_matches("", "abc")
+    # 子串不算匹配
+    assert not _etag_matches('"abcd"', "abc")
+    assert not _etag_matches('"xabc", "ab"', "abc")
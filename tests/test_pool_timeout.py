@@ -0,0 +1,35 @@
+# tests/test_pool_timeout.py
+"""连接池耗尽时分析、仪表盘与流式写入也返回 503，而不是 500 或把超时记成单项错误"""
+import pytest
+from app import analytics_cache
+
+
+@pytest.fixture
+def exhausted(database, monkeypatch):
+    """占满同步引擎的连接池（含溢出连接），签出等待缩短到 0.1 秒"""
+    pool = database.pool
+    monkeypatch.setattr(pool, "_timeout", 0.1)
+    monkeypatch.setattr(analytics_cache, "ANALYTICS_CACHE_ENABLED", False)
+    held = [database.connect() for _ in range(pool.size() + pool._max_overflow - pool.checkedout())]
+    yield
+    for conn in held:
+        conn.close()
+
+
+def _assert_busy(r):
+    assert r.status_code == 503, r.text
+    assert r.headers["Retry-After"] == "1"
+
+
+def test_analytics_returns_503(client, exhausted):
+    _assert_busy(client.get("/api/v1/analytics/device-usage-frequency", params={"format": "data"}))
+
+
+def test_dashboard_returns_503(client, exhausted):
+    _assert_busy(client.get("/api/v1/analytics/dashboard", params={"format": "data"}))
+
+
+def test_ndjson_ingest_returns_503(client, device, exhausted):
+    body = '{"type": "event", "device_id": %d, "event_type": "intrusion", "severity": "low"}\n' % device["id"]
+    r = client.post("/api/v1/ingest/ndjson", content=body, headers={"Content-Type": "application/x-ndjson"})
+    _assert_busy(r)
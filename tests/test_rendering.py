@@ -0,0 +1,46 @@
+# tests/test_rendering.py
+"""渲染名额：任何失败都要归还"""
+import pytest
+from app import charts, rendering
+
+CHART = "device_usage_frequency"
+
+
+@pytest.fixture
+def render_pool():
+    """真实的渲染进程池，测试结束后关闭"""
+    yield
+    rendering.shutdown()
+
+
+def _assert_all_slots_free():
+    acquired = 0
+    while acquired < rendering.RENDER_MAX_CONCURRENT and rendering._slots.acquire(blocking=False):
+        acquired += 1
+    for _ in range(acquired):
+        rendering._slots.release()
+    assert acquired == rendering.RENDER_MAX_CONCURRENT
+    assert rendering.stats()["in_flight"] == 0
+
+
+def test_worker_failure_releases_slot(render_pool):
+    assert CHART in charts.CHARTS
+    failed = rendering.stats()["failed"]
+    # 缺少 device_name 列，工作进程内 seaborn 绘图抛出 ValueError
+    with pytest.raises(ValueError):
+        rendering.render(CHART, {"device_id": [1], "usage_count": [3]})
+    assert rendering.stats()["failed"] == failed + 1
+    _assert_all_slots_free()
+
+
+def test_pool_failure_releases_slot(monkeypatch):
+    def broken_pool():
+        raise OSError("无法启动渲染进程")
+
+    monkeypatch.setattr(rendering, "_get_pool", broken_pool)
+    monkeypatch.setattr(rendering, "RENDER_QUEUE_TIMEOUT", 0.01)
+    # 名额泄漏时，超过 RENDER_MAX_CONCURRENT 次后会变成 RenderBusy
+    for _ in range(rendering.RENDER_MAX_CONCURRENT + 1):
+        with pytest.raises(OSError):
+            rendering.render(CHART, {"device_id": [1], "device_name": ["灯"], "usage_count": [3]})
+    _assert_all_slots_free()
@@ -0,0 +1,47 @@
+# tests/test_scheduler.py
+"""分析预计算：每个分析都按关键字调用，图表失败时保留已算好的数据"""
+import pytest
+from sqlalchemy.orm import Session
+from app import analytics_cache, rendering, scheduler
+
+
+@pytest.fixture(scope="module")
+def user_id(client):
+    """一个用户，两台设备有重叠的使用区间（共现分析有结果）"""
+    user = client.post("/api/v1/users/", json={
+        "name": "预计算用户", "email": "precompute@smarthome.com", "phone": None, "house_area": 120.0,
+    }).json()
+    for name, start, end in [("灯", "2030-06-01T08:00:00", "2030-06-01T10:00:00"), ("空调", "2030-06-01T09:00:00", "2030-06-01T11:00:00")]:
+        device = client.post("/api/v1/devices/", json={"name": name, "type": "light", "location": "卧室", "user_id": user["id"]}).json()
+        r = client.post("/api/v1/usage/", json={
+            "device_id": device["id"], "user_id": user["id"], "start_time": start, "end_time": end, "energy_consumption": 1.0,
+        })
+        assert r.status_code == 200, r.text
+    return user["id"]
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setattr(analytics_cache, "ANALYTICS_CACHE_ENABLED", False)
+
+
+def test_compute_scope_renders_every_chart(database, user_id, monkeypatch):
+    monkeypatch.setattr(scheduler, "ANALYTICS_PRECOMPUTE_CHARTS", True)
+    monkeypatch.setattr(rendering, "render", lambda chart, data: f"chart:{chart}")
+    with Session(database) as db:
+        rows = {row["analysis"]: row for row in scheduler.compute_scope(db, user_id)}
+    assert {name: row["error"] for name, row in rows.items()} == {name: None for name in scheduler.ANALYSES}
+    assert rows["device_usage_patterns"]["chart"] == "chart:device_usage_patterns"
+    assert rows["device_usage_patterns"]["data"] is not None
+
+
+def test_chart_failure_keeps_data(database, user_id, monkeypatch):
+    def broken(chart, data):
+        raise RuntimeError("绘图失败")
+
+    monkeypatch.setattr(scheduler, "ANALYTICS_PRECOMPUTE_CHARTS", True)
+    monkeypatch.setattr(rendering, "render", broken)
+    with Session(database) as db:
+        row = next(row for row in scheduler.compute_scope(db, user_id) if row["analysis"] == "device_usage_patterns")
+    assert row["error"] is None
+    assert row["data"] is not None and row["chart"] is None
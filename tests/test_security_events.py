@@ -0,0 +1,52 @@
+# tests/test_security_events.py
+"""安防事件更新：timestamp 是分区键，不能置空；跨月修改时行移到对应分区"""
+import datetime
+
+import pytest
+from sqlalchemy import text
+from app import partitions
+
+
+@pytest.fixture(scope="module")
+def door(client, device):
+    """同一用户名下单独一台设备，不影响其他测试按设备查询的结果"""
+    return client.post("/api/v1/devices/", json={
+        "name": "门磁", "type": "door_sensor", "location": "玄关", "user_id": device["user_id"],
+    }).json()
+
+
+def _event(client, device, timestamp):
+    r = client.post("/api/v1/security/", json={
+        "device_id": device["id"], "event_type": "door_open", "severity": "low", "timestamp": timestamp,
+    })
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def _update(client, event, **changes):
+    body = {key: event[key] for key in ("device_id", "event_type", "severity")}
+    return client.put(f"/api/v1/security/{event['id']}", json={**body, **changes})
+
+
+def test_update_rejects_null_timestamp(client, door):
+    event = _event(client, door, "2031-03-01T08:00:00")
+    assert _update(client, event, timestamp=None).status_code == 422
+
+    r = _update(client, event, severity="high")
+    assert r.status_code == 200, r.text
+    assert r.json()["timestamp"] == "2031-03-01T08:00:00"
+
+
+def test_update_moves_row_across_partitions(database, client, door):
+    with database.begin() as conn:
+        partition = partitions.create_month_partition(conn, "security_events", datetime.datetime(2031, 1, 1))
+    event = _event(client, door, "2031-02-01T08:00:00")
+
+    r = _update(client, event, timestamp="2031-01-15T08:00:00+08:00")
+    assert r.status_code == 200, r.text
+    assert r.json()["timestamp"] == "2031-01-15T00:00:00"
+    with database.connect() as conn:
+        rows = conn.execute(
+            text("SELECT tableoid::regclass::text, timestamp FROM security_events WHERE id = :id"), {"id": event["id"]}
+        ).all()
+    assert rows == [(partition, datetime.datetime(2031, 1, 15))]
@@ -0,0 +1,96 @@
+# tests/test_sessions.py
+"""历史使用记录按设备分批合并"""
+import datetime
+
+import pytest
+from sqlalchemy.orm import Session
+from app import models, sessions
+
+
+def test_sessionize_rejects_single_row_batches(database, device):
+    with pytest.raises(ValueError):
+        sessions.sessionize_device(database, device["id"], batch_size=1)
+
+
+def test_sessionize_small_batches(database, device):
+    """每批两行也能把一串相邻记录合并成一个会话，并且会结束"""
+    begin = datetime.datetime(2030, 5, 1, 8)
+    with Session(database) as db:
+        db.add_all(
+            models.DeviceUsage(
+                device_id=device["id"], user_id=device["user_id"], energy_consumption=1.0,
+                start_time=begin + datetime.timedelta(minutes=10 * i),
+                end_time=begin + datetime.timedelta(minutes=10 * i + 10),
+            )
+            for i in range(5)
+        )
+        db.commit()
+
+    assert sessions.sessionize_device(database, device["id"], since=begin, batch_size=2) == 4
+    with Session(database) as db:
+        rows = db.query(models.DeviceUsage).filter(
+            models.DeviceUsage.device_id == device["id"], models.DeviceUsage.start_time >= begin,
+        ).all()
+    assert [(row.start_time, row.end_time) for row in rows] == [(begin, begin + datetime.timedelta(minutes=50))]
+
+
+# ------------------------------
+# 写入路径：默认不合并，开启 USAGE_SESSIONIZE_ON_INGEST 后合并
+# ------------------------------
+@pytest.fixture
+def plug(client, device):
+    """每个测试一台新设备，互不影响"""
+    return client.post("/api/v1/devices/", json={
+        "name": "会话插座", "type": "smart_plug", "location": "书房", "user_id": device["user_id"],
+    }).json()
+
+
+def _row(plug, start, end):
+    return {
+        "device_id": plug["id"], "user_id": plug["user_id"], "energy_consumption": 1.0,
+        "start_time": f"2032-01-01T{start}:00", "end_time": f"2032-01-01T{end}:00",
+    }
+
+
+def _stored(client, plug):
+    r = client.get("/api/v1/usage/", params={"device_id": plug["id"]})
+    return [(usage["id"], usage["start_time"][11:16], usage["end_time"][11:16]) for usage in r.json()]
+
+
+def test_create_usage_keeps_rows_by_default(client, plug):
+    first = client.post("/api/v1/usage/", json=_row(plug, "08:00", "09:00")).json()
+    second = client.post("/api/v1/usage/", json=_row(plug, "09:00", "10:00")).json()
+    assert (second["start_time"], second["end_time"]) == ("2032-01-01T09:00:00", "2032-01-01T10:00:00")
+    # 重复上报按 (device_id, start_time) 幂等
+    assert client.post("/api/v1/usage/", json=_row(plug, "09:00", "10:00")).json()["id"] == second["id"]
+    assert _stored(client, plug) == [(first["id"], "08:00", "09:00"), (second["id"], "09:00", "10:00")]
+
+
+def test_create_usage_sessionized(client, plug, monkeypatch):
+    monkeypatch.setattr(sessions, "USAGE_SESSIONIZE_ON_INGEST", True)
+    first = client.post("/api/v1/usage/", json=_row(plug, "08:00", "09:00")).json()
+    merged = client.post("/api/v1/usage/", json=_row(plug, "09:00", "10:00")).json()
+    assert merged["id"] == first["id"]
+    assert (merged["start_time"], merged["end_time"]) == ("2032-01-01T08:00:00", "2032-01-01T10:00:00")
+    assert _stored(client, plug) == [(first["id"], "08:00", "10:00")]
+
+
+def test_bulk_usage_set_based_by_default(client, plug, monkeypatch):
+    # 关闭会话化时批量写入不经过按设备加锁的合并
+    def unexpected(db, rows):
+        raise AssertionError("不应合并会话")
+
+    monkeypatch.setattr(sessions, "merge_on_ingest", unexpected)
+    rows = [_row(plug, "08:00", "09:00"), _row(plug, "08:30", "09:30"), _row(plug, "08:00", "09:00")]
+    r = client.post("/api/v1/usage/bulk", json=rows)
+    assert r.status_code == 200, r.text
+    assert len(r.json()["inserted_ids"]) == 2
+    assert [(start, end) for _, start, end in _stored(client, plug)] == [("08:00", "09:00"), ("08:30", "09:30")]
+
+
+def test_bulk_usage_sessionized(client, plug, monkeypatch):
+    monkeypatch.setattr(sessions, "USAGE_SESSIONIZE_ON_INGEST", True)
+    rows = [_row(plug, "08:00", "09:00"), _row(plug, "08:30", "09:30"), _row(plug, "12:00", "13:00")]
+    r = client.post("/api/v1/usage/bulk", json=rows)
+    assert r.status_code == 200, r.text
+    assert [(start, end) for _, start, end in _stored(client, plug)] == [("08:00", "09:30"), ("12:00", "13:00")]
@@ -0,0 +1,92 @@
+# tests/test_timezones.py
+"""带时区的时间参数：统一换算为不带时区的 UTC 后写入、过滤（异步路由使用 asyncpg，不接受带时区的值）"""
+from app import schemas
+
+
+def test_naive_utc():
+    parsed = schemas.DeviceUsageCreate.model_validate({
+        "device_id": 1, "user_id": 1, "energy_consumption": None,
+        "start_time": "2026-10-01T08:00:00+08:00", "end_time": "2026-10-01T01:00:00Z",
+    })
+    assert parsed.start_time.isoformat() == "2026-10-01T00:00:00"
+    assert parsed.end_time.isoformat() == "2026-10-01T01:00:00"
+    assert schemas.naive_utc(None) is None
+
+
+def test_usage_with_aware_times(client, device):
+    r = client.post("/api/v1/usage/", json={
+        "device_id": device["id"], "user_id": device["user_id"], "energy_consumption": 1.0,
+        "start_time": "2030-01-01T18:00:00+08:00", "end_time": "2030-01-01T11:00:00Z",
+    })
+    assert r.status_code == 200, r.text
+    assert r.json()["start_time"] == "2030-01-01T10:00:00"
+
+    r = client.get("/api/v1/usage/", params={
+        "device_id": device["id"], "start": "2030-01-01T00:00:00Z", "end": "2030-01-02T00:00:00+00:00",
+    })
+    assert r.status_code == 200, r.text
+    assert [usage["start_time"] for usage in r.json()] == ["2030-01-01T10:00:00"]
+
+
+def test_security_event_with_aware_times(client, device):
+    r = client.post("/api/v1/security/", json={
+        "device_id": device["id"], "event_type": "intrusion", "severity": "high",
+        "timestamp": "2030-02-01T08:30:00+08:00",
+    })
+    assert r.status_code == 200, r.text
+    assert r.json()["timestamp"] == "2030-02-01T00:30:00"
+
+    r = client.get("/api/v1/security/", params={"device_id": device["id"], "start": "2030-02-01T00:00:00Z"})
+    assert r.status_code == 200, r.text
+    assert [event["timestamp"] for event in r.json()] == ["2030-02-01T00:30:00"]
+
+
+def test_bulk_merge_with_aware_times(client, device, monkeypatch):
+    """带时区的新记录与库中相邻记录合并（会话化）"""
+    from app import sessions
+
+    monkeypatch.setattr(sessions, "USAGE_SESSIONIZE_ON_INGEST", True)
+    row = {"device_id": device["id"], "user_id": device["user_id"], "energy_consumption": 1.0}
+    r = client.post("/api/v1/usage/bulk", json=[{**row, "start_time": "2030-03-01T10:00:00", "end_time": "2030-03-01T11:00:00"}])
+    assert r.status_code == 200, r.text
+    r = client.post("/api/v1/usage/bulk", json=[{**row, "start_time": "2030-03-01T19:00:30+08:00", "end_time": "2030-03-01T12:00:00Z"}])
+    assert r.status_code == 200, r.text
+    assert r.json()["errors"] == []
+
+    r = client.get("/api/v1/usage/", params={"device_id": device["id"], "start": "2030-03-01T00:00:00Z", "end": "2030-03-02T00:00:00Z"})
+    assert [(usage["start_time"], usage["end_time"]) for usage in r.json()] == [("2030-03-01T10:00:00", "2030-03-01T12:00:00")]
+
+
+def test_merge_on_ingest_normalizes_rows(database, device):
+    import datetime
+    from sqlalchemy.orm import Session
+    from app import sessions
+
+    aware = datetime.datetime(2030, 4, 1, 10, tzinfo=datetime.timezone.utc)
+    row = {"device_id": device["id"], "user_id": device["user_id"], "energy_consumption": 1.0}
+    with Session(database) as db:
+        sessions.merge_on_ingest(db, [{**row, "start_time": aware.replace(tzinfo=None), "end_time": aware.replace(tzinfo=None, hour=11)}])
+        merged = sessions.merge_on_ingest(db, [{**row, "start_time": aware.replace(hour=11), "end_time": aware.replace(hour=12)}])
+        db.rollback()
+    assert merged[0]["start_time"] == datetime.datetime(2030, 4, 1, 10)
+    assert merged[0]["end_time"] == datetime.datetime(2030, 4, 1, 12)
+
+
+def test_bulk_insert_keys_with_aware_times(database, device, monkeypatch):
+    """不合并会话时，批量写入按 (device_id, 不带时区的 start_time) 对齐 RETURNING 结果"""
+    import datetime
+    from sqlalchemy.orm import Session
+    from app import crud, schemas, sessions
+
+    monkeypatch.setattr(sessions, "USAGE_SESSIONIZE_ON_INGEST", False)
+    start = datetime.datetime(2030, 5, 1, 18, tzinfo=datetime.timezone(datetime.timedelta(hours=8)))
+    # model_construct 跳过校验器，模拟未经请求模型规范化的调用方
+    usage = schemas.DeviceUsageCreate.model_construct(
+        device_id=device["id"], user_id=device["user_id"], energy_consumption=1.0,
+        start_time=start, end_time=start + datetime.timedelta(hours=1),
+    )
+    with Session(database) as db:
+        inserted = crud.create_usages_bulk(db, [usage])
+        assert len(inserted) == 1
+        assert crud.get_usage(db, inserted[0]).start_time == datetime.datetime(2030, 5, 1, 10)
+        assert crud.create_usages_bulk(db, [usage]) == []